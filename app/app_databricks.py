@@ -7,7 +7,7 @@ Pattern based on databricks-ai-ticket-vectorsearch project
 
 import streamlit as st
 import os
-from databricks.sdk import WorkspaceClient
+from utils.sql_gateway import get_workspace_client
 
 # Page configuration
 st.set_page_config(
@@ -209,16 +209,7 @@ SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "148ccb90800933a1")
 ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
 
-# Initialize Databricks client (uses Databricks Apps authentication)
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient (automatically authenticated in Databricks Apps)"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
+# Shared Databricks client (uses Databricks Apps authentication; pooled across pages)
 w = get_workspace_client()
 
 # Sidebar
@@ -7,7 +7,9 @@ import streamlit as st
 import os
 import json
 import time
-from databricks.sdk import WorkspaceClient
+from utils.sql_gateway import get_gateway
+from utils.statement_runner import DEFAULT_DEADLINE_SECONDS
+from utils.durable_cache import NO_FRAUD_TYPE
 
 # Page config
 st.set_page_config(page_title="Claim Analysis", page_icon="📊", layout="wide")
@@ -212,74 +214,47 @@ SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "148ccb90800933a1")
 ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
 VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
+LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "databricks-claude-sonnet-4-5")
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
 
-# Initialize Databricks client
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient (automatically authenticated in Databricks Apps)"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
+# Shared SQL gateway (one pooled client, caches and retries for every page)
+gateway = get_gateway(WAREHOUSE_ID)
+w = gateway.w
+result_cache = gateway.result_cache
 
-w = get_workspace_client()
-
-def call_uc_function(function_name, *args, timeout=50, show_debug=False):
+def call_uc_function(function_name, *args, timeout=DEFAULT_DEADLINE_SECONDS, show_debug=False):
     """Call a Unity Catalog function using Statement Execution API"""
     try:
-        # Escape single quotes in string arguments
-        escaped_args = []
-        for arg in args:
-            if isinstance(arg, str):
-                escaped_arg = arg.replace("'", "''")
-                escaped_args.append(f"'{escaped_arg}'")
-            else:
-                escaped_args.append(str(arg))
-        
-        args_str = ', '.join(escaped_args)
-        query = f"SELECT {CATALOG}.{SCHEMA}.{function_name}({args_str}) as result"
-        
         if show_debug:
-            st.info(f"🔍 Executing: {function_name}(...) on warehouse {WAREHOUSE_ID}")
-        
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
+            if gateway.cached_result(function_name, args) is not None:
+                st.info(f"⚡ Cache hit: {function_name}(...)")
+            else:
+                st.info(f"🔍 Executing: {function_name}(...) on warehouse {WAREHOUSE_ID}")
         
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                data = result.result.data_array[0][0]
-                
-                if isinstance(data, str):
-                    import json
-                    try:
-                        parsed = json.loads(data)
-                        return parsed
-                    except:
-                        return data
-                elif isinstance(data, dict):
-                    return data
-                elif isinstance(data, (list, tuple)):
-                    # For STRUCT types returned as arrays
-                    if function_name == "fraud_generate_explanation" and len(data) >= 3:
-                        return {
-                            'summary': data[0],
-                            'key_findings': data[1] if data[1] else [],
-                            'recommendations': data[2] if data[2] else []
-                        }
-                    return data
-                else:
-                    return data
+        # Raw cell (cached or fresh) so every caller can apply its own parsing
+        data = gateway.call_function(function_name, *args, deadline_seconds=timeout)
+        if data is None:
             return None
+        
+        if isinstance(data, str):
+            try:
+                parsed = json.loads(data)
+                return parsed
+            except:
+                return data
+        elif isinstance(data, dict):
+            return data
+        elif isinstance(data, (list, tuple)):
+            # For STRUCT types returned as arrays
+            if function_name == "fraud_generate_explanation" and len(data) >= 3:
+                return {
+                    'summary': data[0],
+                    'key_findings': data[1] if data[1] else [],
+                    'recommendations': data[2] if data[2] else []
+                }
+            return data
         else:
-            if show_debug:
-                st.error(f"Query failed: {result.status.state.value}")
-                if result.status.error:
-                    st.error(f"Error: {result.status.error.message}")
-            return None
+            return data
     
     except Exception as e:
         if show_debug:
@@ -293,6 +268,7 @@ try:
     from langgraph.prebuilt import create_react_agent
     from langchain_core.messages import SystemMessage
     from databricks_langchain import ChatDatabricks
+    from utils.analysis_graph import build_analysis_graph, run_analysis_graph, stage_results
     
     LANGCHAIN_AVAILABLE = True
     
@@ -309,7 +285,7 @@ try:
     class GenerateExplanationInput(BaseModel):
         claim_text: str = Field(description="The claim text to explain")
         is_fraudulent: bool = Field(description="Whether the claim is fraudulent (from classification)")
-        fraud_type: str = Field(description="Type of fraud detected (from classification)", default="none")
+        fraud_type: str = Field(description="Type of fraud detected (from classification)", default=NO_FRAUD_TYPE)
     
     # Tool wrapper functions
     def classify_claim_wrapper(claim_text: str) -> str:
@@ -363,7 +339,7 @@ try:
         except Exception as e:
             return json.dumps({"error": f"Search failed: {str(e)}"})
     
-    def generate_explanation_wrapper(claim_text: str, is_fraudulent: bool, fraud_type: str = "none") -> str:
+    def generate_explanation_wrapper(claim_text: str, is_fraudulent: bool, fraud_type: str = NO_FRAUD_TYPE) -> str:
         """Generates comprehensive fraud explanation with risk factors and recommendations"""
         result = call_uc_function("fraud_generate_explanation", claim_text, is_fraudulent, fraud_type, show_debug=False)
         import json
@@ -431,6 +407,94 @@ try:
             st.error(traceback.format_exc())
             return None
     
+    def _chunk_text(content) -> str:
+        """Text of a streamed message chunk (plain string or list of content blocks)"""
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                block.get("text", "") if isinstance(block, dict) else str(block)
+                for block in content
+            )
+        return ""
+    
+    def stream_agent_run(agent, agent_input, config):
+        """
+        Run the ReAct agent with stream_mode updates+messages, rendering each
+        tool call, its result and the answer tokens as they arrive.
+        
+        Returns (messages, first_output_ms); the live view is cleared afterwards
+        so the full result can be rendered in its usual layout.
+        """
+        start = time.time()
+        live_area = st.empty()
+        live = live_area.container()
+        live.markdown("##### 📡 Live agent output")
+        live_log = live.container()
+        answer_placeholder = live.empty()
+        
+        messages = []
+        answer_text = ""
+        first_output_ms = None
+        
+        for mode, chunk in agent.stream(agent_input, config=config, stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                token, metadata = chunk
+                if metadata.get("langgraph_node") != "agent":
+                    continue
+                text = _chunk_text(getattr(token, "content", ""))
+                if text:
+                    answer_text += text
+                    answer_placeholder.markdown(answer_text + "▌")
+                continue
+            
+            for node, update in chunk.items():
+                for msg in (update or {}).get("messages", []):
+                    messages.append(msg)
+                    if getattr(msg, "tool_calls", None):
+                        # Text before a tool call is reasoning, not the answer
+                        answer_text = ""
+                        answer_placeholder.empty()
+                        for tc in msg.tool_calls:
+                            live_log.markdown(f"🔧 Calling **{tc.get('name', 'unknown')}**...")
+                    elif getattr(msg, "type", "") == "tool":
+                        if first_output_ms is None:
+                            first_output_ms = (time.time() - start) * 1000
+                        content = str(getattr(msg, "content", ""))
+                        with live_log.expander(f"✅ {getattr(msg, 'name', 'tool')} returned", expanded=False):
+                            st.code(content[:1000] + ("..." if len(content) > 1000 else ""))
+        
+        answer_placeholder.markdown(answer_text)
+        live_area.empty()
+        return messages, first_output_ms
+    
+    def search_fraud_patterns_list(query: str) -> list:
+        """search_fraud_patterns_wrapper for the DAG, which wants the matches as a list"""
+        result = json.loads(search_fraud_patterns_wrapper(query))
+        return result if isinstance(result, list) else []
+    
+    @st.cache_resource
+    def create_analysis_dag():
+        """Create the deterministic DAG (classify + speculative extract/search, then explain)"""
+        try:
+            llm = ChatDatabricks(
+                endpoint=os.getenv("LLM_ENDPOINT", "databricks-claude-sonnet-4-5"),
+                temperature=0.1,
+                max_tokens=2000
+            )
+            return build_analysis_graph(
+                classify=lambda text: call_uc_function("fraud_classify", text),
+                extract=lambda text: call_uc_function("fraud_extract_indicators", text),
+                search=search_fraud_patterns_list,
+                explain=lambda text, is_fraud, fraud_type: call_uc_function(
+                    "fraud_generate_explanation", text, is_fraud, fraud_type
+                ),
+                llm=llm
+            )
+        except Exception as e:
+            st.error(f"Error creating analysis DAG: {e}")
+            return None
+    
 except ImportError as e:
     LANGCHAIN_AVAILABLE = False
     st.warning(f"LangChain/LangGraph not available: {e}")
@@ -566,6 +630,21 @@ else:
     
     st.markdown("<br>", unsafe_allow_html=True)
     
+    analysis_mode = st.radio(
+        "⚙️ Analysis mode:",
+        ["ReAct Agent", "Deterministic DAG"],
+        horizontal=True,
+        help="ReAct lets the LLM choose each tool (one LLM round-trip per step). "
+             "The DAG runs classify, extract and search in parallel and uses the LLM only for the final summary."
+    )
+    dag_mode = analysis_mode == "Deterministic DAG"
+    stream_output = st.checkbox(
+        "📡 Stream agent output live",
+        value=True,
+        disabled=dag_mode,
+        help="Show each tool call, its result and the answer tokens as they arrive (ReAct mode)"
+    )
+    
     col1, col2, col3 = st.columns([2, 2, 3])
     with col1:
         analyze_btn = st.button("🚀 Analyze with AI Agent", use_container_width=True)
@@ -610,8 +689,8 @@ else:
             
             total_start = time.time()
             
-            # Create agent
-            agent = create_langraph_agent()
+            # Create agent (or the deterministic DAG)
+            agent = create_analysis_dag() if dag_mode else create_langraph_agent()
             
             if not agent:
                 st.markdown("""
@@ -632,13 +711,12 @@ You have access to these tools:
 IMPORTANT: You MUST use the tools by calling them properly. After using tools, provide a final analysis.
 
 Analysis strategy:
-- Start with classify_claim (get is_fraudulent and fraud_type)
-- Then use extract_indicators
-- Use search_fraud_patterns to find similar fraud cases
-- Use generate_explanation with the is_fraudulent and fraud_type from step 1
+- classify_claim, extract_indicators and search_fraud_patterns are independent of each other:
+  call all three together in your FIRST response (one step, multiple tool calls) - they run in parallel
+- Then use generate_explanation with the is_fraudulent and fraud_type from classify_claim
 - After gathering information, provide your final fraud assessment
 
-Be thorough but efficient."""
+Be thorough but efficient: batch independent tool calls into a single step."""
                 
                 # Container for agent reasoning
                 reasoning_container = st.container()
@@ -649,18 +727,30 @@ Be thorough but efficient."""
                     # Show agent thinking
                     with st.spinner("🤔 Agent is analyzing the claim..."):
                         try:
-                            # Invoke agent with system message
-                            result = agent.invoke({
-                                "messages": [
-                                    SystemMessage(content=system_prompt),
-                                    ("user", f"Analyze this healthcare claim for fraud and provide a comprehensive assessment: {claim_text}")
-                                ]
-                            })
+                            first_output_ms = None
+                            if dag_mode:
+                                dag_state = run_analysis_graph(agent, claim_text)
+                                messages = []
+                            else:
+                                # Invoke agent with system message
+                                agent_input = {
+                                    "messages": [
+                                        SystemMessage(content=system_prompt),
+                                        ("user", f"Analyze this healthcare claim for fraud and provide a comprehensive assessment: {claim_text}")
+                                    ]
+                                }
+                                agent_config = {"max_concurrency": AGENT_TOOL_CONCURRENCY}
+                                
+                                if stream_output:
+                                    messages, first_output_ms = stream_agent_run(agent, agent_input, agent_config)
+                                else:
+                                    result = agent.invoke(agent_input, config=agent_config)
+                                    
+                                    # Parse messages to show reasoning
+                                    messages = result.get('messages', [])
                             
                             elapsed_time = (time.time() - total_start) * 1000
-                            
-                            # Parse messages to show reasoning
-                            messages = result.get('messages', [])
+                            st.session_state.setdefault('mode_latency_ms', {})[analysis_mode] = elapsed_time
                             
                             st.markdown(f"""
                             <div style='background: linear-gradient(135deg, #00CCA3 0%, #00D9FF 100%); color: #0A1929; padding: 20px; border-radius: 15px; text-align: center; margin: 20px 0; box-shadow: 0 8px 25px rgba(0,204,163,0.3);'>
@@ -711,6 +801,11 @@ Be thorough but efficient."""
                                             tc['result'] = tool_content
                                             break
                             
+                            if dag_mode:
+                                # Stages that ran, in the same shape as agent tool calls
+                                tool_calls = stage_results(dag_state)
+                                agent_response = dag_state.get('summary')
+                            
                             # Display tool calls in expandable sections
                             if tool_calls:
                                 st.markdown("""
@@ -819,7 +914,32 @@ Be thorough but efficient."""
                                     <div style='font-size: 0.9rem; color: #B2BAC2;'>Estimated Cost</div>
                                 </div>
                                 """, unsafe_allow_html=True)
+
+                            cache_stats = result_cache.stats()
+                            st.caption(
+                                f"⚡ Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                                f"({cache_stats['hit_rate']:.0%} hit rate)"
+                            )
+                            sql_stats = gateway.stats()
+                            st.caption(
+                                f"🗄️ SQL gateway: {sql_stats['statements']} statements, "
+                                f"mean {sql_stats['mean_seconds']:.2f}s, p95 {sql_stats['p95_seconds']:.2f}s"
+                            )
                             
+                            if first_output_ms is not None:
+                                st.caption(f"📡 First tool result streamed after {first_output_ms:.0f}ms")
+                            
+                            # Latency of the last run in each mode, side by side
+                            mode_latency = st.session_state.get('mode_latency_ms', {})
+                            st.caption("⏱️ Last run by mode: " + " · ".join(
+                                f"{mode}: {mode_latency[mode]:.0f}ms" if mode in mode_latency else f"{mode}: not run yet"
+                                for mode in ["ReAct Agent", "Deterministic DAG"]
+                            ))
+                            if dag_mode:
+                                stage_times = ", ".join(f"{stage} {ms:.0f}ms" for stage, ms in dag_state.get('timings_ms', {}).items())
+                                cleared_note = " · cleared early (extract/search dropped, no explanation)" if dag_state.get('cleared') else ""
+                                st.caption(f"🧩 DAG stages: {stage_times}{cleared_note}")
+
                             # Show raw messages for debugging
                             with st.expander("🔍 Debug: Raw Agent Messages"):
                                 for i, msg in enumerate(messages):
@@ -1,5 +1,5 @@
 """
-Batch Processing Page - Synchronous batch claim fraud analysis
+Batch Processing Page - Concurrent batch claim fraud analysis
 """
 
 import streamlit as st
@@ -7,8 +7,17 @@ import pandas as pd
 import os
 import json
 import time
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
+from concurrent.futures import ThreadPoolExecutor
+from utils.sql_gateway import get_gateway
+from utils.batch_runner import DEFAULT_MAX_CONCURRENCY, run_pipelined
+from utils.batch_scoring import (
+    CLASSIFY_BATCH_SIZE, PACKED_CLASSIFY_FUNCTION, SET_BASED_MIN_CLAIMS, packed_cache_key, score_claims_packed,
+    score_claims_set_based
+)
+from utils.cost_estimator import DEFAULT_SECONDS_PER_CLAIM, DEPTH_FUNCTIONS, estimate_batch, format_duration
+from utils.result_writer import new_run_id, save_results_bulk
+from utils.rules_engine import RULES_ONLY_TAG, RULES_RISK_FLOOR, amount_stats_sql, score_claims_frame
+from utils.statement_runner import session_context_initializer
 
 # Page configuration
 st.set_page_config(
@@ -140,18 +149,13 @@ CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
 SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID")
 VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
+LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "databricks-claude-sonnet-4-5")
 
-# Initialize WorkspaceClient
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
-w = get_workspace_client()
+# Shared SQL gateway (one pooled client, caches and retries for every page)
+gateway = get_gateway(WAREHOUSE_ID)
+w = gateway.w
+result_cache = gateway.result_cache
+durable_store = gateway.durable_store
 
 # Sample claims data
 SAMPLE_CLAIMS = {
@@ -197,45 +201,18 @@ SAMPLE_CLAIMS = {
 def call_uc_function(function_name, *args, show_debug=False):
     """Call a Unity Catalog function using Statement Execution API"""
     try:
-        # Escape single quotes in string arguments
-        escaped_args = []
-        for arg in args:
-            if isinstance(arg, str):
-                escaped_arg = arg.replace("'", "''")
-                escaped_args.append(f"'{escaped_arg}'")
-            else:
-                escaped_args.append(str(arg))
-        
-        args_str = ', '.join(escaped_args)
-        query = f"SELECT {CATALOG}.{SCHEMA}.{function_name}({args_str}) as result"
-        
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
-        
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                data = result.result.data_array[0][0]
-                
-                if isinstance(data, str):
-                    try:
-                        parsed = json.loads(data)
-                        return parsed
-                    except:
-                        return data
-                elif isinstance(data, dict):
-                    return data
-                elif isinstance(data, (list, tuple)):
-                    return data
-                else:
-                    return data
-            return None
-        else:
-            if show_debug:
-                st.error(f"Query failed: {result.status.state.value}")
+        # Served from the shared caches when possible; raw cell otherwise
+        data = gateway.call_function(function_name, *args)
+        if data is None:
             return None
+        
+        if isinstance(data, str):
+            try:
+                parsed = json.loads(data)
+                return parsed
+            except:
+                return data
+        return data
     
     except Exception as e:
         if show_debug:
@@ -276,17 +253,8 @@ def search_fraud_cases_vector(query: str, num_results: int = 3):
     except Exception as e:
         return []
 
-def process_claim(claim_row, analysis_depth):
-    """Process single claim based on depth selection"""
-    result = {
-        'claim_id': claim_row.get('claim_id', 'N/A'),
-        'claim_text': claim_row.get('claim_text', '')[:100] + '...',
-        'claim_amount': claim_row.get('claim_amount', 0)
-    }
-    
-    # Always classify
-    classify_result = call_uc_function("fraud_classify", claim_row['claim_text'])
-    
+def apply_classification(result, classify_result):
+    """Copy classification fields onto a result row (ERROR verdict if missing)"""
     if classify_result:
         result['is_fraudulent'] = bool(classify_result.get('is_fraudulent', False))
         result['fraud_probability'] = float(classify_result.get('fraud_probability', 0.0))
@@ -299,73 +267,119 @@ def process_claim(claim_row, analysis_depth):
         result['fraud_type'] = 'Error'
         result['confidence'] = 0.0
         result['verdict'] = "ERROR"
+
+def apply_indicators(result, extract_result):
+    """Copy indicator fields onto a result row"""
+    if extract_result:
+        result['risk_score'] = extract_result.get('risk_score', 0)
+        result['red_flags'] = extract_result.get('red_flags', [])
+        result['urgency_level'] = extract_result.get('urgency_level', 'Low')
+
+def classify_claim(claim_text, packed):
+    """fraud_classify result; packed runs first use the classification score_claims_packed cached"""
+    if packed:
+        raw = result_cache.get(packed_cache_key(claim_text, LLM_ENDPOINT))
+        if raw is not None:
+            return json.loads(raw) if isinstance(raw, str) else raw
+    return call_uc_function("fraud_classify", claim_text)
+
+def process_claim(claim_row, analysis_depth, packed=False):
+    """Process single claim based on depth selection"""
+    result = {
+        'claim_id': claim_row.get('claim_id', 'N/A'),
+        'claim_text': claim_row.get('claim_text', '')[:100] + '...',
+        'claim_amount': claim_row.get('claim_amount', 0)
+    }
     
-    # Standard: Add extraction
-    if analysis_depth in ["Standard", "Deep"]:
-        extract_result = call_uc_function("fraud_extract_indicators", claim_row['claim_text'])
-        if extract_result:
-            result['risk_score'] = extract_result.get('risk_score', 0)
-            result['red_flags'] = extract_result.get('red_flags', [])
-            result['urgency_level'] = extract_result.get('urgency_level', 'Low')
-    
-    # Deep: Add vector search
-    if analysis_depth == "Deep":
-        similar_cases = search_fraud_cases_vector(claim_row['claim_text'][:500], num_results=2)
-        result['similar_cases_count'] = len(similar_cases)
-        result['similar_cases'] = [case['title'] for case in similar_cases]
+    # Single-pass: one fraud_analyze_full call returns all three stages
+    if analysis_depth == "Single-pass":
+        full_result = call_uc_function("fraud_analyze_full", claim_row['claim_text'])
+        if not isinstance(full_result, dict):
+            full_result = {}
+        apply_classification(result, full_result.get('classification'))
+        apply_indicators(result, full_result.get('indicators'))
+        explanation = full_result.get('explanation') or {}
+        result['explanation'] = explanation.get('explanation', '')
+        return result
+    
+    # Extraction and vector search don't depend on classification, so fan them
+    # out alongside it instead of running the three calls back to back
+    with ThreadPoolExecutor(max_workers=3, initializer=session_context_initializer()) as stage_pool:
+        extract_future = None
+        search_future = None
+        
+        # Standard: Add extraction
+        if analysis_depth in ["Standard", "Deep"]:
+            extract_future = stage_pool.submit(call_uc_function, "fraud_extract_indicators", claim_row['claim_text'])
+        
+        # Deep: Add vector search
+        if analysis_depth == "Deep":
+            search_future = stage_pool.submit(search_fraud_cases_vector, claim_row['claim_text'][:500], 2)
+        
+        # Always classify
+        classify_result = classify_claim(claim_row['claim_text'], packed)
+        apply_classification(result, classify_result)
+        
+        if extract_future:
+            apply_indicators(result, extract_future.result())
+        
+        if search_future:
+            similar_cases = search_future.result()
+            result['similar_cases_count'] = len(similar_cases)
+            result['similar_cases'] = [case['title'] for case in similar_cases]
     
     return result
 
-def save_results_to_table(results_df, table_name):
-    """Save results DataFrame to Databricks table"""
+def failed_claim_result(claim_row, error):
+    """Result row for a claim whose processing raised, so one failure doesn't sink the batch"""
+    return {
+        'claim_id': claim_row.get('claim_id', 'N/A'),
+        'claim_text': str(claim_row.get('claim_text', ''))[:100] + '...',
+        'claim_amount': claim_row.get('claim_amount', 0),
+        'is_fraudulent': False,
+        'fraud_probability': 0.0,
+        'fraud_type': 'Error',
+        'confidence': 0.0,
+        'verdict': "ERROR",
+        'error': str(error)
+    }
+
+def rules_only_result(claim_row, rules_score):
+    """
+    Result row for a claim the rules pre-filter cleared without LLM calls.
+
+    The LLM fields get neutral placeholders (no model produced them); the
+    rules score is kept in its own column.
+    """
+    return {
+        'claim_id': claim_row.get('claim_id', 'N/A'),
+        'claim_text': str(claim_row.get('claim_text', ''))[:100] + '...',
+        'claim_amount': claim_row.get('claim_amount', 0),
+        'is_fraudulent': False,
+        'fraud_probability': 0.0,
+        'fraud_type': 'None',
+        'confidence': 0.0,
+        'verdict': "LEGITIMATE",
+        'rules_score': float(rules_score),
+        'scored_by': RULES_ONLY_TAG
+    }
+
+@st.cache_data(ttl=3600)
+def load_amount_stats():
+    """claim_amount mean and stddev per claim_type in the claims table, for the rules pre-filter"""
     try:
-        # Create table if not exists
-        create_sql = f"""
-        CREATE TABLE IF NOT EXISTS {table_name} (
-            claim_id STRING,
-            claim_text STRING,
-            claim_amount DOUBLE,
-            is_fraudulent BOOLEAN,
-            fraud_probability DOUBLE,
-            fraud_type STRING,
-            confidence DOUBLE,
-            verdict STRING,
-            processed_at TIMESTAMP
-        )
-        """
-        
-        w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=create_sql,
-            wait_timeout="30s"
-        )
-        
-        # Insert data (simplified - in production use proper DataFrame write)
-        for _, row in results_df.iterrows():
-            insert_sql = f"""
-            INSERT INTO {table_name} VALUES (
-                '{row['claim_id']}',
-                '{row['claim_text'].replace("'", "''")}',
-                {row.get('claim_amount', 0)},
-                {str(row['is_fraudulent']).lower()},
-                {row['fraud_probability']},
-                '{row['fraud_type']}',
-                {row['confidence']},
-                '{row['verdict']}',
-                current_timestamp()
-            )
-            """
-            
-            w.statement_execution.execute_statement(
-                warehouse_id=WAREHOUSE_ID,
-                statement=insert_sql,
-                wait_timeout="30s"
-            )
-        
-        return True
+        return gateway.query_df(amount_stats_sql(f"{CATALOG}.{SCHEMA}.claims_data"))
+    except Exception:
+        # Without table statistics only keyword hits count
+        return None
+
+def save_results_to_table(results_df, table_name, run_id):
+    """Save results DataFrame to Databricks table in bulk (idempotent per run)"""
+    try:
+        return save_results_bulk(gateway, table_name, results_df, run_id)
     except Exception as e:
         st.error(f"Error saving to table: {e}")
-        return False
+        return None
 
 # Initialize session state
 if 'batch_claims' not in st.session_state:
@@ -376,6 +390,9 @@ if 'selected_samples' not in st.session_state:
     st.session_state.selected_samples = []
 if 'processing_complete' not in st.session_state:
     st.session_state.processing_complete = False
+if 'seconds_per_claim' not in st.session_state:
+    # Measured per-claim latency by depth, from completed runs in this session
+    st.session_state.seconds_per_claim = {}
 
 # Main UI
 st.markdown("---")
@@ -490,26 +507,94 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
     with col1:
         analysis_depth = st.radio(
             "Select analysis depth:",
-            ["Quick: Classify only", "Standard: Classify + Extract", "Deep: All Tools"],
+            ["Quick: Classify only", "Standard: Classify + Extract", "Deep: All Tools",
+             "Single-pass: Classify + Extract + Explain in one call"],
             help="""
             - Quick: Fast classification only (~2s per claim)
             - Standard: Classification + detailed indicators (~4s per claim)
             - Deep: Full analysis with similar case search (~6s per claim)
+            - Single-pass: Classification, indicators and explanation from one LLM call (~3s per claim)
             """
         )
     
     with col2:
         st.metric("Claims to Process", len(st.session_state.batch_claims))
         
-        # Estimate processing time
-        depth_mapping = {
-            "Quick: Classify only": 2,
-            "Standard: Classify + Extract": 4,
-            "Deep: All Tools": 6
-        }
-        depth_key = analysis_depth
-        est_time = len(st.session_state.batch_claims) * depth_mapping[depth_key]
-        st.metric("Est. Time", f"{est_time}s")
+        max_concurrency = st.slider(
+            "Max concurrent claims",
+            min_value=1,
+            max_value=32,
+            value=DEFAULT_MAX_CONCURRENCY,
+            help="Number of claims scored in parallel against the SQL warehouse"
+        )
+        
+        classify_batch_size = st.slider(
+            "Claims per classify call",
+            min_value=1,
+            max_value=20,
+            value=CLASSIFY_BATCH_SIZE,
+            disabled=analysis_depth.startswith("Single-pass"),
+            help="Claims classified together in one fraud_classify_batch call, sharing one copy of the "
+                 "instructions. Packs whose results don't line up with their claims fall back to one call per claim. "
+                 "1 turns packing off."
+        )
+        
+        rules_risk_floor = st.slider(
+            "Rules pre-filter risk floor",
+            min_value=0.0,
+            max_value=1.0,
+            value=RULES_RISK_FLOOR,
+            step=0.05,
+            help="Claims whose rules score (fraud keyword hits, amount outlier for the claim type) is below this "
+                 "are cleared as legitimate without any LLM call and tagged rules-only. The default 0.0 disables the "
+                 "pre-filter and sends every claim to the LLM."
+        )
+        
+    # Rules pre-filter: claims below the floor are cleared here and never reach the LLM
+    rules_scores = score_claims_frame(st.session_state.batch_claims, load_amount_stats())
+    rules_cleared = (rules_scores['rules_score'] < rules_risk_floor).tolist()
+    llm_claims = st.session_state.batch_claims[[not cleared for cleared in rules_cleared]]
+    
+    # Dry-run estimate: LLM calls and tokens from claim lengths and prompt sizes,
+    # time from this session's measured latency (defaults until a run completes)
+    depth_key = analysis_depth.split(":")[0]
+    measured = st.session_state.seconds_per_claim.get(depth_key)
+    claim_texts = llm_claims['claim_text'].astype(str)
+    packed = depth_key != "Single-pass" and classify_batch_size > 1 and len(claim_texts) > 1
+    
+    def estimate_for(texts):
+        return estimate_batch(
+            len(texts),
+            int(texts.str.len().sum()),
+            {("fraud_classify_batch" if packed and fn == "fraud_classify" else fn): 1.0 for fn in DEPTH_FUNCTIONS[depth_key]},
+            seconds_per_claim=measured or DEFAULT_SECONDS_PER_CLAIM[depth_key],
+            concurrency=max_concurrency,
+            claims_per_call={"fraud_classify_batch": classify_batch_size}
+        )
+    
+    estimate = estimate_for(claim_texts)
+    # LLM calls the pre-filter avoids: the estimate without it minus the one with it
+    unfiltered_calls = estimate_for(st.session_state.batch_claims['claim_text'].astype(str))['llm_calls']
+    rules_avoided_calls = unfiltered_calls - estimate['llm_calls']
+    
+    est_col1, est_col2, est_col3, est_col4 = st.columns(4)
+    with est_col1:
+        st.metric("Est. Time", format_duration(estimate["seconds"]),
+                  help="Measured in this session" if measured else "Default latency; refined after the first run")
+    with est_col2:
+        st.metric("Est. LLM Calls", f"{estimate['llm_calls']:,}")
+    with est_col3:
+        st.metric("Est. Tokens", f"{estimate['input_tokens'] + estimate['output_tokens']:,}",
+                  help=f"{estimate['input_tokens']:,} input / {estimate['output_tokens']:,} output")
+    with est_col4:
+        st.metric("Est. Cost", f"${estimate['cost_usd']:.2f}",
+                  help="Upper bound: claims already in the result cache make no LLM call")
+    if any(rules_cleared):
+        st.caption(f"🧮 Rules pre-filter clears {sum(rules_cleared)} of {len(rules_cleared)} claims without LLM calls, "
+                   f"avoiding ~{rules_avoided_calls:,} of {unfiltered_calls:,} LLM calls "
+                   f"({rules_avoided_calls / unfiltered_calls if unfiltered_calls else 0:.0%})")
+    elif rules_risk_floor <= 0:
+        st.caption("🧮 Rules pre-filter is off: the risk floor is 0.0 (the default), so every claim goes to the LLM")
     
     # Processing Section
     st.markdown("---")
@@ -517,7 +602,7 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
     
     if st.button("▶️ Start Batch Analysis", type="primary", use_container_width=True):
         # Extract depth value
-        depth_value = analysis_depth.split(":")[0]  # "Quick", "Standard", or "Deep"
+        depth_value = analysis_depth.split(":")[0]  # "Quick", "Standard", "Deep" or "Single-pass"
         
         st.markdown("### Processing in Progress...")
         
@@ -528,31 +613,114 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
         results = []
         total_claims = len(st.session_state.batch_claims)
         start_time = time.time()
+
+        # One durable-cache lookup per function for the whole batch
+        status_text.text("Checking previously scored claims...")
+        if depth_value == "Single-pass":
+            uc_functions = ["fraud_analyze_full"]
+        else:
+            uc_functions = ["fraud_classify"]
+            if depth_value in ["Standard", "Deep"]:
+                uc_functions.append("fraud_extract_indicators")
+        claim_texts = llm_claims['claim_text'].astype(str).tolist()
+        llm_total = len(claim_texts)
+        lookup_errors = durable_store.lookup_errors
+        durable_store.warm(
+            result_cache, claim_texts, uc_functions + ([PACKED_CLASSIFY_FUNCTION] if packed else []), LLM_ENDPOINT
+        )
+        if durable_store.lookup_errors > lookup_errors:
+            st.warning(f"⚠️ {durable_store.lookup_errors - lookup_errors} durable cache lookups failed "
+                       f"({durable_store.last_lookup_error}); those claims are scored again")
         
-        for idx, row in st.session_state.batch_claims.iterrows():
-            status_text.text(f"Processing {idx+1}/{total_claims}: {row['claim_id']}")
+        # Packed classification: classify_batch_size claims per LLM call into the result cache;
+        # claims of packs that don't line up are classified one call each below
+        set_based_functions = uc_functions
+        if packed:
+            status_text.text(f"Classifying {llm_total} claims, {classify_batch_size} per call...")
+            pack_stats = score_claims_packed(
+                gateway, CATALOG, SCHEMA, claim_texts,
+                result_cache, LLM_ENDPOINT, durable_store,
+                batch_size=classify_batch_size,
+                on_progress=lambda done, total: status_text.text(f"Packed classification: chunk {done}/{total}")
+            )
+            if pack_stats["misaligned_packs"] or pack_stats["failed_chunks"]:
+                st.warning(f"⚠️ {pack_stats['misaligned_packs']} packs didn't line up with their claims and "
+                           f"{pack_stats['failed_chunks']} chunks failed; those claims fall back to one call each")
+            set_based_functions = [fn for fn in uc_functions if fn != "fraud_classify"]
+        
+        # Larger batches: score remaining claims set-based (one statement per chunk),
+        # so the per-claim pass below is served from the result cache
+        if llm_total > SET_BASED_MIN_CLAIMS and set_based_functions:
+            status_text.text(f"Scoring {llm_total} claims set-based...")
+            set_stats = score_claims_set_based(
+                gateway, CATALOG, SCHEMA, claim_texts,
+                result_cache, LLM_ENDPOINT, durable_store,
+                function_names=set_based_functions,
+                on_progress=lambda done, total: status_text.text(f"Set-based scoring: chunk {done}/{total}")
+            )
+            if set_stats["failed_chunks"]:
+                st.warning(f"⚠️ {set_stats['failed_chunks']} set-based chunks failed; those claims fall back to per-claim calls")
+
+        # Claims cleared by the rules pre-filter are final already
+        ordered_results = [None] * total_claims
+        llm_positions = []
+        for position, ((_, row), cleared, rules_score) in enumerate(
+            zip(st.session_state.batch_claims.iterrows(), rules_cleared, rules_scores['rules_score'])
+        ):
+            if cleared:
+                ordered_results[position] = rules_only_result(row, rules_score)
+                results.append(ordered_results[position])
+            else:
+                llm_positions.append(position)
+        
+        # Pipelined execution: rows are read lazily, up to max_concurrency claims
+        # are scored at once, and results arrive here in completion order
+        claim_rows = (row for _, row in llm_claims.iterrows())
+        failed_count = 0
+        
+        for idx, row, result, error in run_pipelined(
+            claim_rows,
+            lambda claim_row: process_claim(claim_row, depth_value, packed),
+            max_concurrency=max_concurrency
+        ):
+            if error is not None:
+                result = failed_claim_result(row, error)
+                failed_count += 1
+            result['rules_score'] = float(rules_scores['rules_score'].iloc[llm_positions[idx]])
+            result['scored_by'] = 'llm'
             
-            # Process claim
-            result = process_claim(row, depth_value)
+            ordered_results[llm_positions[idx]] = result
             results.append(result)
             
+            status_text.text(f"Completed {len(results)}/{total_claims}: {row['claim_id']}")
+            
             # Update progress
-            progress_bar.progress((idx + 1) / total_claims)
+            progress_bar.progress(len(results) / total_claims)
             
-            # Show live preview
-            if len(results) > 0:
-                preview_df = pd.DataFrame(results)
-                live_results_placeholder.dataframe(
-                    preview_df[['claim_id', 'verdict', 'fraud_probability', 'fraud_type']].tail(5),
-                    use_container_width=True
-                )
+            # Show live preview (most recently completed claims)
+            preview_df = pd.DataFrame(results)
+            live_results_placeholder.dataframe(
+                preview_df[['claim_id', 'verdict', 'fraud_probability', 'fraud_type']].tail(5),
+                use_container_width=True
+            )
+        
+        # Keep final results in input order
+        results = ordered_results
         
         elapsed_time = time.time() - start_time
         
         # Store results in session state
         st.session_state.batch_results = pd.DataFrame(results)
+        st.session_state.batch_run_id = new_run_id()
         st.session_state.processing_complete = True
         st.session_state.processing_time = elapsed_time
+        st.session_state.rules_summary = {
+            "cleared": sum(rules_cleared), "avoided_calls": rules_avoided_calls, "unfiltered_calls": unfiltered_calls
+        }
+        # Latency of one claim slot, for the next estimate at this depth
+        if llm_total:
+            waves = -(-llm_total // max_concurrency)
+            st.session_state.seconds_per_claim[depth_value] = elapsed_time / waves
         
         # Clear progress indicators
         progress_bar.empty()
@@ -560,6 +728,8 @@ if st.session_state.batch_claims is not None and not st.session_state.batch_clai
         live_results_placeholder.empty()
         
         st.success(f"✅ Processing complete! Analyzed {total_claims} claims in {elapsed_time:.1f} seconds")
+        if failed_count:
+            st.warning(f"⚠️ {failed_count} claims failed and are marked ERROR in the results")
         
         # Force rerun to show results section
         st.rerun()
@@ -593,7 +763,26 @@ if st.session_state.processing_complete and st.session_state.batch_results is no
     with col4:
         processing_time = st.session_state.get('processing_time', 0)
         st.metric("Processing Time", f"{processing_time:.1f}s")
-    
+
+    cache_stats = result_cache.stats()
+    st.caption(
+        f"⚡ Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']} entries)"
+    )
+    rules_summary = st.session_state.get('rules_summary')
+    if rules_summary and rules_summary['cleared']:
+        unfiltered_calls = rules_summary['unfiltered_calls']
+        st.caption(
+            f"🧮 Rules pre-filter: {rules_summary['cleared']} of {total_claims} claims cleared without LLM calls "
+            f"(tagged {RULES_ONLY_TAG}), ~{rules_summary['avoided_calls']:,} of {unfiltered_calls:,} LLM calls avoided "
+            f"({rules_summary['avoided_calls'] / unfiltered_calls if unfiltered_calls else 0:.0%})"
+        )
+    sql_stats = gateway.stats()
+    st.caption(
+        f"🗄️ SQL gateway: {sql_stats['statements']} statements, "
+        f"mean {sql_stats['mean_seconds']:.2f}s, p95 {sql_stats['p95_seconds']:.2f}s, {sql_stats['retries']} retries"
+    )
+
     st.markdown("---")
     
     # Results Table with Filters
@@ -668,10 +857,18 @@ if st.session_state.processing_complete and st.session_state.batch_results is no
             table_name = f"{CATALOG}.{SCHEMA}.batch_results"
             
             with st.spinner(f"Saving to {table_name}..."):
-                success = save_results_to_table(results_df, table_name)
+                run_id = st.session_state.get('batch_run_id') or new_run_id()
+                st.session_state.batch_run_id = run_id
+                save_stats = save_results_to_table(results_df, table_name, run_id)
                 
-                if success:
-                    st.success(f"✅ Results saved to table: {table_name}")
+                if save_stats:
+                    if save_stats.get('warning'):
+                        st.warning(f"⚠️ {save_stats['warning']}")
+                    st.success(f"✅ Saved {save_stats['rows']} results to table: {table_name} (run {run_id})")
+                    st.caption(
+                        f"{save_stats['statements']} statement(s) via {save_stats['method']} load "
+                        f"in {save_stats['seconds']:.1f}s · saving again updates this run instead of duplicating it"
+                    )
                 else:
                     st.error("❌ Failed to save results")
 
@@ -699,6 +896,12 @@ with st.expander("ℹ️ How to Use Batch Processing"):
     - **Standard**: Adds detailed fraud indicator extraction
     - **Deep**: Full analysis including similar case search
     
+    ### Concurrency
+    - Batches larger than a handful of claims are first scored set-based: one SQL statement per chunk of claims
+    - **Max concurrent claims** controls how many claims are scored in parallel
+    - The live preview shows claims as they finish, so order may differ from the input
+    - A claim that fails is marked ERROR without stopping the rest of the batch
+    
     ### Results
     - View summary metrics at the top
     - Filter and sort the detailed results table
@@ -5,11 +5,11 @@ Displays analytics and trends from batch fraud analysis results
 
 import streamlit as st
 import os
-from databricks.sdk import WorkspaceClient
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import time
+from utils.sql_gateway import get_gateway
 
 # Page configuration
 st.set_page_config(
@@ -150,38 +150,19 @@ CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
 SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
 WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID")
 
-# Initialize client
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
-w = get_workspace_client()
+# Shared SQL gateway (one pooled client, caches and retries for every page)
+gateway = get_gateway(WAREHOUSE_ID)
+w = gateway.w
 
 def execute_sql_query(query):
-    """Execute SQL query using Statement Execution API"""
+    """Execute SQL query through the shared SQL gateway"""
     if not w:
         st.error("WorkspaceClient not initialized")
         return None
     
     try:
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
-        
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                return result.result.data_array
-            return []
-        else:
-            st.error(f"Query failed: {result.status.state.value}")
-            return None
+        # Every result chunk, not just the first
+        return gateway.query_rows(query)
     except Exception as e:
         st.error(f"SQL execution error: {e}")
         return None
@@ -274,10 +255,10 @@ def get_top_indicators():
             FROM {CATALOG}.{SCHEMA}.fraud_analysis
             WHERE is_fraudulent = TRUE AND red_flags IS NOT NULL
         """
-        results = execute_sql_query(query)
-        if results:
-            indicators = [r[0] for r in results]
-            indicator_counts = pd.Series(indicators).value_counts().head(10)
+        # One row per red flag across all fraud cases: fetch as Arrow, not JSON rows
+        indicators = gateway.query_df(query)
+        if not indicators.empty:
+            indicator_counts = indicators["indicator"].value_counts().head(10)
             return pd.DataFrame({
                 "Indicator": indicator_counts.index,
                 "Count": indicator_counts.values
@@ -299,9 +280,10 @@ def get_fraud_trends():
             GROUP BY DATE(analysis_timestamp)
             ORDER BY date
         """
-        results = execute_sql_query(query)
-        if results:
-            return pd.DataFrame(results, columns=["Date", "Total Claims", "Fraud Cases"])
+        trends = gateway.query_df(query)
+        if not trends.empty:
+            trends.columns = ["Date", "Total Claims", "Fraud Cases"]
+            return trends
     except Exception as e:
         st.error(f"Error fetching trends: {e}")
     return None
@@ -5,8 +5,8 @@ Find similar historical fraud cases using vector similarity search
 
 import streamlit as st
 import os
-from databricks.sdk import WorkspaceClient
 import pandas as pd
+from utils.sql_gateway import get_gateway
 
 # Page configuration
 st.set_page_config(
@@ -136,38 +136,19 @@ VECTOR_INDEX = f"{CATALOG}.{SCHEMA}.fraud_cases_index"
 CLAIMS_TABLE = f"{CATALOG}.{SCHEMA}.claims_data"
 FRAUD_ANALYSIS_TABLE = f"{CATALOG}.{SCHEMA}.fraud_analysis"
 
-# Initialize WorkspaceClient
-@st.cache_resource
-def get_workspace_client():
-    """Initialize Databricks WorkspaceClient"""
-    try:
-        return WorkspaceClient()
-    except Exception as e:
-        st.error(f"Failed to initialize Databricks client: {e}")
-        return None
-
-w = get_workspace_client()
+# Shared SQL gateway (one pooled client, caches and retries for every page)
+gateway = get_gateway(WAREHOUSE_ID)
+w = gateway.w
 
 def execute_sql_query(query):
-    """Execute SQL query using Statement Execution API"""
+    """Execute SQL query through the shared SQL gateway"""
     if not w:
         st.error("WorkspaceClient not initialized")
         return None
     
     try:
-        result = w.statement_execution.execute_statement(
-            warehouse_id=WAREHOUSE_ID,
-            statement=query,
-            wait_timeout="50s"
-        )
-        
-        if result.status.state.value == "SUCCEEDED":
-            if result.result and result.result.data_array:
-                return result.result.data_array
-            return []
-        else:
-            st.error(f"Query failed: {result.status.state.value}")
-            return None
+        # Every result chunk, not just the first
+        return gateway.query_rows(query)
     except Exception as e:
         st.error(f"SQL execution error: {e}")
         return None
@@ -0,0 +1,165 @@
+"""
+Analysis Graph Utility - Deterministic LangGraph DAG for claim analysis
+
+Alternative to the ReAct agent: instead of an LLM round-trip to choose each
+tool, the stages are wired explicitly.
+
+    START -> classify ──────────┐
+    START -> extract  (spec.) ──┼-> gate -> explain -> summarize -> END
+    START -> search   (spec.) ──┘     └──(clearly legitimate)──> summarize
+
+Extract and vector search run speculatively alongside classify. The gate
+drops their results for clearly legitimate claims, which then skip the
+explanation too. The summary is the only free-form LLM call.
+"""
+
+import json
+import operator
+import os
+import time
+from typing import Annotated, Optional, TypedDict
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.graph import END, START, StateGraph
+
+from utils.durable_cache import NO_FRAUD_TYPE
+
+CLEAR_PROBABILITY_THRESHOLD = float(os.getenv("DAG_CLEAR_THRESHOLD", "0.2"))
+
+SUMMARY_PROMPT = """You are an expert healthcare fraud detection analyst for insurance payers.
+You are given the outputs of a fixed fraud-analysis pipeline for one claim: classification,
+fraud indicators, similar known fraud patterns and an explanation. Some stages may be
+missing when the claim was cleared early. Write the final fraud assessment: verdict,
+the key evidence, and recommended next steps. Use only the evidence provided."""
+
+
+class AnalysisState(TypedDict, total=False):
+    claim_text: str
+    classification: Optional[dict]
+    indicators: Optional[dict]
+    similar_cases: Optional[list]
+    explanation: Optional[dict]
+    summary: str
+    cleared: bool
+    # Parallel branches each report their own stage time
+    timings_ms: Annotated[dict, operator.or_]
+
+
+def _timed(stage: str, fn, *args):
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        result = {"error": str(e)}
+    return result, {stage: (time.perf_counter() - start) * 1000}
+
+
+def is_clearly_legitimate(classification, threshold: float = CLEAR_PROBABILITY_THRESHOLD) -> bool:
+    """Not flagged and fraud probability below threshold (errors are never cleared)"""
+    if not isinstance(classification, dict) or "error" in classification:
+        return False
+    try:
+        probability = float(classification.get("fraud_probability", 1.0))
+    except (TypeError, ValueError):
+        return False
+    return not classification.get("is_fraudulent") and probability < threshold
+
+
+def build_analysis_graph(classify, extract, search, explain, llm,
+                         clear_threshold: float = CLEAR_PROBABILITY_THRESHOLD):
+    """
+    Compile the DAG.
+
+    classify/extract take claim_text and return dicts, search takes a query
+    and returns a list of matches, explain takes (claim_text, is_fraudulent,
+    fraud_type). llm is a chat model used once, for the summary.
+    """
+
+    def classify_node(state):
+        result, timing = _timed("classify", classify, state["claim_text"])
+        return {"classification": result, "timings_ms": timing}
+
+    def extract_node(state):
+        result, timing = _timed("extract", extract, state["claim_text"])
+        return {"indicators": result, "timings_ms": timing}
+
+    def search_node(state):
+        result, timing = _timed("search", search, state["claim_text"][:1000])
+        return {"similar_cases": result if isinstance(result, list) else [], "timings_ms": timing}
+
+    def gate_node(state):
+        if is_clearly_legitimate(state.get("classification"), clear_threshold):
+            # Discard speculative work so it doesn't color the summary
+            return {"cleared": True, "indicators": None, "similar_cases": None}
+        return {"cleared": False}
+
+    def explain_node(state):
+        classification = state.get("classification") or {}
+        result, timing = _timed(
+            "explain", explain, state["claim_text"],
+            bool(classification.get("is_fraudulent", False)),
+            classification.get("fraud_type") or NO_FRAUD_TYPE
+        )
+        return {"explanation": result, "timings_ms": timing}
+
+    def summarize_node(state):
+        evidence = {
+            "classification": state.get("classification"),
+            "indicators": state.get("indicators"),
+            "similar_cases": state.get("similar_cases"),
+            "explanation": state.get("explanation"),
+            "cleared_early": state.get("cleared", False),
+        }
+        start = time.perf_counter()
+        response = llm.invoke([
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Claim:\n{state['claim_text']}\n\nPipeline outputs:\n{json.dumps(evidence, indent=2, default=str)}")
+        ])
+        return {
+            "summary": getattr(response, "content", str(response)),
+            "timings_ms": {"summarize": (time.perf_counter() - start) * 1000},
+        }
+
+    graph = StateGraph(AnalysisState)
+    graph.add_node("classify", classify_node)
+    graph.add_node("extract", extract_node)
+    graph.add_node("search", search_node)
+    graph.add_node("gate", gate_node)
+    graph.add_node("explain", explain_node)
+    graph.add_node("summarize", summarize_node)
+
+    for node in ("classify", "extract", "search"):
+        graph.add_edge(START, node)
+    graph.add_edge(["classify", "extract", "search"], "gate")
+    graph.add_conditional_edges(
+        "gate",
+        lambda state: "summarize" if state.get("cleared") else "explain",
+        {"summarize": "summarize", "explain": "explain"}
+    )
+    graph.add_edge("explain", "summarize")
+    graph.add_edge("summarize", END)
+    return graph.compile()
+
+
+def run_analysis_graph(graph, claim_text: str) -> dict:
+    """Invoke the DAG; the returned state includes total_ms"""
+    start = time.perf_counter()
+    state = graph.invoke({"claim_text": claim_text, "timings_ms": {}})
+    state["total_ms"] = (time.perf_counter() - start) * 1000
+    return state
+
+
+def stage_results(state: dict) -> list:
+    """Stages that ran, as [{'name', 'args', 'result'}] in the tool-call format the pages render"""
+    claim_text = state.get("claim_text", "")
+    stages = [
+        ("classify_claim", {"claim_text": claim_text}, state.get("classification")),
+        ("extract_indicators", {"claim_text": claim_text}, state.get("indicators")),
+        ("search_fraud_patterns", {"query": claim_text[:1000]}, state.get("similar_cases")),
+        ("generate_explanation", {"claim_text": claim_text}, state.get("explanation")),
+    ]
+    return [
+        {"name": name, "args": args, "result": json.dumps(result, indent=2, default=str)}
+        for name, args, result in stages
+        if result is not None
+    ]
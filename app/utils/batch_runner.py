@@ -0,0 +1,51 @@
+"""
+Batch Runner Utility - Bounded concurrent pipeline for claim scoring
+
+reader (lazy iteration over claims) -> N concurrent scorers -> writer (caller)
+
+The caller consumes results in completion order on its own thread, which
+keeps all Streamlit UI updates on the script thread.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.statement_runner import session_context_initializer
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+def run_pipelined(items, worker, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+    """
+    Run worker(item) over items with at most max_concurrency calls in flight.
+
+    Yields (index, item, result, error) tuples as each call finishes. A failing
+    item yields its exception as `error` (result is None) and does not stop
+    the rest of the batch.
+    """
+    max_concurrency = max(1, int(max_concurrency))
+    source = iter(enumerate(items))
+    in_flight = {}
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="claim-scorer",
+                            initializer=session_context_initializer()) as pool:
+
+        def refill():
+            while len(in_flight) < max_concurrency:
+                try:
+                    index, item = next(source)
+                except StopIteration:
+                    return
+                in_flight[pool.submit(worker, item)] = (index, item)
+
+        refill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item = in_flight.pop(future)
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                yield index, item, result, error
+            refill()
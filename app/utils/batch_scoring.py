@@ -0,0 +1,228 @@
+"""
+Batch Scoring Utility - Set-based UC function evaluation
+
+Ships a chunk of claims to the warehouse as an inline VALUES table and
+evaluates fraud_classify / fraud_extract_indicators over the whole chunk in
+one statement, so AI_QUERY is parallelized by the warehouse instead of
+paying statement overhead once per claim. Results land in the shared result
+cache, where the per-claim code paths pick them up.
+
+score_claims_packed() additionally packs CLASSIFY_BATCH_SIZE claims into
+each fraud_classify_batch call, so the classification instructions are
+sent once per pack instead of once per claim. Packed classifications are
+cached under their own function name, so only packed runs read them.
+"""
+
+import json
+import os
+
+from utils.batch_runner import run_pipelined
+from utils.result_cache import make_cache_key
+from utils.sql_gateway import sql_str
+from utils.statement_runner import current_session_id
+
+SET_BASED_MIN_CLAIMS = int(os.getenv("SET_BASED_MIN_CLAIMS", "5"))
+SET_BASED_CHUNK_SIZE = int(os.getenv("SET_BASED_CHUNK_SIZE", "100"))
+SET_BASED_CHUNK_CONCURRENCY = int(os.getenv("SET_BASED_CHUNK_CONCURRENCY", "4"))
+SET_BASED_FUNCTIONS = ("fraud_classify", "fraud_extract_indicators")
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "8"))
+# Cache function name of classifications from packs; 09 writes packed mode results under the same name
+PACKED_CLASSIFY_FUNCTION = "fraud_classify_batch"
+
+CHUNK_TIMEOUT_SECONDS = 600
+
+
+def build_set_based_query(catalog: str, schema: str, function_names, claim_texts) -> str:
+    """One SELECT that applies every function to every claim in the chunk"""
+    values_sql = ",\n        ".join(
+        f"({idx}, {sql_str(text)})" for idx, text in enumerate(claim_texts)
+    )
+    columns_sql = ",\n    ".join(
+        f"{catalog}.{schema}.{fn}(claim_text) AS {fn}" for fn in function_names
+    )
+    return f"""
+SELECT
+    idx,
+    {columns_sql}
+FROM VALUES
+        {values_sql}
+    AS claims(idx, claim_text)
+"""
+
+
+def _run_chunk(gateway, statement: str, session_id=None):
+    """Execute one chunk statement through the gateway; rows from every result chunk"""
+    try:
+        return gateway.query_rows(statement, deadline_seconds=CHUNK_TIMEOUT_SECONDS, session_id=session_id)
+    except RuntimeError as e:
+        raise RuntimeError(f"Set-based scoring chunk failed: {e}") from e
+
+
+def score_claims_set_based(gateway, catalog: str, schema: str, claim_texts,
+                           result_cache, llm_endpoint: str, durable_store=None,
+                           function_names=SET_BASED_FUNCTIONS,
+                           chunk_size: int = SET_BASED_CHUNK_SIZE,
+                           on_progress=None) -> dict:
+    """
+    Score claims in chunks of chunk_size with one statement per chunk.
+
+    Only texts missing from result_cache are shipped (deduplicated), and raw
+    results are written to result_cache (and durable_store, if given) under
+    the same keys call_uc_function uses. on_progress(done, total) is called
+    on the caller's thread after each chunk. Returns counters.
+    """
+    pending = []
+    seen = set()
+    for text in claim_texts:
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        if any(result_cache.get(make_cache_key(fn, [text], llm_endpoint)) is None for fn in function_names):
+            pending.append(text)
+
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    stats = {"claims": len(pending), "statements": 0, "scored": 0, "failed_chunks": 0}
+    if not chunks:
+        return stats
+
+    # Chunks run on worker threads; tie their statements to the caller's session
+    session_id = current_session_id()
+
+    def score_chunk(chunk):
+        statement = build_set_based_query(catalog, schema, function_names, chunk)
+        return _run_chunk(gateway, statement, session_id)
+
+    for done, (_, chunk, rows, error) in enumerate(
+        run_pipelined(chunks, score_chunk, max_concurrency=SET_BASED_CHUNK_CONCURRENCY), start=1
+    ):
+        stats["statements"] += 1
+        if error is not None:
+            # Leave these claims uncached; the per-claim path will retry them
+            stats["failed_chunks"] += 1
+        else:
+            for row in rows:
+                text = chunk[int(row[0])]
+                for fn, raw in zip(function_names, row[1:]):
+                    if raw is None:
+                        continue
+                    result_cache.put(make_cache_key(fn, [text], llm_endpoint), raw)
+                    if durable_store is not None:
+                        durable_store.write_back(fn, [text], raw)
+                stats["scored"] += 1
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    return stats
+
+
+
+def build_packed_classify_query(catalog: str, schema: str, packs) -> str:
+    """One SELECT calling fraud_classify_batch_raw once per pack; claim ids are positions in the pack"""
+    def claims_sql(pack):
+        return ", ".join(
+            f"NAMED_STRUCT('id', '{pos}', 'text', {sql_str(text)})" for pos, text in enumerate(pack)
+        )
+
+    values_sql = ",\n        ".join(
+        f"({idx}, ARRAY({claims_sql(pack)}))" for idx, pack in enumerate(packs)
+    )
+    return f"""
+SELECT
+    pack,
+    {catalog}.{schema}.fraud_classify_batch_raw(claims) AS response
+FROM VALUES
+        {values_sql}
+    AS packs(pack, claims)
+"""
+
+
+def unpack_classifications(response, count: int):
+    """
+    Per-claim classifications of a fraud_classify_batch_raw response, in pack order.
+
+    None when the call failed, the response didn't parse, or its ids don't
+    line up one-to-one with the pack's claims; the caller then scores those
+    claims one fraud_classify call at a time.
+    """
+    try:
+        if isinstance(response, str):
+            response = json.loads(response)
+        if not response or response.get("errorMessage") or not response.get("result"):
+            return None
+        results = json.loads(response["result"]).get("results")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+    if not isinstance(results, list) or len(results) != count:
+        return None
+    by_id = {str(item.get("id")): item for item in results if isinstance(item, dict)}
+    if set(by_id) != {str(pos) for pos in range(count)}:
+        return None
+    return [
+        {key: value for key, value in by_id[str(pos)].items() if key != "id"}
+        for pos in range(count)
+    ]
+
+
+def packed_cache_key(claim_text: str, llm_endpoint: str) -> str:
+    """result_cache key of a classification that came out of a fraud_classify_batch pack"""
+    return make_cache_key(PACKED_CLASSIFY_FUNCTION, [claim_text], llm_endpoint)
+
+
+def score_claims_packed(gateway, catalog: str, schema: str, claim_texts,
+                        result_cache, llm_endpoint: str, durable_store=None,
+                        batch_size: int = CLASSIFY_BATCH_SIZE,
+                        chunk_size: int = SET_BASED_CHUNK_SIZE,
+                        on_progress=None) -> dict:
+    """
+    Classify claims batch_size per fraud_classify_batch call, chunk_size claims per statement.
+
+    Only texts without a cached fraud_classify or packed result are packed.
+    Each claim's classification goes into result_cache (and durable_store)
+    under PACKED_CLASSIFY_FUNCTION rather than fraud_classify, so only packed
+    runs read it back (see packed_cache_key()); claims of packs
+    that failed or didn't line up stay uncached and fall back to per-claim
+    calls. on_progress(done, total) is called after each chunk. Returns counters.
+    """
+    def cached(text):
+        return (result_cache.get(packed_cache_key(text, llm_endpoint)) is not None
+                or result_cache.get(make_cache_key("fraud_classify", [text], llm_endpoint)) is not None)
+
+    pending = list(dict.fromkeys(text for text in claim_texts if text and not cached(text)))
+
+    packs = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    packs_per_chunk = max(1, chunk_size // batch_size)
+    chunks = [packs[i:i + packs_per_chunk] for i in range(0, len(packs), packs_per_chunk)]
+    stats = {"claims": len(pending), "packs": len(packs), "statements": 0, "scored": 0,
+             "misaligned_packs": 0, "failed_chunks": 0}
+    if not chunks:
+        return stats
+
+    session_id = current_session_id()
+
+    def score_chunk(chunk):
+        return _run_chunk(gateway, build_packed_classify_query(catalog, schema, chunk), session_id)
+
+    for done, (_, chunk, rows, error) in enumerate(
+        run_pipelined(chunks, score_chunk, max_concurrency=SET_BASED_CHUNK_CONCURRENCY), start=1
+    ):
+        stats["statements"] += 1
+        if error is not None:
+            stats["failed_chunks"] += 1
+        else:
+            for row in rows:
+                pack = chunk[int(row[0])]
+                classifications = unpack_classifications(row[1], len(pack))
+                if classifications is None:
+                    stats["misaligned_packs"] += 1
+                    continue
+                for text, classification in zip(pack, classifications):
+                    raw = json.dumps(classification)
+                    result_cache.put(packed_cache_key(text, llm_endpoint), raw)
+                    if durable_store is not None:
+                        durable_store.write_back(PACKED_CLASSIFY_FUNCTION, [text], raw)
+                    stats["scored"] += 1
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    return stats
@@ -0,0 +1,173 @@
+"""
+Cost Estimator Utility - Dry-run LLM call, token, cost and time estimates
+
+Predicts what a batch will cost before any AI_QUERY call is made: calls per
+UC function, input tokens (claim text + prompt template) and output tokens,
+dollar cost from per-token prices, and wall time from measured throughput.
+
+Pure Python with no Databricks or Streamlit imports, so the setup notebooks
+use it too (sys.path.append(os.path.abspath('../app'))).
+"""
+
+import json
+import math
+import os
+import re
+
+# Rough tokenizer ratio for English claim text
+CHARS_PER_TOKEN = 4.0
+
+
+def text_tokens(chars: float) -> int:
+    """Approximate token count of chars characters of text"""
+    return int(math.ceil(max(chars, 0) / CHARS_PER_TOKEN))
+
+
+def sql_literal_tokens(prompt_sql: str) -> int:
+    """Tokens in the string literals of a SQL prompt template (the text sent besides the claim)"""
+    literals = re.findall(r"'((?:[^']|'')*)'", prompt_sql)
+    return text_tokens(sum(len(literal.replace("\\n", "\n")) for literal in literals))
+
+
+def prompt_overhead_tokens(function_prompts: dict) -> dict:
+    """Prompt text around the claim per function, in tokens, from {function: SQL prompt template}"""
+    return {function_name: sql_literal_tokens(prompt) for function_name, prompt in function_prompts.items()}
+
+
+def _template_overhead_tokens() -> dict:
+    """
+    Prompt overhead of the templates in shared/prompts.py.
+
+    The setup notebooks and generate_app_yaml.py import the templates; the
+    deployed app ships without shared/ and reads PROMPT_OVERHEAD_TOKENS,
+    which generate_app_yaml.py computes from them.
+    """
+    try:
+        from shared.prompts import FUNCTION_PROMPTS
+    except ImportError:
+        return json.loads(os.getenv("PROMPT_OVERHEAD_TOKENS") or "{}")
+    return prompt_overhead_tokens(FUNCTION_PROMPTS)
+
+
+# Prompt text around the claim per function, in tokens
+PROMPT_OVERHEAD_TOKENS = _template_overhead_tokens()
+
+# Typical size of each function's JSON response (per claim for the packed functions);
+# LLM_OUTPUT_TOKENS (JSON, same keys) overrides them with sizes measured on the endpoint
+OUTPUT_TOKENS = {
+    "fraud_classify": 60,
+    "fraud_classify_batch": 70,
+    "fraud_extract_indicators": 120,
+    "fraud_generate_explanation": 250,
+    "fraud_analyze_full": 430,
+    "fraud_analyze_provider": 80,
+    **json.loads(os.getenv("LLM_OUTPUT_TOKENS") or "{}"),
+}
+
+# Per-claim latency used until a run has been measured, by batch page depth
+DEFAULT_SECONDS_PER_CLAIM = {
+    "Quick": 2.0,
+    "Standard": 4.0,
+    "Deep": 6.0,
+    "Single-pass": 3.0,
+}
+
+# UC functions each batch page depth calls per claim (Deep adds vector search, not an LLM call)
+DEPTH_FUNCTIONS = {
+    "Quick": ("fraud_classify",),
+    "Standard": ("fraud_classify", "fraud_extract_indicators"),
+    "Deep": ("fraud_classify", "fraud_extract_indicators"),
+    "Single-pass": ("fraud_analyze_full",),
+}
+
+# USD per million tokens; set to the serving endpoint's pricing
+INPUT_COST_PER_MTOK = float(os.getenv("LLM_INPUT_COST_PER_MTOK", "3.0"))
+OUTPUT_COST_PER_MTOK = float(os.getenv("LLM_OUTPUT_COST_PER_MTOK", "15.0"))
+
+
+def estimate_llm_usage(num_claims: int, total_claim_chars: int, stage_fractions: dict,
+                       prompt_overhead_tokens: dict = None, output_tokens: dict = None,
+                       claims_per_call: dict = None) -> dict:
+    """
+    LLM calls and tokens per UC function.
+
+    stage_fractions maps function name -> share of the claims that reach it
+    (1.0 for every claim, lower for cascade-gated or cached stages).
+    claims_per_call maps packed functions (fraud_classify_batch,
+    fraud_analyze_provider) to the claims sent per call, which share one
+    prompt overhead.
+    Returns {function: {'calls', 'input_tokens', 'output_tokens'}} plus
+    a 'total' entry.
+    """
+    overhead = {**PROMPT_OVERHEAD_TOKENS, **(prompt_overhead_tokens or {})}
+    response = {**OUTPUT_TOKENS, **(output_tokens or {})}
+    avg_claim_tokens = text_tokens(total_claim_chars / num_claims) if num_claims else 0
+
+    usage = {}
+    for function_name, fraction in stage_fractions.items():
+        claims = int(math.ceil(num_claims * max(0.0, min(fraction, 1.0))))
+        calls = int(math.ceil(claims / max(1, (claims_per_call or {}).get(function_name, 1))))
+        usage[function_name] = {
+            "calls": calls,
+            "input_tokens": claims * avg_claim_tokens + calls * overhead.get(function_name, 0),
+            "output_tokens": claims * response.get(function_name, 0),
+        }
+    usage["total"] = {
+        key: sum(stage[key] for stage in usage.values())
+        for key in ("calls", "input_tokens", "output_tokens")
+    }
+    return usage
+
+
+def estimate_cost(usage: dict, input_cost_per_mtok: float = INPUT_COST_PER_MTOK,
+                  output_cost_per_mtok: float = OUTPUT_COST_PER_MTOK) -> float:
+    """Dollar cost of an estimate_llm_usage() result"""
+    total = usage["total"]
+    return (total["input_tokens"] * input_cost_per_mtok + total["output_tokens"] * output_cost_per_mtok) / 1_000_000
+
+
+def estimate_wall_seconds(num_claims: int, claims_per_second: float = None,
+                          seconds_per_claim: float = None, concurrency: int = 1) -> float:
+    """
+    Wall time from measured throughput.
+
+    claims_per_second is an aggregate rate (e.g. from fraud_batch_progress);
+    otherwise seconds_per_claim is the latency of one claim, and claims run
+    concurrency at a time.
+    """
+    if not num_claims:
+        return 0.0
+    if claims_per_second:
+        return num_claims / claims_per_second
+    waves = math.ceil(num_claims / max(1, concurrency))
+    return waves * (seconds_per_claim or 0.0)
+
+
+def estimate_batch(num_claims: int, total_claim_chars: int, stage_fractions: dict,
+                   claims_per_second: float = None, seconds_per_claim: float = None,
+                   concurrency: int = 1, prompt_overhead_tokens: dict = None,
+                   input_cost_per_mtok: float = INPUT_COST_PER_MTOK,
+                   output_cost_per_mtok: float = OUTPUT_COST_PER_MTOK,
+                   claims_per_call: dict = None, output_tokens: dict = None) -> dict:
+    """Usage, cost and wall time for one batch, as a dict"""
+    usage = estimate_llm_usage(num_claims, total_claim_chars, stage_fractions, prompt_overhead_tokens,
+                               output_tokens, claims_per_call)
+    return {
+        "claims": num_claims,
+        "usage": usage,
+        "llm_calls": usage["total"]["calls"],
+        "input_tokens": usage["total"]["input_tokens"],
+        "output_tokens": usage["total"]["output_tokens"],
+        "cost_usd": estimate_cost(usage, input_cost_per_mtok, output_cost_per_mtok),
+        "seconds": estimate_wall_seconds(num_claims, claims_per_second, seconds_per_claim, concurrency),
+    }
+
+
+def format_duration(seconds: float) -> str:
+    """'45s', '12m 30s' or '3h 05m'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {(seconds % 3600) // 60:02d}m"
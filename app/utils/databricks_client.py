@@ -2,33 +2,17 @@
 Databricks Client Utility
 """
 
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
 import pandas as pd
-import streamlit as st
 
-@st.cache_resource
-def get_workspace_client():
-    """Get cached WorkspaceClient"""
-    return WorkspaceClient()
+from utils.sql_gateway import get_gateway, get_workspace_client
 
 def execute_sql(cfg, query: str) -> pd.DataFrame:
     """Execute SQL query and return DataFrame"""
-    w = get_workspace_client()
-    
-    response = w.statement_execution.execute_statement(
-        warehouse_id=cfg.warehouse_id,
-        statement=query,
-        wait_timeout='30s'
-    )
-    
-    if response.status.state == StatementState.SUCCEEDED:
-        if response.result and response.result.data_array:
-            columns = [col.name for col in response.manifest.schema.columns]
-            data = response.result.data_array
-            return pd.DataFrame(data, columns=columns)
-    
-    return pd.DataFrame()
+    try:
+        # All chunks, as Arrow record batches rather than JSON cells
+        return get_gateway(cfg.warehouse_id).query_df(query)
+    except Exception:
+        return pd.DataFrame()
 
 def get_fraud_statistics(cfg) -> dict:
     """Get fraud statistics from claims table"""
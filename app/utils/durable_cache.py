@@ -0,0 +1,240 @@
+"""
+Durable Cache Utility - Delta-backed store for UC fraud function results
+
+Cross-process, cross-restart counterpart to utils.result_cache. Results are
+keyed by claim-text hash + function + extra arguments + prompt version in the
+fraud_result_cache table, which setup/09_batch_analyze_claims.py reads and
+writes with the same key scheme. Statements go through the SqlGateway the
+store is attached to (get_gateway() wires the process-wide pair).
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+
+import streamlit as st
+
+from utils.result_cache import make_cache_key, normalize_claim_text
+from utils.sql_gateway import sql_str
+
+CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
+SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
+WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID")
+PROMPT_VERSION = os.getenv("PROMPT_VERSION", "v1")
+RESULT_CACHE_TABLE = f"{CATALOG}.{SCHEMA}.fraud_result_cache"
+
+LOOKUP_CHUNK_SIZE = 500
+FLUSH_BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 2.0
+NEGATIVE_TTL_SECONDS = 120
+STATEMENT_DEADLINE_SECONDS = 60
+
+
+def text_hash(claim_text: str) -> str:
+    """SHA-256 of normalized claim text; matches sha2(trim(regexp_replace(...)), 256) in 09"""
+    return hashlib.sha256(normalize_claim_text(claim_text).encode("utf-8")).hexdigest()
+
+
+# fraud_type passed to fraud_generate_explanation when the classification has none; equal to
+# NO_FRAUD_TYPE in shared/prompts.py (the app ships without shared/), which 09 uses in its signatures
+NO_FRAUD_TYPE = "None"
+
+
+def arg_signature(extra_args) -> str:
+    """Stable string for arguments after claim_text ('' for single-argument functions)"""
+    parts = []
+    for value in extra_args:
+        if isinstance(value, bool):
+            parts.append("true" if value else "false")
+        else:
+            parts.append(str(value))
+    return "|".join(parts)
+
+
+class DurableResultStore:
+    """Bulk lookup and asynchronous write-back against fraud_result_cache"""
+
+    def __init__(self, w, warehouse_id: str = WAREHOUSE_ID, table: str = RESULT_CACHE_TABLE,
+                 prompt_version: str = PROMPT_VERSION):
+        self.w = w
+        self.warehouse_id = warehouse_id
+        self.table = table
+        self.prompt_version = prompt_version
+        # Set by the SqlGateway this store is passed to
+        self.gateway = None
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_errors = 0
+        self.last_lookup_error = None
+        self.writes = 0
+        self.write_errors = 0
+        self._missing = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    def _key(self, function_name: str, args):
+        args = list(args)
+        return (function_name, text_hash(args[0]), arg_signature(args[1:]))
+
+    def _available(self) -> bool:
+        return bool(self.w and self.warehouse_id and self.gateway)
+
+    def lookup(self, function_name: str, args):
+        """Return the stored raw result for one call, or None"""
+        return self.lookup_many(function_name, [args]).get(self._key(function_name, args)[1:])
+
+    def lookup_many(self, function_name: str, arg_lists) -> dict:
+        """
+        One SQL round-trip per LOOKUP_CHUNK_SIZE calls.
+
+        Returns {(text_hash, arg_signature): raw_result} for stored entries.
+        Keys found missing are remembered briefly so the per-call lookups
+        that follow a bulk prefetch don't hit the warehouse again. Keys of a
+        chunk whose lookup failed are not: they are counted in lookup_errors
+        and looked up again next time.
+        """
+        if not self._available():
+            return {}
+
+        now = time.monotonic()
+        wanted = set()
+        with self._lock:
+            for args in arg_lists:
+                key = self._key(function_name, args)
+                if self._missing.get(key, 0) < now:
+                    wanted.add(key[1:])
+        if not wanted:
+            return {}
+
+        found = {}
+        looked_up = []
+        wanted = sorted(wanted)
+        for start in range(0, len(wanted), LOOKUP_CHUNK_SIZE):
+            chunk = wanted[start:start + LOOKUP_CHUNK_SIZE]
+            keys_sql = ", ".join(f"({sql_str(h)}, {sql_str(sig)})" for h, sig in chunk)
+            query = f"""
+                SELECT text_hash, arg_signature, MAX_BY(result_json, created_at) AS result_json
+                FROM {self.table}
+                WHERE function_name = {sql_str(function_name)}
+                  AND prompt_version = {sql_str(self.prompt_version)}
+                  AND (text_hash, arg_signature) IN ({keys_sql})
+                GROUP BY text_hash, arg_signature
+            """
+            self.lookups += 1
+            try:
+                # Rows from every result chunk; raises unless the lookup SUCCEEDED
+                rows = self.gateway.query_rows(query, deadline_seconds=STATEMENT_DEADLINE_SECONDS)
+            except Exception as e:
+                with self._lock:
+                    self.lookup_errors += 1
+                    self.last_lookup_error = f"{type(e).__name__}: {e}"
+                continue
+            for row in rows:
+                found[(row[0], row[1])] = row[2]
+            looked_up.extend(chunk)
+
+        self.hits += len(found)
+        expires_at = now + NEGATIVE_TTL_SECONDS
+        with self._lock:
+            if len(self._missing) > 10 * LOOKUP_CHUNK_SIZE:
+                self._missing = {k: v for k, v in self._missing.items() if v >= now}
+            for key in looked_up:
+                if key not in found:
+                    self._missing[(function_name,) + key] = expires_at
+        return found
+
+    def warm(self, cache, claim_texts, function_names, llm_endpoint: str) -> int:
+        """
+        Bulk-load stored results for a batch of claims into the in-memory cache.
+
+        One lookup per function for the whole batch; returns entries loaded.
+        """
+        claim_texts = [text for text in claim_texts if text]
+        loaded = 0
+        for function_name in function_names:
+            found = self.lookup_many(function_name, [[text] for text in claim_texts])
+            for text in claim_texts:
+                raw = found.get((text_hash(text), ""))
+                if raw is not None:
+                    cache.put(make_cache_key(function_name, [text], llm_endpoint), raw)
+                    loaded += 1
+        return loaded
+
+    def write_back(self, function_name: str, args, raw_result):
+        """Queue a result for asynchronous MERGE into the durable cache"""
+        if raw_result is None or not self._available():
+            return
+        h, sig = self._key(function_name, args)[1:]
+        with self._lock:
+            self._missing.pop((function_name, h, sig), None)
+        self._queue.put((function_name, h, sig, raw_result))
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._writer_loop, name="durable-cache-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < FLUSH_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        rows_sql = ",\n".join(
+            f"({sql_str(fn)}, {sql_str(h)}, {sql_str(sig)}, {sql_str(raw)})"
+            for fn, h, sig, raw in batch
+        )
+        statement = f"""
+            MERGE INTO {self.table} AS t
+            USING (
+                SELECT DISTINCT * FROM VALUES {rows_sql}
+                AS v(function_name, text_hash, arg_signature, result_json)
+            ) AS s
+            ON t.function_name = s.function_name
+               AND t.text_hash = s.text_hash
+               AND t.arg_signature = s.arg_signature
+               AND t.prompt_version = {sql_str(self.prompt_version)}
+            WHEN NOT MATCHED THEN INSERT
+                (text_hash, function_name, arg_signature, prompt_version, result_json, source, created_at)
+            VALUES
+                (s.text_hash, s.function_name, s.arg_signature, {sql_str(self.prompt_version)},
+                 s.result_json, 'app', current_timestamp())
+        """
+        try:
+            self.gateway.execute(statement, deadline_seconds=STATEMENT_DEADLINE_SECONDS)
+            self.writes += len(batch)
+        except Exception:
+            self.write_errors += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "lookup_errors": self.lookup_errors,
+            "last_lookup_error": self.last_lookup_error,
+            "writes": self.writes,
+            "write_errors": self.write_errors,
+            "pending_writes": self._queue.qsize(),
+        }
+
+
+@st.cache_resource
+def get_durable_store(_w) -> DurableResultStore:
+    """Process-wide durable store (the WorkspaceClient argument is not hashed)"""
+    return DurableResultStore(_w)
@@ -2,25 +2,34 @@
 Fraud Agent Utility - Core agent logic for Streamlit app
 """
 
-from databricks.sdk import WorkspaceClient
 from databricks_langchain import ChatDatabricks
 from databricks.vector_search.client import VectorSearchClient
-from databricks.sdk.service.sql import StatementState
 from langchain_core.tools import Tool
 from langchain_core.messages import SystemMessage
 from langgraph.prebuilt import create_react_agent
 from pydantic import BaseModel, Field
 import json
+import os
 import time
-import backoff
 import streamlit as st
 
+from utils.sql_gateway import get_gateway
+from utils.analysis_graph import build_analysis_graph, run_analysis_graph
+from utils.batch_scoring import SET_BASED_FUNCTIONS, SET_BASED_MIN_CLAIMS, score_claims_set_based
+
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+
+
 class FraudAgent:
     """Fraud detection agent wrapper for Streamlit"""
     
     def __init__(self, cfg):
         self.cfg = cfg
-        self.w = WorkspaceClient()
+        # Shared with every page: one client, one result cache, one durable store
+        self.gateway = get_gateway(cfg.warehouse_id)
+        self.w = self.gateway.w
+        self.cache = self.gateway.result_cache
+        self.store = self.gateway.durable_store
         self.llm = ChatDatabricks(endpoint=cfg.llm_endpoint)
         self.vsc = VectorSearchClient(disable_notice=True)
         
@@ -33,28 +42,37 @@ class FraudAgent:
         
         self.tools = self._create_tools()
         self.agent = self._create_agent()
+        self.dag = self._create_dag()
+        self.last_latency_ms = {}
     
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
     def call_uc_function(self, function_name: str, parameters: dict) -> dict:
-        """Call UC function via Statement Execution API"""
-        param_values = []
-        for key, value in parameters.items():
-            if isinstance(value, str):
-                escaped = value.replace("'", "''")
-                param_values.append(f"'{escaped}'")
-            else:
-                param_values.append(str(value))
-        
-        query = f"SELECT {self.cfg.catalog}.{self.cfg.schema}.{function_name}({', '.join(param_values)}) as result"
-        response = self.w.statement_execution.execute_statement(
-            warehouse_id=self.cfg.warehouse_id,
-            statement=query,
-            wait_timeout='30s'
-        )
-        
-        if response.status.state == StatementState.SUCCEEDED and response.result and response.result.data_array:
-            return response.result.data_array[0][0]
-        return None
+        """Call UC function through the shared SQL gateway (cached, raw result)"""
+        return self.gateway.call_function(function_name, *parameters.values())
+    
+    def warm_cache(self, claim_texts, function_names=("fraud_classify", "fraud_extract_indicators")) -> int:
+        """Bulk-load durable cache entries for a batch of claims (one lookup per function)"""
+        return self.store.warm(self.cache, claim_texts, function_names, self.cfg.llm_endpoint)
+    
+    def score_claims(self, claim_texts, function_names=SET_BASED_FUNCTIONS) -> list:
+        """
+        Run UC functions over many claims.
+
+        Above SET_BASED_MIN_CLAIMS pending claims, uncached texts are scored
+        set-based (one statement per chunk) before the per-claim lookups,
+        which are then served from the cache.
+        """
+        claim_texts = list(claim_texts)
+        self.warm_cache(claim_texts, function_names)
+        if len(claim_texts) > SET_BASED_MIN_CLAIMS:
+            score_claims_set_based(
+                self.gateway, self.cfg.catalog, self.cfg.schema, claim_texts,
+                self.cache, self.cfg.llm_endpoint, self.store,
+                function_names=function_names
+            )
+        return [
+            {fn: self.call_uc_function(fn, {"claim_text": text}) for fn in function_names}
+            for text in claim_texts
+        ]
     
     def search_fraud_cases(self, query: str, num_results: int = 3) -> str:
         """Search knowledge base using Vector Search"""
@@ -156,16 +174,58 @@ Strategy:
 - COMPLEX: Add search_fraud_cases
 - TRENDS: Use query_fraud_trends
 
+Tools are independent: when you need several, call them together in one step
+(multiple tool calls in a single response) - they run in parallel.
+
 Always explain reasoning and cite evidence.""")
         
         return create_react_agent(self.llm, self.tools, messages_modifier=system_message)
     
-    def analyze_claim(self, claim_text: str):
-        """Analyze a claim and return structured result"""
-        result = self.agent.invoke({
-            "messages": [("user", f"Analyze this claim for fraud:\n{claim_text}")]
-        })
+    def _create_dag(self):
+        """Create the deterministic analysis DAG (see utils.analysis_graph)"""
+        def search(query):
+            result = json.loads(self.search_fraud_cases(query))
+            return result if isinstance(result, list) else []
+        
+        return build_analysis_graph(
+            classify=lambda text: self._parsed(self.call_uc_function("fraud_classify", {"claim_text": text})),
+            extract=lambda text: self._parsed(self.call_uc_function("fraud_extract_indicators", {"claim_text": text})),
+            search=search,
+            explain=lambda text, is_fraud, fraud_type: self._parsed(self.call_uc_function(
+                "fraud_generate_explanation",
+                {"claim_text": text, "is_fraudulent": is_fraud, "fraud_type": fraud_type}
+            )),
+            llm=self.llm
+        )
+    
+    @staticmethod
+    def _parsed(raw):
+        if isinstance(raw, str):
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return raw
+        return raw
+    
+    def analyze_claim(self, claim_text: str, mode: str = "react"):
+        """
+        Analyze a claim and return structured result.
+        
+        mode="react" runs the ReAct agent (returns its messages); mode="dag"
+        runs the deterministic DAG (returns its state). Both include latency_ms,
+        and the last latency per mode is kept in self.last_latency_ms.
+        """
+        start = time.time()
+        if mode == "dag":
+            result = run_analysis_graph(self.dag, claim_text)
+        else:
+            result = self.agent.invoke(
+                {"messages": [("user", f"Analyze this claim for fraud:\n{claim_text}")]},
+                config={"max_concurrency": AGENT_TOOL_CONCURRENCY}
+            )
         
+        result["latency_ms"] = (time.time() - start) * 1000
+        self.last_latency_ms[mode] = result["latency_ms"]
         return result
 
 
@@ -0,0 +1,108 @@
+"""
+Result Cache Utility - In-process LRU+TTL cache for UC fraud function results
+
+Shared by every page and by FraudAgent so the same claim text is only sent
+through AI_QUERY once per TTL window, no matter which page or user asked.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))
+DEFAULT_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+
+_WHITESPACE_RE = re.compile(r"\s+", re.ASCII)
+
+
+def normalize_claim_text(text: str) -> str:
+    """Collapse whitespace so cosmetic edits don't defeat the cache"""
+    return _WHITESPACE_RE.sub(" ", text or "").strip()
+
+
+def make_cache_key(function_name: str, args, llm_endpoint: str) -> str:
+    """
+    Build a content-addressed key for a UC function call.
+
+    The first argument is treated as claim text and normalized; the
+    remaining arguments (e.g. is_fraudulent / fraud_type for the
+    explanation function) are hashed as-is.
+    """
+    args = list(args)
+    if args and isinstance(args[0], str):
+        args[0] = normalize_claim_text(args[0])
+    payload = json.dumps(
+        {"fn": function_name, "args": args, "endpoint": llm_endpoint or ""},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """Return the cached value or None on miss/expiry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value):
+        """Store a value; None results (failed calls) are never cached"""
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Snapshot of cache counters for display"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Process-wide cache instance shared across pages and sessions"""
+    return ResultCache()
@@ -0,0 +1,88 @@
+"""
+Result Stream Utility - Chunked result fetching for SQL warehouse statements
+
+The Statement Execution API splits large results into chunks; reading only
+response.result.data_array silently truncates them. These helpers follow
+next_chunk_index to the end, either as JSON rows (INLINE) or as Arrow record
+batches downloaded lazily from EXTERNAL_LINKS, which build pandas frames
+without per-cell Python conversion.
+"""
+
+import pyarrow as pa
+import requests
+from databricks.sdk.service.sql import Disposition, Format
+
+from utils.statement_runner import DEFAULT_DEADLINE_SECONDS
+
+DOWNLOAD_TIMEOUT_SECONDS = 120
+
+
+def column_names(response) -> list:
+    """Column names from a statement manifest ([] if there is none)"""
+    manifest = response.manifest
+    if manifest and manifest.schema and manifest.schema.columns:
+        return [col.name for col in manifest.schema.columns]
+    return []
+
+
+def iter_rows(w, response):
+    """Yield every JSON_ARRAY row of a SUCCEEDED INLINE statement, across all chunks"""
+    result = response.result
+    while result is not None:
+        for row in result.data_array or []:
+            yield row
+        if result.next_chunk_index is None:
+            return
+        result = w.statement_execution.get_statement_result_chunk_n(
+            response.statement_id, result.next_chunk_index
+        )
+
+
+def iter_record_batches(w, response):
+    """
+    Yield pyarrow RecordBatches of a SUCCEEDED ARROW_STREAM / EXTERNAL_LINKS
+    statement, downloading one chunk at a time.
+
+    Presigned links must be fetched without the workspace auth header, so a
+    plain HTTP session is used rather than the SDK's API client.
+    """
+    result = response.result
+    with requests.Session() as http:
+        while result is not None:
+            next_index = None
+            for link in result.external_links or []:
+                payload = http.get(link.external_link, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+                payload.raise_for_status()
+                with pa.ipc.open_stream(payload.content) as reader:
+                    for batch in reader:
+                        yield batch
+                next_index = link.next_chunk_index
+            if next_index is None:
+                next_index = result.next_chunk_index
+            if next_index is None:
+                return
+            result = w.statement_execution.get_statement_result_chunk_n(response.statement_id, next_index)
+
+
+def submit_arrow(runner, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS):
+    """Run a statement with ARROW_STREAM + EXTERNAL_LINKS; raises unless it SUCCEEDED"""
+    return runner.run_or_raise(
+        statement,
+        deadline_seconds=deadline_seconds,
+        format=Format.ARROW_STREAM,
+        disposition=Disposition.EXTERNAL_LINKS
+    )
+
+
+def fetch_arrow(runner, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS):
+    """Full result as a pyarrow.Table (zero rows keeps the manifest's column names)"""
+    response = submit_arrow(runner, statement, deadline_seconds)
+    batches = list(iter_record_batches(runner.w, response))
+    if batches:
+        return pa.Table.from_batches(batches)
+    return pa.table({name: pa.array([], type=pa.null()) for name in column_names(response)})
+
+
+def fetch_dataframe(runner, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS):
+    """Full result as a pandas DataFrame with Arrow-typed columns"""
+    return fetch_arrow(runner, statement, deadline_seconds).to_pandas()
@@ -0,0 +1,168 @@
+"""
+Result Writer Utility - Bulk, idempotent persistence of batch results
+
+Results are written to the schema's Volume as one Parquet file and loaded
+with a single MERGE keyed on (claim_id, run_id), so saving the same run
+twice updates rows instead of duplicating them. If the upload path is not
+available, rows are merged in multi-row VALUES statements instead.
+"""
+
+import io
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from utils.sql_gateway import sql_str
+
+CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
+SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
+RESULT_STAGING_PATH = os.getenv(
+    "RESULT_STAGING_PATH",
+    f"/Volumes/{CATALOG}/{SCHEMA}/fraud_knowledge_docs/_staging/batch_results"
+)
+
+VALUES_BATCH_SIZE = 500
+STATEMENT_TIMEOUT_SECONDS = 300
+
+RESULT_COLUMNS = {
+    "claim_id": "STRING",
+    "claim_text": "STRING",
+    "claim_amount": "DOUBLE",
+    "is_fraudulent": "BOOLEAN",
+    "fraud_probability": "DOUBLE",
+    "fraud_type": "STRING",
+    "confidence": "DOUBLE",
+    "verdict": "STRING",
+    "run_id": "STRING",
+}
+
+
+def new_run_id() -> str:
+    """Identifier for one batch run; saving the same run again is idempotent"""
+    return uuid.uuid4().hex[:16]
+
+
+def _sql_literal(value, sql_type: str) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return f"CAST(NULL AS {sql_type})"
+    if sql_type == "BOOLEAN":
+        return "true" if bool(value) else "false"
+    if sql_type == "DOUBLE":
+        return repr(float(value))
+    return sql_str(value)
+
+
+def _execute(gateway, statement: str):
+    """Run a statement through the shared gateway and raise if it did not succeed"""
+    return gateway.execute(statement, deadline_seconds=STATEMENT_TIMEOUT_SECONDS)
+
+
+def prepare_results(results_df: pd.DataFrame, run_id: str) -> pd.DataFrame:
+    """Project results onto the table columns with stable dtypes, one row per claim_id"""
+    df = results_df.reindex(columns=[c for c in RESULT_COLUMNS if c != "run_id"]).copy()
+    df["claim_id"] = df["claim_id"].astype(str)
+    df["claim_text"] = df["claim_text"].fillna("").astype(str)
+    df["fraud_type"] = df["fraud_type"].fillna("").astype(str)
+    df["verdict"] = df["verdict"].fillna("").astype(str)
+    for column in ("claim_amount", "fraud_probability", "confidence"):
+        df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0.0).astype("float64")
+    df["is_fraudulent"] = df["is_fraudulent"].fillna(False).astype(bool)
+    df["run_id"] = run_id
+    # MERGE rejects a source with several rows matching one target row
+    return df.drop_duplicates(subset=["claim_id"], keep="last").reset_index(drop=True)
+
+
+def ensure_results_table(gateway, table_name: str):
+    """Create the results table, adding run_id to tables created before it existed"""
+    columns_sql = ",\n            ".join(f"{name} {sql_type}" for name, sql_type in RESULT_COLUMNS.items())
+    _execute(gateway, f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            {columns_sql},
+            processed_at TIMESTAMP
+        )
+    """)
+    described = gateway.query_rows(f"DESCRIBE TABLE {table_name}", deadline_seconds=STATEMENT_TIMEOUT_SECONDS)
+    existing_columns = {row[0] for row in described if row}
+    if "run_id" not in existing_columns:
+        _execute(gateway, f"ALTER TABLE {table_name} ADD COLUMNS (run_id STRING)")
+
+
+def _merge_sql(table_name: str, source_sql: str) -> str:
+    columns = list(RESULT_COLUMNS)
+    update_sql = ", ".join(f"t.{c} = s.{c}" for c in columns if c not in ("claim_id", "run_id"))
+    insert_columns = ", ".join(columns + ["processed_at"])
+    insert_values = ", ".join([f"s.{c}" for c in columns] + ["current_timestamp()"])
+    return f"""
+        MERGE INTO {table_name} t
+        USING ({source_sql}) s
+        ON t.claim_id = s.claim_id AND t.run_id = s.run_id
+        WHEN MATCHED THEN UPDATE SET {update_sql}, t.processed_at = current_timestamp()
+        WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values})
+    """
+
+
+def _merge_via_volume(gateway, table_name: str, df: pd.DataFrame, run_id: str) -> int:
+    """Upload one Parquet file and MERGE it in a single statement"""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    buffer.seek(0)
+
+    file_path = f"{RESULT_STAGING_PATH}/{run_id}-{uuid.uuid4().hex[:8]}.parquet"
+    gateway.w.files.upload(file_path, buffer, overwrite=True)
+    try:
+        columns_sql = ", ".join(RESULT_COLUMNS)
+        _execute(gateway, _merge_sql(table_name, f"SELECT {columns_sql} FROM parquet.`{file_path}`"))
+    finally:
+        try:
+            gateway.w.files.delete(file_path)
+        except Exception:
+            pass
+    return 1
+
+
+def _merge_via_values(gateway, table_name: str, df: pd.DataFrame) -> int:
+    """MERGE VALUES_BATCH_SIZE rows per statement"""
+    columns = list(RESULT_COLUMNS)
+    statements = 0
+    for start in range(0, len(df), VALUES_BATCH_SIZE):
+        chunk = df.iloc[start:start + VALUES_BATCH_SIZE]
+        values_sql = ",\n            ".join(
+            "(" + ", ".join(_sql_literal(row[c], RESULT_COLUMNS[c]) for c in columns) + ")"
+            for row in chunk.to_dict("records")
+        )
+        source_sql = f"SELECT * FROM VALUES\n            {values_sql}\n        AS s({', '.join(columns)})"
+        _execute(gateway, _merge_sql(table_name, source_sql))
+        statements += 1
+    return statements
+
+
+def save_results_bulk(gateway, table_name: str, results_df: pd.DataFrame, run_id: str) -> dict:
+    """
+    Persist results_df to table_name, idempotent on (claim_id, run_id).
+
+    Returns {"rows", "method", "statements", "seconds", "warning"}; warning
+    is set when the Volume path failed and rows went through the VALUES
+    fallback. Raises if neither path succeeds.
+    """
+    start = time.time()
+    df = prepare_results(results_df, run_id)
+    ensure_results_table(gateway, table_name)
+
+    if df.empty:
+        return {"rows": 0, "method": "none", "statements": 0, "seconds": time.time() - start, "warning": None}
+
+    warning = None
+    try:
+        statements = _merge_via_volume(gateway, table_name, df, run_id)
+        method = "volume"
+    except Exception as e:
+        warning = f"Volume load failed, fell back to batched MERGE: {e}"
+        statements = _merge_via_values(gateway, table_name, df)
+        method = "values"
+
+    return {
+        "rows": len(df), "method": method, "statements": statements,
+        "seconds": time.time() - start, "warning": warning
+    }
@@ -0,0 +1,111 @@
+"""
+Rules Engine Utility - Deterministic pre-filter before any LLM call
+
+Scores claims from keyword hits against a list of common billing red-flag
+terms and from claim amount outliers per claim_type (z-score against the
+claims table). Claims scoring below a risk floor are cleared as legitimate
+without calling the UC functions and tagged "rules-only"; only the rest is
+sent to the LLM. The default floor of 0.0 clears nothing, i.e. the
+pre-filter is off until RULES_RISK_FLOOR is raised.
+
+The keywords are kept independent of the phrases the sample data generator
+uses (shared/fraud_patterns.py); a few standard terms such as "duplicate"
+or "deceased" appear in both. How many synthetic claims the rules catch is
+therefore only a rough check, not a measure of precision on real claims.
+
+The same rules run vectorized over a pandas DataFrame on the batch page
+(score_claims_frame) and as Spark SQL expressions in
+09_batch_analyze_claims.py (rules_score_sql), which imports this module
+like utils.cost_estimator.
+"""
+
+import os
+
+import pandas as pd
+
+# Billing red flags by scheme, as lowercase substrings of the lowercased claim text
+RED_FLAG_TERMS = {
+    "Upcoding": ["upcod", "99215", "level 5", "higher complexity"],
+    "Unbundling": ["unbundl", "billed separately", "component test"],
+    "Phantom": ["never received", "never rendered", "not rendered", "non-existent", "denies receiving"],
+    "Duplicate": ["duplicate", "resubmit", "double bill"],
+    "Unnecessary": ["medically unnecessary", "overutiliz"],
+    "Kickback": ["kickback", "referral fee", "self-referral"],
+    "Identity": ["deceased", "stolen", "identity theft"],
+    "Prescription": ["controlled substance", "early refill", "doctor shopping", "pill mill"],
+    "Coding": ["mismatch", "do not match", "codes not matching", "excluded provider", "leie"],
+}
+
+RULE_KEYWORDS = sorted({term for terms in RED_FLAG_TERMS.values() for term in terms})
+
+# Risk per keyword hit (two hits reach 1.0)
+KEYWORD_WEIGHT = 0.5
+# Amount z-scores (per claim_type) below AMOUNT_Z_START add no risk; AMOUNT_Z_FULL and above add 1.0
+AMOUNT_Z_START = 1.0
+AMOUNT_Z_FULL = 3.0
+
+# Claims with a rules score below this are cleared without LLM calls; 0 sends every claim to the LLM
+RULES_RISK_FLOOR = float(os.getenv("RULES_RISK_FLOOR", "0.0"))
+RULES_ONLY_TAG = "rules-only"
+
+
+def amount_stats_sql(claims_table: str) -> str:
+    """Mean and standard deviation of claim_amount per claim_type"""
+    return f"""
+SELECT
+    claim_type,
+    AVG(claim_amount) AS amount_mean,
+    STDDEV(claim_amount) AS amount_stddev
+FROM {claims_table}
+WHERE claim_amount IS NOT NULL
+GROUP BY claim_type
+"""
+
+
+def keyword_hits_sql(text_column: str = "claim_text") -> str:
+    """Spark SQL: number of RULE_KEYWORDS found in text_column"""
+    return " + ".join(
+        f"CAST(INSTR(LOWER(COALESCE({text_column}, '')), '{keyword}') > 0 AS INT)"
+        for keyword in RULE_KEYWORDS
+    )
+
+
+def amount_zscore_sql(amount_column: str = "claim_amount", mean_column: str = "amount_mean",
+                      stddev_column: str = "amount_stddev") -> str:
+    """Spark SQL: z-score of the amount within its claim_type, 0.0 without statistics"""
+    return f"""COALESCE(CASE WHEN {stddev_column} > 0
+        THEN ({amount_column} - {mean_column}) / {stddev_column} END, 0.0)"""
+
+
+def rules_score_sql(hits_column: str = "rules_keyword_hits", zscore_column: str = "amount_zscore") -> str:
+    """Spark SQL: rules risk in [0, 1] from keyword hits and amount z-score; same formula as score_claims_frame()"""
+    return f"""LEAST(1.0, GREATEST(
+        {hits_column} * {KEYWORD_WEIGHT},
+        ({zscore_column} - {AMOUNT_Z_START}) / {AMOUNT_Z_FULL - AMOUNT_Z_START},
+        0.0))"""
+
+
+def score_claims_frame(claims: pd.DataFrame, amount_stats: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Rules scores for a DataFrame of claims (claim_text; claim_type and claim_amount if present).
+
+    amount_stats has claim_type, amount_mean and amount_stddev (from
+    amount_stats_sql()); without it, or for claim types it doesn't cover,
+    amounts add no risk. Returns rules_keyword_hits, amount_zscore and
+    rules_score, indexed like claims.
+    """
+    text = claims["claim_text"].fillna("").astype(str).str.lower()
+    hits = pd.Series(0, index=claims.index)
+    for keyword in RULE_KEYWORDS:
+        hits += text.str.contains(keyword, regex=False).astype(int)
+
+    zscore = pd.Series(0.0, index=claims.index)
+    if amount_stats is not None and not amount_stats.empty and {"claim_type", "claim_amount"} <= set(claims.columns):
+        stats = claims[["claim_type"]].merge(amount_stats, on="claim_type", how="left").set_index(claims.index)
+        amount = pd.to_numeric(claims["claim_amount"], errors="coerce")
+        stddev = pd.to_numeric(stats["amount_stddev"], errors="coerce")
+        zscore = ((amount - pd.to_numeric(stats["amount_mean"], errors="coerce")) / stddev.where(stddev > 0)).fillna(0.0)
+
+    amount_risk = (zscore - AMOUNT_Z_START) / (AMOUNT_Z_FULL - AMOUNT_Z_START)
+    score = pd.concat([hits * KEYWORD_WEIGHT, amount_risk], axis=1).max(axis=1).clip(0.0, 1.0)
+    return pd.DataFrame({"rules_keyword_hits": hits, "amount_zscore": zscore, "rules_score": score})
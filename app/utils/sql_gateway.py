@@ -0,0 +1,173 @@
+"""
+SQL Gateway Utility - The app's single path to the SQL warehouse
+
+Owns the process-wide WorkspaceClient (one pooled keep-alive HTTP session
+shared by every page and thread), statement lifecycle, chunked result
+decoding, retries of statement submission on transient errors, per-statement timing, and the
+result-cache hooks for UC function calls. Pages go through get_gateway()
+instead of building their own clients.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.core import Config
+
+from utils.result_cache import get_result_cache, make_cache_key
+from utils.result_stream import fetch_dataframe, iter_rows
+from utils.statement_runner import DEFAULT_DEADLINE_SECONDS, StatementRunner
+
+CATALOG = os.getenv("CATALOG_NAME", "fraud_detection_dev")
+SCHEMA = os.getenv("SCHEMA_NAME", "claims_analysis")
+WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID")
+LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "databricks-claude-sonnet-4-5")
+HTTP_POOL_SIZE = int(os.getenv("SQL_HTTP_POOL_SIZE", "32"))
+
+# Tries of the submit request; a submitted statement is never run again (see StatementRunner.submit)
+RETRY_MAX_TRIES = 3
+TIMING_WINDOW = 500
+
+
+def sql_str(value) -> str:
+    """Quote a Python value as a Spark SQL string literal"""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def sql_literal(value) -> str:
+    """Render a UC function argument as a SQL literal"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return sql_str(value)
+
+
+@st.cache_resource
+def get_workspace_client():
+    """Process-wide WorkspaceClient; its HTTP pool is sized for concurrent batch workers"""
+    try:
+        return WorkspaceClient(config=Config(
+            max_connection_pools=HTTP_POOL_SIZE,
+            max_connections_per_pool=HTTP_POOL_SIZE
+        ))
+    except Exception as e:
+        st.error(f"Failed to initialize Databricks client: {e}")
+        return None
+
+
+class SqlGateway:
+    """Statements, queries and cached UC function calls against one warehouse"""
+
+    def __init__(self, w, warehouse_id: str = WAREHOUSE_ID, catalog: str = CATALOG, schema: str = SCHEMA,
+                 result_cache=None, durable_store=None, llm_endpoint: str = LLM_ENDPOINT):
+        self.w = w
+        self.warehouse_id = warehouse_id
+        self.catalog = catalog
+        self.schema = schema
+        self.result_cache = result_cache
+        self.durable_store = durable_store
+        if durable_store is not None:
+            # The store's lookups and write-backs run through this gateway
+            durable_store.gateway = self
+        self.llm_endpoint = llm_endpoint
+        self.runner = StatementRunner(w, warehouse_id, submit_tries=RETRY_MAX_TRIES, on_retry=self._on_retry)
+        self.retries = 0
+        self._timings = deque(maxlen=TIMING_WINDOW)
+        self._lock = threading.Lock()
+
+    def _on_retry(self, details):
+        with self._lock:
+            self.retries += 1
+
+    def _timed(self, label: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._timings.append((label, time.perf_counter() - start))
+
+    def execute(self, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS, **kwargs):
+        """Run a statement to completion; raises RuntimeError unless it SUCCEEDED"""
+        return self._timed("execute", self.runner.run_or_raise, statement, deadline_seconds, **kwargs)
+
+    def query_rows(self, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS, **kwargs) -> list:
+        """All JSON_ARRAY rows of a query, across every result chunk"""
+        def run():
+            response = self.runner.run_or_raise(statement, deadline_seconds, **kwargs)
+            return list(iter_rows(self.w, response))
+        return self._timed("query", run)
+
+    def query_df(self, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS):
+        """Query result as a pandas DataFrame decoded from Arrow"""
+        return self._timed("query_df", fetch_dataframe, self.runner, statement, deadline_seconds)
+
+    def function_sql(self, function_name: str, args) -> str:
+        args_sql = ", ".join(sql_literal(arg) for arg in args)
+        return f"SELECT {self.catalog}.{self.schema}.{function_name}({args_sql}) as result"
+
+    def call_function(self, function_name: str, *args, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS):
+        """
+        Raw result cell of a UC function call, or None if it returned nothing.
+
+        Served from the in-memory cache, then the durable store, before the
+        warehouse; fresh results are written to both. Raises on SQL failure.
+        """
+        cache_key = make_cache_key(function_name, args, self.llm_endpoint)
+        data = self.cached_result(function_name, args, cache_key)
+        if data is not None:
+            return data
+
+        rows = self.query_rows(self.function_sql(function_name, args), deadline_seconds)
+        data = rows[0][0] if rows else None
+        if data is not None:
+            if self.result_cache is not None:
+                self.result_cache.put(cache_key, data)
+            if self.durable_store is not None:
+                self.durable_store.write_back(function_name, args, data)
+        return data
+
+    def cached_result(self, function_name: str, args, cache_key: str = None):
+        """Cached raw result for a UC function call without touching the warehouse for it"""
+        cache_key = cache_key or make_cache_key(function_name, args, self.llm_endpoint)
+        data = self.result_cache.get(cache_key) if self.result_cache is not None else None
+        if data is None and self.durable_store is not None:
+            # Results persisted by other replicas or the 09 batch job
+            data = self.durable_store.lookup(function_name, args)
+            if data is not None and self.result_cache is not None:
+                self.result_cache.put(cache_key, data)
+        return data
+
+    def stats(self) -> dict:
+        """Statement count, mean and p95 latency over the recent window, and retries"""
+        with self._lock:
+            durations = sorted(d for _, d in self._timings)
+            retries = self.retries
+        if not durations:
+            return {"statements": 0, "mean_seconds": 0.0, "p95_seconds": 0.0, "retries": retries}
+        return {
+            "statements": len(durations),
+            "mean_seconds": sum(durations) / len(durations),
+            "p95_seconds": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+            "retries": retries,
+        }
+
+
+@st.cache_resource
+def get_gateway(warehouse_id: str = WAREHOUSE_ID) -> SqlGateway:
+    """Process-wide gateway for a warehouse, wired to the shared result caches"""
+    from utils.durable_cache import get_durable_store
+
+    w = get_workspace_client()
+    return SqlGateway(
+        w,
+        warehouse_id=warehouse_id,
+        result_cache=get_result_cache(),
+        durable_store=get_durable_store(w)
+    )
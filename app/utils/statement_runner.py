@@ -0,0 +1,250 @@
+"""
+Statement Runner Utility - Lifecycle manager for SQL warehouse statements
+
+Submits statements asynchronously, follows them to a terminal state with
+backoff polling instead of giving up at the 50s inline wait, and cancels
+them on the warehouse when the caller's deadline passes, the caller raises,
+or the Streamlit session that started them has ended. A background reaper
+checks for ended sessions every REAP_INTERVAL_SECONDS, so statements are
+cancelled even when no further statement is submitted.
+
+Worker threads have no Streamlit context of their own: capture
+current_session_id() on the script thread and pass it as session_id, or
+start the pool with session_context_initializer().
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import backoff
+import requests
+from databricks.sdk.errors import TemporarilyUnavailable, TooManyRequests
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("STATEMENT_DEADLINE_SECONDS", "300"))
+INLINE_WAIT = "10s"
+POLL_INITIAL_SECONDS = 0.25
+POLL_MAX_SECONDS = 3.0
+POLL_BACKOFF = 1.5
+REAP_INTERVAL_SECONDS = float(os.getenv("STATEMENT_REAP_INTERVAL_SECONDS", "15"))
+
+TERMINAL_STATES = {"SUCCEEDED", "FAILED", "CANCELED", "CLOSED"}
+
+# Failures of the submit request itself, before the warehouse accepted a statement
+TRANSIENT_SUBMIT_ERRORS = (requests.exceptions.ConnectionError, TemporarilyUnavailable, TooManyRequests)
+
+
+class StatementTimeout(TimeoutError):
+    """Statement did not finish before the caller's deadline and was cancelled"""
+
+
+class StatementAbandoned(RuntimeError):
+    """Statement was cancelled because the session that started it ended"""
+
+
+def current_session_id():
+    """Streamlit session id of the calling script thread, or None outside a session"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+def session_context_initializer():
+    """
+    Pool initializer that attaches the calling thread's Streamlit script
+    context to worker threads, so current_session_id() works there and
+    statements they start are tied to the caller's session. Returns None
+    outside Streamlit.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+
+def _session_alive(session_id) -> bool:
+    if not session_id:
+        return True
+    try:
+        from streamlit.runtime import Runtime
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+
+@dataclass
+class _InFlight:
+    statement_id: str
+    session_id: str
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+# Process-wide registry so statements can be cancelled from any page or thread
+_in_flight = {}
+_lock = threading.Lock()
+_counters = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "timed_out": 0, "abandoned": 0}
+
+
+_reaper = None
+
+
+def _count(name: str):
+    with _lock:
+        _counters[name] += 1
+
+
+def _start_reaper(runner):
+    """Start the process-wide reaper thread once; it outlives the runner that started it"""
+    global _reaper
+    with _lock:
+        if _reaper is not None:
+            return
+
+        def reap_forever():
+            while True:
+                time.sleep(REAP_INTERVAL_SECONDS)
+                try:
+                    runner.reap_abandoned()
+                except Exception:
+                    pass
+
+        _reaper = threading.Thread(target=reap_forever, name="statement-reaper", daemon=True)
+        _reaper.start()
+
+
+class StatementRunner:
+    """Submit/poll/cancel wrapper around w.statement_execution for one warehouse"""
+
+    def __init__(self, w, warehouse_id: str, submit_tries: int = 1, on_retry=None):
+        self.w = w
+        self.warehouse_id = warehouse_id
+        self.submit_tries = submit_tries
+        self.on_retry = on_retry
+
+    def submit(self, statement: str, session_id=None, **kwargs):
+        """
+        Start a statement and return its response after a short inline wait.
+
+        session_id defaults to the calling thread's session; worker threads
+        should pass the one captured on the script thread. Extra keyword
+        arguments (format, disposition, ...) are passed through to
+        execute_statement. Call wait() to follow it to completion.
+
+        Only the submit request is retried (up to submit_tries, on
+        TRANSIENT_SUBMIT_ERRORS); once a statement id exists, retrying would
+        run the statement, and its AI_QUERY calls, a second time.
+        """
+        execute = self.w.statement_execution.execute_statement
+        if self.submit_tries > 1:
+            execute = backoff.on_exception(
+                backoff.expo, TRANSIENT_SUBMIT_ERRORS, max_tries=self.submit_tries, on_backoff=self.on_retry
+            )(execute)
+        response = execute(
+            warehouse_id=self.warehouse_id,
+            statement=statement,
+            wait_timeout=INLINE_WAIT,
+            on_wait_timeout="CONTINUE",
+            **kwargs
+        )
+        _count("submitted")
+        _start_reaper(self)
+        self.reap_abandoned()
+        if response.status.state.value not in TERMINAL_STATES:
+            with _lock:
+                _in_flight[response.statement_id] = _InFlight(
+                    response.statement_id, session_id or current_session_id()
+                )
+        return response
+
+    def wait(self, response, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS):
+        """
+        Poll a submitted statement until it reaches a terminal state.
+
+        Cancels the statement and raises StatementTimeout once deadline_seconds
+        have passed since submission, or StatementAbandoned if its session
+        ended. Any other exception raised while waiting also cancels it.
+        """
+        statement_id = response.statement_id
+        with _lock:
+            entry = _in_flight.get(statement_id)
+        started = entry.submitted_at if entry else time.monotonic()
+        session_id = entry.session_id if entry else None
+
+        delay = POLL_INITIAL_SECONDS
+        finished = False
+        try:
+            while response.status.state.value not in TERMINAL_STATES:
+                if time.monotonic() - started > deadline_seconds:
+                    _count("timed_out")
+                    raise StatementTimeout(f"Statement {statement_id} exceeded {deadline_seconds:.0f}s deadline")
+                if not _session_alive(session_id):
+                    _count("abandoned")
+                    raise StatementAbandoned(f"Session ended; statement {statement_id} cancelled")
+                time.sleep(delay)
+                delay = min(delay * POLL_BACKOFF, POLL_MAX_SECONDS)
+                response = self.w.statement_execution.get_statement(statement_id)
+            finished = True
+        finally:
+            with _lock:
+                _in_flight.pop(statement_id, None)
+            if not finished:
+                self.cancel(statement_id)
+
+        state = response.status.state.value
+        _count("succeeded" if state == "SUCCEEDED" else "failed")
+        return response
+
+    def run(self, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS, **kwargs):
+        """Submit and wait; returns the terminal StatementResponse"""
+        return self.wait(self.submit(statement, **kwargs), deadline_seconds=deadline_seconds)
+
+    def run_or_raise(self, statement: str, deadline_seconds: float = DEFAULT_DEADLINE_SECONDS, **kwargs):
+        """Like run(), but raises RuntimeError unless the statement SUCCEEDED"""
+        response = self.run(statement, deadline_seconds=deadline_seconds, **kwargs)
+        if response.status.state.value != "SUCCEEDED":
+            message = response.status.error.message if response.status.error else response.status.state.value
+            raise RuntimeError(message)
+        return response
+
+    def cancel(self, statement_id: str):
+        """Best-effort cancel; the statement may already have finished"""
+        try:
+            self.w.statement_execution.cancel_execution(statement_id)
+            _count("cancelled")
+        except Exception:
+            pass
+
+    def cancel_session(self, session_id=None) -> int:
+        """Cancel every in-flight statement started by a session (default: the current one)"""
+        session_id = session_id or current_session_id()
+        with _lock:
+            ids = [sid for sid, entry in _in_flight.items() if entry.session_id == session_id]
+            for sid in ids:
+                _in_flight.pop(sid, None)
+        for sid in ids:
+            self.cancel(sid)
+        return len(ids)
+
+    def reap_abandoned(self) -> int:
+        """Cancel in-flight statements whose Streamlit session is gone"""
+        with _lock:
+            ids = [sid for sid, entry in _in_flight.items() if not _session_alive(entry.session_id)]
+            for sid in ids:
+                _in_flight.pop(sid, None)
+        for sid in ids:
+            self.cancel(sid)
+        return len(ids)
+
+
+def statement_stats() -> dict:
+    """Process-wide counters plus the number of statements currently in flight"""
+    with _lock:
+        return {**_counters, "in_flight": len(_in_flight)}
@@ -34,10 +34,14 @@ Example workflow:
 See: CONFIG_SIMPLE.md for full documentation
 """
 
+import json
 import yaml
 import sys
 from pathlib import Path
 
+from app.utils.cost_estimator import PROMPT_OVERHEAD_TOKENS
+from shared.prompts import result_cache_version
+
 
 def load_config(environment: str = None) -> dict:
     """Load configuration from config.yaml"""
@@ -69,6 +73,9 @@ def generate_app_yaml(config: dict, environment: str) -> str:
     env_config = config['environments'][environment]
     common_config = config['common']
     
+    # Must match cfg.prompt_version so the app and 09 share fraud_result_cache entries
+    prompt_version = result_cache_version(common_config.get('prompt_version', 'v1'), env_config['llm_endpoint'])
+    
     # Extract host without https://
     workspace_host = env_config['workspace_host'].replace('https://', '').replace('http://', '')
     
@@ -116,6 +123,30 @@ env:
   # Embedding model for vector search
   - name: 'EMBEDDING_MODEL'
     value: '{common_config['embedding_model']}'
+  
+  # Prompt version for the durable result cache (fraud_result_cache),
+  # including the fingerprint of the UC function prompts and LLM endpoint
+  - name: 'PROMPT_VERSION'
+    value: '{prompt_version}'
+  
+  # Claims per fraud_classify_batch call on the batch page
+  - name: 'CLASSIFY_BATCH_SIZE'
+    value: '{common_config.get('classify_batch_size', 8)}'
+  
+  # Rules pre-filter on the batch page: claims scoring below this skip the LLM (0 = off)
+  - name: 'RULES_RISK_FLOOR'
+    value: '{common_config.get('rules_risk_floor', 0.0)}'
+  
+  # LLM pricing for the batch page's dry-run cost estimate (USD per million tokens)
+  - name: 'LLM_INPUT_COST_PER_MTOK'
+    value: '{common_config.get('llm_input_cost_per_mtok', 3.0)}'
+  - name: 'LLM_OUTPUT_COST_PER_MTOK'
+    value: '{common_config.get('llm_output_cost_per_mtok', 15.0)}'
+  
+  # Prompt tokens around the claim per UC function, from the shared/prompts.py templates
+  # (the app ships without shared/)
+  - name: 'PROMPT_OVERHEAD_TOKENS'
+    value: '{json.dumps(PROMPT_OVERHEAD_TOKENS)}'
 """
     
     return app_yaml_content
@@ -16,6 +16,7 @@ import sys
 import os
 sys.path.append(os.path.abspath('..'))
 from shared.config import get_config, print_config
+from shared.fraud_patterns import FRAUD_PATTERNS, SUSPICIOUS_PHRASES
 
 cfg = get_config()
 print_config(cfg)
@@ -32,18 +33,6 @@ from pyspark.sql.types import *
 import random
 from datetime import datetime, timedelta
 
-# Healthcare fraud patterns for payers
-FRAUD_PATTERNS = {
-    "Upcoding": ["CPT code inflated", "billed higher complexity", "unwarranted level 5 visit"],
-    "Unbundling": ["separated bundled procedures", "multiple line items for bundled service"],
-    "Phantom": ["service never rendered", "patient denies receiving service"],
-    "Duplicate": ["duplicate billing", "same claim resubmitted", "double billing"],
-    "Unnecessary": ["medically unnecessary procedure", "excessive testing", "overutilization"],
-    "Kickback": ["illegal referral arrangement", "financial incentive for referral"],
-    "Identity": ["stolen patient ID", "deceased patient billed", "identity theft"],
-    "Prescription": ["pill mill pattern", "fake prescription", "controlled substance abuse"]
-}
-
 CLAIM_TYPES = ["Medical-Inpatient", "Medical-Outpatient", "Prescription", "DME", "Home Health"]
 
 # Generate sample claims
@@ -75,19 +64,8 @@ def generate_claim(claim_id, is_fraud=False):
         indicators = random.sample(FRAUD_PATTERNS[fraud_type], 
                                    k=min(random.randint(2, 4), len(FRAUD_PATTERNS[fraud_type])))
         
-        # Healthcare payer fraud-specific text patterns
-        suspicious_phrases = [
-            "diagnosis code mismatch with procedure",
-            "out-of-network provider high cost",
-            "multiple claims same day different facilities",
-            "unusual procedure combination",
-            "provider flagged in LEIE database",
-            "geographic anomaly patient-provider",
-            "NPI number suspicious activity"
-        ]
-        
         description = f"{claim_type} claim for ${amount:,}. " + \
-                     random.choice(suspicious_phrases) + ". " + \
+                     random.choice(SUSPICIOUS_PHRASES) + ". " + \
                      "Indicators: " + ", ".join(indicators)
     else:
         fraud_type = "None"
@@ -184,6 +162,9 @@ claims_df = spark.createDataFrame(claims_data, schema=schema)
 # Write to Delta table
 claims_df.write.mode("overwrite").saveAsTable(cfg.claims_table)
 
+# Change data feed drives the streaming scorer (11_stream_score_claims.py)
+spark.sql(f"ALTER TABLE {cfg.claims_table} SET TBLPROPERTIES ('delta.enableChangeDataFeed' = 'true')")
+
 print(f"✅ Created table: {cfg.claims_table}")
 
 # COMMAND ----------
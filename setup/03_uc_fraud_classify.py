@@ -16,6 +16,10 @@ import sys
 import os
 sys.path.append(os.path.abspath('..'))
 from shared.config import get_config
+from shared.prompts import (
+    PACKED_CLAIM_TYPE, RAW_RESPONSE_TYPE, fingerprint_comment, parse_response_sql, prompt_fingerprint,
+    structured_query_sql
+)
 
 cfg = get_config()
 print(f"Creating function in: {cfg.catalog}.{cfg.schema}")
@@ -29,18 +33,38 @@ print(f"Using LLM: {cfg.llm_endpoint}")
 # COMMAND ----------
 
 spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_classify")
-print("Dropped existing function (if any)")
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_classify_raw")
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_classify_batch")
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_classify_batch_raw")
+print("Dropped existing functions (if any)")
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Create UC Function
+# MAGIC ## Create UC Functions
 # MAGIC
-# MAGIC Using LANGUAGE PYTHON with ai_query - exact same pattern as tutorial
+# MAGIC AI_QUERY with `responseFormat` (structured output): the endpoint returns JSON matching the result schema,
+# MAGIC so there are no markdown fences to strip. `failOnError => false` makes a failed call return its error
+# MAGIC instead of failing the query.
+# MAGIC
+# MAGIC - `fraud_classify_raw` returns the raw response, `STRUCT<result, errorMessage>`; the batch and streaming
+# MAGIC   jobs call it to record call errors and parse failures per claim
+# MAGIC - `fraud_classify` parses it into the typed result, NULL when the call failed
 
 # COMMAND ----------
 
-# Create the fraud_classify function with markdown stripping
+# Prompt and response format live in shared/prompts.py; the COMMENT carries their fingerprint (+ endpoint)
+function_comment = fingerprint_comment(
+    "Classifies healthcare claims as fraudulent or legitimate for payers using AI", "fraud_classify", cfg.llm_endpoint
+)
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_classify_raw(claim_text STRING)
+RETURNS {RAW_RESPONSE_TYPE}
+COMMENT '{function_comment}'
+RETURN
+  {structured_query_sql('fraud_classify', cfg.llm_endpoint)}
+""")
+
 spark.sql(f"""
 CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_classify(claim_text STRING)
 RETURNS STRUCT<
@@ -49,27 +73,62 @@ RETURNS STRUCT<
   fraud_type: STRING,
   confidence: DOUBLE
 >
-COMMENT 'Classifies healthcare claims as fraudulent or legitimate for payers using AI'
-RETURN 
-  FROM_JSON(
-    TRIM(REGEXP_REPLACE(REGEXP_REPLACE(
-      AI_QUERY(
-        'databricks-claude-sonnet-4-5',
-        CONCAT(
-          'You are a healthcare fraud detection AI. Return ONLY a JSON object.\\n\\n',
-          'CLAIM: ', claim_text, '\\n\\n',
-          'Return this JSON: {{"is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None", "confidence": 0.0-1.0}}\\n\\n',
-          'Rules: If claim says "billed X but actually Y" then is_fraudulent=true. If provider has fraud pattern then is_fraudulent=true. If amount 2-3x higher then is_fraudulent=true.\\n\\n',
-          'Return ONLY the JSON object, no other text.'
-        )
-      ), '```json', ''), '```', '')),
-    'STRUCT<is_fraudulent:BOOLEAN,fraud_probability:DOUBLE,fraud_type:STRING,confidence:DOUBLE>'
-  )
+COMMENT '{function_comment}'
+RETURN
+  {parse_response_sql(f"{cfg.catalog}.{cfg.schema}.fraud_classify_raw(claim_text)", 'fraud_classify')}
 """)
 
-print(f"✅ Function created: {cfg.catalog}.{cfg.schema}.fraud_classify")
+print(f"✅ Functions created: {cfg.catalog}.{cfg.schema}.fraud_classify, fraud_classify_raw")
 print(f"✅ Using LLM: {cfg.llm_endpoint}")
-print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
+print(f"✅ Fingerprint: {prompt_fingerprint('fraud_classify', cfg.llm_endpoint)}")
+print(f"✅ Structured output (responseFormat), errors returned instead of raised")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Create Packed Variant
+# MAGIC
+# MAGIC `fraud_classify_batch(claims ARRAY<STRUCT<id, text>>)` classifies K claims in one AI_QUERY call, so the
+# MAGIC instruction block is sent once per pack instead of once per claim. It is table-valued: one row per claim,
+# MAGIC `id` plus the fraud_classify fields. Callers must check that the returned ids line up with the input claims
+# MAGIC and fall back to fraud_classify when they don't; 09 (SCORING_MODE = "packed") and the batch page do.
+
+# COMMAND ----------
+
+batch_function_comment = fingerprint_comment(
+    "Classifies a pack of healthcare claims in one AI call, one row per claim id", "fraud_classify_batch", cfg.llm_endpoint
+)
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_classify_batch_raw(claims ARRAY<{PACKED_CLAIM_TYPE}>)
+RETURNS {RAW_RESPONSE_TYPE}
+COMMENT '{batch_function_comment}'
+RETURN
+  {structured_query_sql('fraud_classify_batch', cfg.llm_endpoint)}
+""")
+
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_classify_batch(claims ARRAY<{PACKED_CLAIM_TYPE}>)
+RETURNS TABLE (
+  id STRING,
+  is_fraudulent BOOLEAN,
+  fraud_probability DOUBLE,
+  fraud_type STRING,
+  confidence DOUBLE
+)
+COMMENT '{batch_function_comment}'
+RETURN
+  SELECT INLINE({parse_response_sql(f"{cfg.catalog}.{cfg.schema}.fraud_classify_batch_raw(claims)", 'fraud_classify_batch')})
+""")
+
+print(f"✅ Functions created: {cfg.catalog}.{cfg.schema}.fraud_classify_batch, fraud_classify_batch_raw")
+print(f"✅ Fingerprint: {prompt_fingerprint('fraud_classify_batch', cfg.llm_endpoint)}")
+
+display(spark.sql(f"""
+SELECT * FROM {cfg.catalog}.{cfg.schema}.fraud_classify_batch(ARRAY(
+  NAMED_STRUCT('id', 'A', 'text', 'Annual wellness visit with in-network provider. Routine blood work. Billed $185.'),
+  NAMED_STRUCT('id', 'B', 'text', 'Provider billed CPT 99215 but notes show a routine check-up. Provider has 4 similar upcoding patterns this month. Billed $450 vs typical $150.')
+))
+"""))
 
 # COMMAND ----------
 
@@ -79,10 +138,10 @@ print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
 # COMMAND ----------
 
 # Simpler debug - just use AI_QUERY directly in SQL - Using Claude for better JSON
-debug_result = spark.sql("""
+debug_result = spark.sql(f"""
 SELECT AI_QUERY(
-  'databricks-claude-sonnet-4-5',
-  'Healthcare claim: Patient billed for CPT 99215 (complex office visit) but medical notes indicate routine check-up. Provider has 4 similar upcoding patterns this month. Claim amount $450 vs typical $150. Is this fraud? Answer with JSON: {"is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "type", "confidence": 0.0-1.0}'
+  '{cfg.llm_endpoint}',
+  'Healthcare claim: Patient billed for CPT 99215 (complex office visit) but medical notes indicate routine check-up. Provider has 4 similar upcoding patterns this month. Claim amount $450 vs typical $150. Is this fraud? Answer with JSON: {{"is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "type", "confidence": 0.0-1.0}}'
 ) as response
 """).collect()[0]
 
@@ -119,5 +178,6 @@ print("=" * 80)
 print(f"✅ Function: {cfg.catalog}.{cfg.schema}.fraud_classify")
 print(f"✅ LLM: {cfg.llm_endpoint}")
 print(f"✅ Returns: is_fraudulent, fraud_probability, fraud_type, confidence")
+print(f"✅ Packed: {cfg.catalog}.{cfg.schema}.fraud_classify_batch (one row per claim id)")
 print("=" * 80)
 
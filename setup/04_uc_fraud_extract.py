@@ -15,6 +15,9 @@ import sys
 import os
 sys.path.append(os.path.abspath('..'))
 from shared.config import get_config
+from shared.prompts import (
+    RAW_RESPONSE_TYPE, fingerprint_comment, parse_response_sql, prompt_fingerprint, structured_query_sql
+)
 
 cfg = get_config()
 print(f"Creating function in: {cfg.catalog}.{cfg.schema}")
@@ -28,15 +31,31 @@ print(f"Using LLM: {cfg.llm_endpoint}")
 # COMMAND ----------
 
 spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_extract_indicators")
-print("✅ Dropped existing function (if any)")
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_extract_indicators_raw")
+print("✅ Dropped existing functions (if any)")
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Create UC Function (with Markdown Stripping)
+# MAGIC ## Create UC Functions (Structured Output)
+# MAGIC
+# MAGIC `fraud_extract_indicators_raw` returns the raw AI_QUERY response (`result`, `errorMessage`);
+# MAGIC `fraud_extract_indicators` parses it, NULL when the call failed. See 03_uc_fraud_classify.py.
 
 # COMMAND ----------
 
+# Prompt and response format live in shared/prompts.py; the COMMENT carries their fingerprint (+ endpoint)
+function_comment = fingerprint_comment(
+    "Extracts healthcare fraud indicators and red flags from claims for payers", "fraud_extract_indicators", cfg.llm_endpoint
+)
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_extract_indicators_raw(claim_text STRING)
+RETURNS {RAW_RESPONSE_TYPE}
+COMMENT '{function_comment}'
+RETURN
+  {structured_query_sql('fraud_extract_indicators', cfg.llm_endpoint)}
+""")
+
 spark.sql(f"""
 CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_extract_indicators(claim_text STRING)
 RETURNS STRUCT<
@@ -45,25 +64,14 @@ RETURNS STRUCT<
   risk_score: DOUBLE,
   affected_entities: ARRAY<STRING>
 >
-COMMENT 'Extracts healthcare fraud indicators and red flags from claims for payers'
-RETURN 
-  FROM_JSON(
-    TRIM(REGEXP_REPLACE(REGEXP_REPLACE(
-      AI_QUERY(
-        'databricks-claude-sonnet-4-5',
-        CONCAT(
-          'You are a healthcare fraud detection AI. Return ONLY a JSON object.\\n\\n',
-          'CLAIM: ', claim_text, '\\n\\n',
-          'Return this JSON: {{"red_flags": ["flag1", "flag2"], "suspicious_patterns": ["pattern1"], "risk_score": 0.9, "affected_entities": ["entity1"]}}\\n\\n',
-          'Return ONLY the JSON object, no other text.'
-        )
-      ), '```json', ''), '```', '')),
-    'STRUCT<red_flags:ARRAY<STRING>,suspicious_patterns:ARRAY<STRING>,risk_score:DOUBLE,affected_entities:ARRAY<STRING>>'
-  )
+COMMENT '{function_comment}'
+RETURN
+  {parse_response_sql(f"{cfg.catalog}.{cfg.schema}.fraud_extract_indicators_raw(claim_text)", 'fraud_extract_indicators')}
 """)
 
-print(f"✅ Function created: {cfg.catalog}.{cfg.schema}.fraud_extract_indicators")
-print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
+print(f"✅ Functions created: {cfg.catalog}.{cfg.schema}.fraud_extract_indicators, fraud_extract_indicators_raw")
+print(f"✅ Fingerprint: {prompt_fingerprint('fraud_extract_indicators', cfg.llm_endpoint)}")
+print(f"✅ Structured output (responseFormat), errors returned instead of raised")
 
 # COMMAND ----------
 
@@ -73,14 +81,14 @@ print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
 # COMMAND ----------
 
 # Debug - see raw AI_QUERY response
-debug_result = spark.sql("""
+debug_result = spark.sql(f"""
 SELECT AI_QUERY(
-  'databricks-claude-sonnet-4-5',
+  '{cfg.llm_endpoint}',
   'You are a healthcare fraud detection AI. Return ONLY a JSON object.
 
 CLAIM: Healthcare claim: Patient billed for CPT 99215 (complex office visit) but medical notes indicate routine check-up. Provider has 4 similar upcoding patterns this month. Claim amount $450 vs typical $150.
 
-Return this JSON: {"red_flags": ["flag1", "flag2"], "suspicious_patterns": ["pattern1"], "risk_score": 0.9, "affected_entities": ["entity1"]}
+Return this JSON: {{"red_flags": ["flag1", "flag2"], "suspicious_patterns": ["pattern1"], "risk_score": 0.9, "affected_entities": ["entity1"]}}
 
 Return ONLY the JSON object, no other text.'
 ) as response
@@ -16,6 +16,9 @@ import sys
 import os
 sys.path.append(os.path.abspath('..'))
 from shared.config import get_config
+from shared.prompts import (
+    RAW_RESPONSE_TYPE, fingerprint_comment, parse_response_sql, prompt_fingerprint, structured_query_sql
+)
 
 cfg = get_config()
 print(f"Creating function in: {cfg.catalog}.{cfg.schema}")
@@ -29,15 +32,36 @@ print(f"Using LLM: {cfg.llm_endpoint}")
 # COMMAND ----------
 
 spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_generate_explanation")
-print("Dropped existing function (if any)")
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_generate_explanation_raw")
+print("Dropped existing functions (if any)")
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Create UC Function
+# MAGIC ## Create UC Functions (Structured Output)
+# MAGIC
+# MAGIC `fraud_generate_explanation_raw` returns the raw AI_QUERY response (`result`, `errorMessage`);
+# MAGIC `fraud_generate_explanation` parses it, NULL when the call failed. See 03_uc_fraud_classify.py.
 
 # COMMAND ----------
 
+# Prompt and response format live in shared/prompts.py; the COMMENT carries their fingerprint (+ endpoint)
+function_comment = fingerprint_comment(
+    "Generates human-readable explanations for healthcare fraud detection decisions for payers",
+    "fraud_generate_explanation", cfg.llm_endpoint
+)
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_generate_explanation_raw(
+  claim_text STRING,
+  is_fraudulent BOOLEAN,
+  fraud_type STRING
+)
+RETURNS {RAW_RESPONSE_TYPE}
+COMMENT '{function_comment}'
+RETURN
+  {structured_query_sql('fraud_generate_explanation', cfg.llm_endpoint)}
+""")
+
 spark.sql(f"""
 CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_generate_explanation(
   claim_text STRING,
@@ -49,27 +73,17 @@ RETURNS STRUCT<
   evidence: ARRAY<STRING>,
   recommendations: ARRAY<STRING>
 >
-COMMENT 'Generates human-readable explanations for healthcare fraud detection decisions for payers'
-RETURN 
-  FROM_JSON(
-    TRIM(REGEXP_REPLACE(REGEXP_REPLACE(
-      AI_QUERY(
-        'databricks-claude-sonnet-4-5',
-        CONCAT(
-          'Explain this fraud decision for a healthcare payer claims adjuster.\\n\\n',
-          'CLAIM: ', claim_text, '\\n',
-          'DECISION: ', IF(is_fraudulent, 'FRAUDULENT', 'LEGITIMATE'), '\\n',
-          'FRAUD TYPE: ', fraud_type, '\\n\\n',
-          'Return ONLY JSON: {{"explanation": "summary text", "evidence": ["fact1", "fact2"], "recommendations": ["action1", "action2"]}}\\n\\n',
-          'Return ONLY the JSON object.'
-        )
-      ), '```json', ''), '```', '')),
-    'STRUCT<explanation:STRING,evidence:ARRAY<STRING>,recommendations:ARRAY<STRING>>'
-  )
+COMMENT '{function_comment}'
+RETURN
+  {parse_response_sql(
+    f"{cfg.catalog}.{cfg.schema}.fraud_generate_explanation_raw(claim_text, is_fraudulent, fraud_type)",
+    'fraud_generate_explanation'
+  )}
 """)
 
-print(f"✅ Function created: {cfg.catalog}.{cfg.schema}.fraud_generate_explanation")
-print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
+print(f"✅ Functions created: {cfg.catalog}.{cfg.schema}.fraud_generate_explanation, fraud_generate_explanation_raw")
+print(f"✅ Fingerprint: {prompt_fingerprint('fraud_generate_explanation', cfg.llm_endpoint)}")
+print(f"✅ Structured output (responseFormat), errors returned instead of raised")
 
 # COMMAND ----------
 
@@ -79,16 +93,16 @@ print(f"✅ Includes markdown stripping (removes ```json and ``` wrappers)")
 # COMMAND ----------
 
 # Debug - see raw AI_QUERY response
-debug_result = spark.sql("""
+debug_result = spark.sql(f"""
 SELECT AI_QUERY(
-  'databricks-claude-sonnet-4-5',
+  '{cfg.llm_endpoint}',
   'Explain this fraud decision for a healthcare payer claims adjuster.
 
 CLAIM: Healthcare claim: Patient billed for CPT 99215 (complex office visit) but medical notes indicate routine check-up. Provider has 4 similar upcoding patterns this month.
 DECISION: FRAUDULENT
 FRAUD TYPE: Upcoding
 
-Return ONLY JSON: {"explanation": "summary text", "evidence": ["fact1", "fact2"], "recommendations": ["action1", "action2"]}
+Return ONLY JSON: {{"explanation": "summary text", "evidence": ["fact1", "fact2"], "recommendations": ["action1", "action2"]}}
 
 Return ONLY the JSON object.'
 ) as response
@@ -0,0 +1,181 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # UC Function: fraud_analyze_full
+# MAGIC
+# MAGIC Single-pass alternative to fraud_classify + fraud_extract_indicators + fraud_generate_explanation.
+# MAGIC One AI_QUERY call returns classification, indicators and explanation together, so the claim text
+# MAGIC is sent to the LLM once instead of three times.
+# MAGIC All configuration from config.yaml.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from shared.prompts import (
+    RAW_RESPONSE_TYPE, fingerprint_comment, parse_response_sql, prompt_fingerprint, structured_query_sql
+)
+
+import time
+
+cfg = get_config()
+print(f"Creating function in: {cfg.catalog}.{cfg.schema}")
+print(f"Using LLM: {cfg.llm_endpoint}")
+
+# Claims used by the benchmark at the end of this notebook
+BENCHMARK_SAMPLE = 5
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Drop Existing Function
+
+# COMMAND ----------
+
+for function_name in ("fraud_analyze_full", "fraud_analyze_full_fallback"):
+    spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.{function_name}")
+    spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.{function_name}_raw")
+print("Dropped existing functions (if any)")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Create UC Function
+# MAGIC
+# MAGIC Field names and types match the three single-purpose functions, so callers can use
+# MAGIC `result.classification`, `result.indicators` and `result.explanation` as drop-in replacements.
+# MAGIC
+# MAGIC `fraud_analyze_full_fallback` is the same function on `fallback_llm_endpoint`; 12_retry_failed_claims.py uses it
+# MAGIC for claims that keep failing on the primary endpoint.
+# MAGIC
+# MAGIC Like 03-05, each has a `_raw` companion returning the structured-output AI_QUERY response
+# MAGIC (`result`, `errorMessage`), which the scoring jobs call to record errors and parse failures.
+
+# COMMAND ----------
+
+def create_analyze_full(function_name, endpoint):
+    # Prompt and response format live in shared/prompts.py; the COMMENT carries their fingerprint (+ endpoint)
+    function_comment = fingerprint_comment(
+        "Classifies a healthcare claim, extracts fraud indicators and explains the decision in one AI call",
+        "fraud_analyze_full", endpoint
+    )
+    spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.{function_name}_raw(claim_text STRING)
+RETURNS {RAW_RESPONSE_TYPE}
+COMMENT '{function_comment}'
+RETURN
+  {structured_query_sql('fraud_analyze_full', endpoint)}
+""")
+    spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.{function_name}(claim_text STRING)
+RETURNS STRUCT<
+  classification: STRUCT<is_fraudulent: BOOLEAN, fraud_probability: DOUBLE, fraud_type: STRING, confidence: DOUBLE>,
+  indicators: STRUCT<red_flags: ARRAY<STRING>, suspicious_patterns: ARRAY<STRING>, risk_score: DOUBLE, affected_entities: ARRAY<STRING>>,
+  explanation: STRUCT<explanation: STRING, evidence: ARRAY<STRING>, recommendations: ARRAY<STRING>>
+>
+COMMENT '{function_comment}'
+RETURN
+  {parse_response_sql(f"{cfg.catalog}.{cfg.schema}.{function_name}_raw(claim_text)", 'fraud_analyze_full')}
+""")
+    print(f"✅ Function created: {cfg.catalog}.{cfg.schema}.{function_name} ({endpoint}, "
+          f"fingerprint {prompt_fingerprint('fraud_analyze_full', endpoint)})")
+
+create_analyze_full("fraud_analyze_full", cfg.llm_endpoint)
+create_analyze_full("fraud_analyze_full_fallback", cfg.fallback_llm_endpoint)
+print(f"✅ Structured output (responseFormat), errors returned instead of raised")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Test Function
+
+# COMMAND ----------
+
+test_result = spark.sql(f"""
+SELECT {cfg.catalog}.{cfg.schema}.fraud_analyze_full(
+  'Healthcare claim: Patient billed for CPT 99215 (complex office visit) but medical notes indicate routine check-up. Provider has 4 similar upcoding patterns this month. Claim amount $450 vs typical $150 for actual service rendered.'
+) as analysis
+""").collect()[0]
+
+analysis = test_result['analysis']
+print("Test Result:")
+print("=" * 70)
+if analysis and analysis['classification'] is not None:
+    print(f"  Is Fraudulent: {analysis['classification']['is_fraudulent']}")
+    print(f"  Fraud Type: {analysis['classification']['fraud_type']}")
+    print(f"  Red Flags: {analysis['indicators']['red_flags'] if analysis['indicators'] else None}")
+    print(f"  Explanation: {analysis['explanation']['explanation'] if analysis['explanation'] else None}")
+else:
+    print("  ❌ Function returned None - the call failed; fraud_analyze_full_raw returns its errorMessage")
+print("=" * 70)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Benchmark: Single Pass vs Three Calls
+# MAGIC
+# MAGIC Runs both paths over the same sample claims. Wall time is measured end to end; cost is compared by
+# MAGIC LLM calls and by characters of claim text sent to the model (the prompt overhead is similar per call).
+
+# COMMAND ----------
+
+sample_df = spark.table(cfg.claims_table).select("claim_id", "claim_text").limit(BENCHMARK_SAMPLE)
+sample_df.createOrReplaceTempView("benchmark_claims")
+sample_count = sample_df.count()
+claim_chars = sample_df.selectExpr("SUM(LENGTH(claim_text)) AS chars").collect()[0]['chars'] or 0
+
+start = time.time()
+spark.sql(f"""
+WITH classified AS (
+    SELECT
+        claim_id,
+        claim_text,
+        {cfg.catalog}.{cfg.schema}.fraud_classify(claim_text) AS classification,
+        {cfg.catalog}.{cfg.schema}.fraud_extract_indicators(claim_text) AS indicators
+    FROM benchmark_claims
+)
+SELECT
+    claim_id,
+    classification,
+    indicators,
+    {cfg.catalog}.{cfg.schema}.fraud_generate_explanation(
+        claim_text, classification.is_fraudulent, classification.fraud_type
+    ) AS explanation
+FROM classified
+""").write.format("noop").mode("overwrite").save()
+three_call_seconds = time.time() - start
+
+start = time.time()
+spark.sql(f"""
+SELECT claim_id, {cfg.catalog}.{cfg.schema}.fraud_analyze_full(claim_text) AS analysis
+FROM benchmark_claims
+""").write.format("noop").mode("overwrite").save()
+single_pass_seconds = time.time() - start
+
+three_call_calls = 3 * sample_count
+print("=" * 80)
+print(f"BENCHMARK ({sample_count} claims)")
+print("=" * 80)
+print(f"Three calls:  {three_call_seconds:6.1f}s  |  {three_call_calls} LLM calls  |  {3 * claim_chars:,} claim chars sent")
+print(f"Single pass:  {single_pass_seconds:6.1f}s  |  {sample_count} LLM calls  |  {claim_chars:,} claim chars sent")
+if single_pass_seconds > 0:
+    print(f"Speedup:      {three_call_seconds / single_pass_seconds:.1f}x wall time, "
+          f"{three_call_calls - sample_count} fewer LLM calls")
+print("=" * 80)
+
+# COMMAND ----------
+
+print("=" * 80)
+print("UC FUNCTION CREATED SUCCESSFULLY!")
+print("=" * 80)
+print(f"✅ Function: {cfg.catalog}.{cfg.schema}.fraud_analyze_full")
+print(f"✅ Fallback: {cfg.catalog}.{cfg.schema}.fraud_analyze_full_fallback ({cfg.fallback_llm_endpoint})")
+print(f"✅ LLM: {cfg.llm_endpoint}")
+print(f"✅ Returns: classification, indicators, explanation")
+print("=" * 80)
@@ -0,0 +1,128 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # UC Function: fraud_analyze_provider
+# MAGIC
+# MAGIC Provider-grouped alternative to fraud_classify. One AI_QUERY call receives a compact summary of a
+# MAGIC provider's claim history plus that provider's claims, and returns a provider-level risk assessment
+# MAGIC and a verdict per claim. Cross-claim patterns (repeated upcoding, bursts of identical services) are
+# MAGIC judged once per provider instead of being re-derived, or missed, claim by claim.
+# MAGIC All configuration from config.yaml.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from shared.prompts import (
+    PACKED_CLAIM_TYPE, PROVIDER_ANALYSIS_SCHEMA, RAW_RESPONSE_TYPE, fingerprint_comment, parse_response_sql,
+    prompt_fingerprint, structured_query_sql
+)
+from shared.fraud_scoring import provider_packs_sql
+
+cfg = get_config()
+print(f"Creating function in: {cfg.catalog}.{cfg.schema}")
+print(f"Using LLM: {cfg.llm_endpoint}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Drop Existing Function
+
+# COMMAND ----------
+
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_analyze_provider")
+spark.sql(f"DROP FUNCTION IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_analyze_provider_raw")
+print("Dropped existing functions (if any)")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Create UC Function
+# MAGIC
+# MAGIC `fraud_analyze_provider(provider_id, provider_summary, claims ARRAY<STRUCT<id, text>>)` returns
+# MAGIC `provider` (`risk_score`, `fraud_pattern`, `evidence`) and `claims`, one entry per claim id with the
+# MAGIC fraud_classify fields. As with fraud_classify_batch, callers must check that the returned ids line up
+# MAGIC with the input claims and fall back to fraud_classify when they don't; 09 (SCORING_MODE = "provider") does.
+# MAGIC `provider_summary` is built by `provider_packs_sql` in shared/fraud_scoring.py from the provider's rows
+# MAGIC in the claims table.
+
+# COMMAND ----------
+
+function_comment = fingerprint_comment(
+    "Assesses a provider and classifies its healthcare claims in one AI call",
+    "fraud_analyze_provider", cfg.llm_endpoint
+)
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_analyze_provider_raw(
+  provider_id STRING, provider_summary STRING, claims ARRAY<{PACKED_CLAIM_TYPE}>
+)
+RETURNS {RAW_RESPONSE_TYPE}
+COMMENT '{function_comment}'
+RETURN
+  {structured_query_sql('fraud_analyze_provider', cfg.llm_endpoint)}
+""")
+
+spark.sql(f"""
+CREATE OR REPLACE FUNCTION {cfg.catalog}.{cfg.schema}.fraud_analyze_provider(
+  provider_id STRING, provider_summary STRING, claims ARRAY<{PACKED_CLAIM_TYPE}>
+)
+RETURNS {PROVIDER_ANALYSIS_SCHEMA}
+COMMENT '{function_comment}'
+RETURN
+  {parse_response_sql(f"{cfg.catalog}.{cfg.schema}.fraud_analyze_provider_raw(provider_id, provider_summary, claims)", 'fraud_analyze_provider')}
+""")
+
+print(f"✅ Functions created: {cfg.catalog}.{cfg.schema}.fraud_analyze_provider, fraud_analyze_provider_raw")
+print(f"✅ Fingerprint: {prompt_fingerprint('fraud_analyze_provider', cfg.llm_endpoint)}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Test Function
+# MAGIC
+# MAGIC Runs the provider with the most claims through the same packing 09 uses.
+
+# COMMAND ----------
+
+spark.sql(f"""
+SELECT claim_id, claim_text, provider_info
+FROM {cfg.claims_table}
+WHERE provider_info['provider_id'] = (
+    SELECT provider_info['provider_id']
+    FROM {cfg.claims_table}
+    GROUP BY 1
+    ORDER BY COUNT(*) DESC
+    LIMIT 1
+)
+""").createOrReplaceTempView("provider_test_claims")
+
+test_result = spark.sql(provider_packs_sql(cfg, "provider_test_claims", cfg.provider_group_max_claims, 1)).first()
+
+print("Test Result:")
+print("=" * 70)
+print(f"  Provider: {test_result['provider_id']} ({len(test_result['claims'])} claims)")
+assessment = test_result['provider_assessment']
+if assessment is not None:
+    print(f"  Provider Risk: {assessment['risk_score']}")
+    print(f"  Pattern: {assessment['fraud_pattern']}")
+    print(f"  Evidence: {assessment['evidence']}")
+    print(f"  Claim verdicts aligned: {test_result['pack_results'] is not None}")
+else:
+    print(f"  ❌ Call failed: {test_result['pack_call']['errorMessage']}")
+print("=" * 70)
+
+# COMMAND ----------
+
+print("=" * 80)
+print("UC FUNCTION CREATED SUCCESSFULLY!")
+print("=" * 80)
+print(f"✅ Function: {cfg.catalog}.{cfg.schema}.fraud_analyze_provider")
+print(f"✅ LLM: {cfg.llm_endpoint}")
+print(f"✅ Returns: provider (risk_score, fraud_pattern, evidence), claims (per-claim classification)")
+print("=" * 80)
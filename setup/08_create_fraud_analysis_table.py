@@ -16,6 +16,7 @@ import sys
 import os
 sys.path.append(os.path.abspath('..'))
 from shared.config import get_config
+from shared.fraud_scoring import ensure_result_cache_table
 
 cfg = get_config()
 print(f"Creating fraud analysis table in: {cfg.catalog}.{cfg.schema}")
@@ -43,6 +44,7 @@ CREATE TABLE {cfg.catalog}.{cfg.schema}.fraud_analysis (
     -- Claim reference
     claim_id STRING NOT NULL,
     analysis_timestamp TIMESTAMP NOT NULL,
+    claim_text_hash STRING COMMENT 'sha2 of whitespace-normalized claim text when analyzed; detects changed claims',
     
     -- From fraud_classify function
     is_fraudulent BOOLEAN,
@@ -59,7 +61,26 @@ CREATE TABLE {cfg.catalog}.{cfg.schema}.fraud_analysis (
     -- From fraud_generate_explanation function
     explanation STRING,
     evidence ARRAY<STRING>,
-    recommendations ARRAY<STRING>
+    recommendations ARRAY<STRING>,
+    
+    -- 'ok', 'failed' when a stage returned nothing (see fraud_analysis_failures),
+    -- or 'rules-only' when the rules pre-filter cleared the claim without LLM calls
+    analysis_status STRING,
+    prompt_fingerprint STRING COMMENT 'Hash of the UC function prompts + LLM endpoint that produced this row',
+
+    -- AI_QUERY calls made for this row (0 when fully served from the result cache)
+    llm_calls INT,
+    llm_failed_calls INT COMMENT 'Calls that returned an errorMessage (endpoint error, content filter)',
+    llm_parse_failures INT COMMENT 'Calls that returned a response not matching the result schema',
+    llm_error STRING COMMENT 'First errorMessage among the calls',
+
+    -- From fraud_analyze_provider, shared by the provider's claims (NULL outside the provider scoring mode)
+    provider_risk_score DOUBLE,
+    provider_fraud_pattern STRING,
+    provider_evidence ARRAY<STRING>,
+
+    -- Rules pre-filter risk (keyword hits, amount outlier); analysis_status 'rules-only' when it cleared the claim
+    rules_score DOUBLE
 )
 USING DELTA
 COMMENT 'Fraud detection analysis results for all claims'
@@ -70,6 +91,22 @@ print(f"✅ Created fraud_analysis table: {cfg.catalog}.{cfg.schema}.fraud_analy
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Create Result Cache Table
+# MAGIC
+# MAGIC Durable cache of UC function results keyed by claim-text hash + prompt version.
+# MAGIC Shared by the Streamlit app and 09_batch_analyze_claims.py, so it is NOT dropped on redeploy.
+# MAGIC `prompt_version` includes the fingerprint of the UC function prompts and LLM endpoint (shared/prompts.py),
+# MAGIC so entries produced by an older prompt or model stop matching; bump it in config.yaml to invalidate them for other reasons.
+
+# COMMAND ----------
+
+ensure_result_cache_table(spark, cfg)
+
+print(f"✅ Result cache table ready: {cfg.result_cache_table}")
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Create Unified View
 
@@ -105,7 +142,11 @@ SELECT
     f.affected_entities,
     f.explanation,
     f.evidence,
-    f.recommendations
+    f.recommendations,
+    f.analysis_status,
+    f.provider_risk_score,
+    f.provider_fraud_pattern,
+    f.rules_score
 FROM {cfg.catalog}.{cfg.schema}.claims_data c
 LEFT JOIN {cfg.catalog}.{cfg.schema}.fraud_analysis f 
     ON c.claim_id = f.claim_id
@@ -132,6 +173,7 @@ print("FRAUD ANALYSIS TABLE CREATED!")
 print("=" * 80)
 print(f"✅ Table: {cfg.catalog}.{cfg.schema}.fraud_analysis")
 print(f"✅ View:  {cfg.catalog}.{cfg.schema}.fraud_claims_complete")
+print(f"✅ Cache: {cfg.result_cache_table}")
 print(f"✅ Change Data Feed: ENABLED")
 print("=" * 80)
 print("\n📝 Next step: Run 09_batch_analyze_claims.py to populate with fraud analysis results")
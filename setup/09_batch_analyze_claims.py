@@ -3,7 +3,27 @@
 # MAGIC # Batch Analyze All Claims
 # MAGIC
 # MAGIC Runs the 3 UC fraud detection functions on all claims and stores results.
+# MAGIC With SCORING_MODE = "fused", the single-pass fraud_analyze_full function is used instead (one LLM call per claim).
+# MAGIC With SCORING_MODE = "packed", classification packs `classify_batch_size` claims into each fraud_classify_batch call;
+# MAGIC packs whose results don't line up with their claims fall back to one fraud_classify call per claim.
+# MAGIC With SCORING_MODE = "provider", claims are grouped by provider and each group (up to `provider_group_max_claims`)
+# MAGIC is classified in one fraud_analyze_provider call with a summary of the provider's history, which also yields a
+# MAGIC provider-level risk, pattern and evidence stored on each of its claims.
+# MAGIC Before any LLM call, a deterministic rules pre-filter (app/utils/rules_engine.py) scores every claim from fraud
+# MAGIC keyword hits and its amount z-score within its claim_type; claims below `rules_risk_floor` are cleared as legitimate
+# MAGIC with analysis_status 'rules-only', and only the rest go to the UC functions. The default floor of 0.0 clears nothing
+# MAGIC (pre-filter off).
+# MAGIC In three-call mode the stages cascade: indicators and explanations are only generated when the classification
+# MAGIC warrants it (cascade_* settings in config.yaml), and skipped stages get placeholder values.
+# MAGIC Each LLM stage is materialized to a per-shard fraud_stage_* Delta table, so every AI function runs at most once per claim.
+# MAGIC Results already in fraud_result_cache (from the app or earlier runs) are reused instead of re-scored.
 # MAGIC This populates the fraud_analysis table for Genie queries.
+# MAGIC With WRITE_MODE = "incremental", only claims that are new or whose text changed since they were last
+# MAGIC analyzed are scored, and their results are MERGEd into fraud_analysis on claim_id.
+# MAGIC Claims are scored in shards that commit to fraud_analysis_staging as they finish; if the job dies, a rerun
+# MAGIC resumes the same run and only scores unfinished shards. Progress is in fraud_batch_progress.
+# MAGIC Each shard is spread over enough partitions to keep `ai_query_target_concurrency` calls in flight.
+# MAGIC For very large tables, the batch_analyze_claims_sharded job runs the shards as parallel for-each tasks.
 
 # COMMAND ----------
 
@@ -15,19 +35,223 @@
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../app'))
 from shared.config import get_config
+from shared.prompts import (
+    CLASSIFY_SCHEMA, EXPLAIN_SCHEMA, EXTRACT_SCHEMA, FULL_SCHEMA, NO_FRAUD_TYPE, PROVIDER_SCHEMA,
+    parse_response_sql, scoring_fingerprint
+)
+from utils.cost_estimator import DEFAULT_SECONDS_PER_CLAIM, estimate_batch, format_duration
+from utils.rules_engine import amount_stats_sql, amount_zscore_sql, keyword_hits_sql, rules_score_sql
+from shared.fraud_scoring import (
+    call_stats_sql, classify_packs_sql, ensure_failures_table, ensure_fraud_analysis_columns, ensure_result_cache_table,
+    unpack_classifications_sql, explain_gate_sql, extract_gate_sql, fraud_analysis_select_sql,
+    merge_into_fraud_analysis, normalized_text_hash, provider_packs_sql, record_failures
+)
 
 from datetime import datetime
-from pyspark.sql.functions import col, current_timestamp
+from pyspark.sql.functions import col, current_timestamp, expr, lit
 
 cfg = get_config()
 print(f"Analyzing claims from: {cfg.claims_table}")
 print(f"Storing results in: {cfg.catalog}.{cfg.schema}.fraud_analysis")
+print(f"Result cache: {cfg.result_cache_table} (prompt {cfg.prompt_version})")
+
+# Job parameters. The defaults score and publish a whole run in this notebook; the
+# batch_analyze_claims_sharded job (databricks.yml) instead runs stage=plan, then
+# stage=score once per shard in parallel for-each iterations, then stage=publish
+dbutils.widgets.text("stage", "all")          # all, plan, score or publish
+dbutils.widgets.text("run_id", "")            # run to score/publish (plan and all resolve it)
+dbutils.widgets.text("shards", "")            # comma-separated shards to score; empty for all pending
+dbutils.widgets.text("parallel_tasks", "1")   # tasks scoring this run at the same time
+dbutils.widgets.text("test_limit", "10")      # empty to process all claims
+dbutils.widgets.dropdown("dry_run", "false", ["false", "true"])  # estimate calls, cost and time, then stop
+STAGE = dbutils.widgets.get("stage")
+RUN_ID_PARAM = dbutils.widgets.get("run_id").strip()
+SHARDS_PARAM = [int(s) for s in dbutils.widgets.get("shards").strip("[] ").split(",") if s.strip()]
+PARALLEL_TASKS = max(1, int(dbutils.widgets.get("parallel_tasks") or 1))
+DRY_RUN = dbutils.widgets.get("dry_run") == "true"
+assert STAGE in ("all", "plan", "score", "publish"), f"Unknown stage: {STAGE}"
+print(f"Stage: {STAGE}{' (dry run: no LLM calls)' if DRY_RUN else ''}")
 
 # TESTING: Set to a small number for testing, or None to process all claims
-TEST_LIMIT = 10  # Change to None to process all claims
+TEST_LIMIT = int(dbutils.widgets.get("test_limit") or 0) or None
 print(f"\n⚠️  TEST MODE: Processing only {TEST_LIMIT} claims" if TEST_LIMIT else "Processing ALL claims")
 
+# "three_call": fraud_classify + fraud_extract_indicators + fraud_generate_explanation
+# "fused": fraud_analyze_full (setup/05a), one LLM call per claim
+# "packed": three_call, but fraud_classify_batch classifies CLASSIFY_BATCH_SIZE claims per call
+# "provider": three_call, but fraud_analyze_provider (setup/05b) classifies each provider's claims in one call
+SCORING_MODE = "three_call"
+# Claims per fraud_classify_batch call in packed mode
+CLASSIFY_BATCH_SIZE = cfg.classify_batch_size
+# Most claims per fraud_analyze_provider call in provider mode; bigger providers take several calls
+PROVIDER_GROUP_MAX_CLAIMS = cfg.provider_group_max_claims
+# fraud_result_cache function_name of classifications that came out of a pack or provider group; only
+# these modes read them back, other modes and the app's per-claim path only trust single fraud_classify calls
+PACKED_CACHE_FUNCTION = {"packed": "fraud_classify_batch", "provider": "fraud_analyze_provider"}.get(SCORING_MODE)
+# Stored on every row; 13_rescore_stale_versions.py re-scores rows with an outdated fingerprint
+SCORING_FINGERPRINT = scoring_fingerprint(SCORING_MODE, cfg.llm_endpoint)
+print(f"Scoring mode: {SCORING_MODE} (fingerprint {SCORING_FINGERPRINT})"
+      f"{f', {CLASSIFY_BATCH_SIZE} claims per classify call' if SCORING_MODE == 'packed' else ''}"
+      f"{f', up to {PROVIDER_GROUP_MAX_CLAIMS} claims per provider call' if SCORING_MODE == 'provider' else ''}")
+
+# Claims whose rules score (keyword hits, amount outlier per claim_type; 0-1) is below this are cleared
+# without LLM calls; 0 sends every claim to the UC functions
+RULES_RISK_FLOOR = cfg.rules_risk_floor
+print(f"Rules pre-filter: {f'clears claims with rules score < {RULES_RISK_FLOOR}' if RULES_RISK_FLOOR > 0 else 'off'}")
+
+# "incremental": score only new/changed claims and MERGE them into fraud_analysis
+# "full": re-score every claim and overwrite fraud_analysis
+WRITE_MODE = "incremental"
+print(f"Write mode: {WRITE_MODE}")
+
+# Claims are split into NUM_SHARDS shards by pmod(hash(claim_id), NUM_SHARDS), or by provider_id
+# in provider mode so a provider's claims are grouped together (resume a run in the mode it started with)
+NUM_SHARDS = cfg.batch_num_shards
+# Each LLM stage of a shard runs in this many Spark partitions, so the endpoint sees about
+# ai_query_target_concurrency concurrent AI_QUERY calls summed over the parallel tasks
+SHARD_PARTITIONS = max(1, cfg.ai_query_target_concurrency // PARALLEL_TASKS)
+print(f"Shards: {NUM_SHARDS} | Partitions per shard: {SHARD_PARTITIONS} "
+      f"(target concurrency {cfg.ai_query_target_concurrency} / {PARALLEL_TASKS} parallel task(s))")
+# Resume the latest run that was not published to fraud_analysis instead of starting a new one
+RESUME = True
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Resolve Run
+# MAGIC
+# MAGIC Watch a running job from any notebook with:
+# MAGIC `SELECT * FROM <catalog>.<schema>.fraud_batch_progress WHERE run_id = '<run_id>' ORDER BY shard`
+
+# COMMAND ----------
+
+spark.sql(f"""
+CREATE TABLE IF NOT EXISTS {cfg.batch_progress_table} (
+    run_id STRING NOT NULL,
+    shard INT NOT NULL,
+    num_shards INT,
+    status STRING COMMENT 'pending, running, done, failed or published',
+    claims BIGINT,
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    error STRING
+)
+USING DELTA
+COMMENT 'Per-shard progress of 09_batch_analyze_claims runs'
+""")
+
+# Parallel score tasks update different rows of these tables at the same time; deletion vectors
+# and row tracking give them row-level conflict detection, and the job retries a shard that still conflicts.
+# Create and set them before fanning out: a table created or altered during the score tasks would
+# conflict with all of them. The ALTER also covers tables created before these properties were used.
+if STAGE in ("all", "plan"):
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {cfg.batch_staging_table} (
+        claim_id STRING,
+        analysis_timestamp TIMESTAMP,
+        text_hash STRING,
+        classification_cached BOOLEAN,
+        classification {CLASSIFY_SCHEMA},
+        indicators_needed BOOLEAN,
+        indicators_cached BOOLEAN,
+        indicators {EXTRACT_SCHEMA},
+        explanation_needed BOOLEAN,
+        explanation_cached BOOLEAN,
+        explanation_result {EXPLAIN_SCHEMA},
+        prompt_fingerprint STRING,
+        llm_calls INT,
+        llm_failed_calls INT,
+        llm_parse_failures INT,
+        llm_error STRING,
+        provider_assessment {PROVIDER_SCHEMA},
+        rules_score DOUBLE,
+        rules_only BOOLEAN,
+        run_id STRING,
+        shard INT
+    )
+    USING DELTA
+    COMMENT 'Scored shards of 09_batch_analyze_claims runs, published into fraud_analysis by the publish stage'
+    """)
+    ensure_result_cache_table(spark, cfg)
+    ensure_failures_table(spark, cfg)
+    for table in (cfg.batch_progress_table, cfg.batch_staging_table, cfg.result_cache_table, cfg.failures_table):
+        spark.sql(f"""
+        ALTER TABLE {table} SET TBLPROPERTIES ('delta.enableDeletionVectors' = 'true', 'delta.enableRowTracking' = 'true')
+        """)
+
+unfinished_run = spark.sql(f"""
+SELECT run_id, MAX(num_shards) AS num_shards
+FROM {cfg.batch_progress_table}
+GROUP BY run_id
+HAVING SUM(CASE WHEN status = 'published' THEN 0 ELSE 1 END) > 0
+ORDER BY MAX(created_at) DESC
+LIMIT 1
+""").collect()
+
+if RUN_ID_PARAM:
+    # Score/publish tasks of the sharded job work on the run their plan task resolved
+    run_shards = spark.sql(
+        f"SELECT MAX(num_shards) AS num_shards FROM {cfg.batch_progress_table} WHERE run_id = :run_id",
+        args={"run_id": RUN_ID_PARAM}
+    ).collect()[0]["num_shards"]
+    if run_shards is None:
+        raise ValueError(f"Run {RUN_ID_PARAM} not found in {cfg.batch_progress_table}")
+    RUN_ID = RUN_ID_PARAM
+    NUM_SHARDS = run_shards
+    print(f"▶️  Run {RUN_ID} ({NUM_SHARDS} shards)")
+elif STAGE in ("score", "publish"):
+    raise ValueError(f"stage={STAGE} needs the run_id parameter")
+elif RESUME and unfinished_run:
+    # Settings above should match the interrupted run; the shard count is taken from it
+    RUN_ID = unfinished_run[0]["run_id"]
+    NUM_SHARDS = unfinished_run[0]["num_shards"]
+    print(f"🔁 Resuming run {RUN_ID} ({NUM_SHARDS} shards)")
+elif DRY_RUN:
+    # Nothing is recorded, so the next real run doesn't resume a dry run
+    RUN_ID = None
+    print(f"🔍 Dry run of a new run ({NUM_SHARDS} shards)")
+else:
+    RUN_ID = datetime.utcnow().strftime("run_%Y%m%d_%H%M%S")
+    spark.sql(f"""
+    INSERT INTO {cfg.batch_progress_table}
+    SELECT '{RUN_ID}', CAST(id AS INT), {NUM_SHARDS}, 'pending', NULL, current_timestamp(), NULL, NULL, NULL
+    FROM range({NUM_SHARDS})
+    """)
+    print(f"🆕 Starting run {RUN_ID} ({NUM_SHARDS} shards)")
+
+def set_shard_status(shard, status, claims=None, error=None):
+    """Record a shard's state in the progress table"""
+    started = ", started_at = current_timestamp()" if status == "running" else ""
+    finished = ", finished_at = current_timestamp()" if status in ("done", "failed") else ""
+    spark.sql(f"""
+    UPDATE {cfg.batch_progress_table}
+    SET status = :status, claims = COALESCE(:claims, claims), error = :error{started}{finished}
+    WHERE run_id = :run_id AND shard = :shard
+    """, args={"status": status, "claims": claims, "error": error, "run_id": RUN_ID, "shard": shard})
+
+pending_shards = [row["shard"] for row in spark.sql(f"""
+SELECT shard FROM {cfg.batch_progress_table}
+WHERE run_id = '{RUN_ID}' AND status NOT IN ('done', 'published')
+ORDER BY shard
+""").collect()] if RUN_ID else list(range(NUM_SHARDS))
+
+if STAGE == "publish":
+    if pending_shards:
+        raise RuntimeError(f"Run {RUN_ID} can't be published: shards {pending_shards} are not done")
+elif SHARDS_PARAM:
+    # A for-each iteration scores only its own shard(s)
+    pending_shards = [shard for shard in pending_shards if shard in SHARDS_PARAM]
+print(f"📋 Shards to score: {pending_shards or 'none'}")
+
+if STAGE == "plan":
+    # The for-each task fans out over these values
+    dbutils.jobs.taskValues.set("run_id", RUN_ID)
+    dbutils.jobs.taskValues.set("shards", pending_shards)
+    dbutils.notebook.exit(f"Planned run {RUN_ID}: {len(pending_shards)} shard(s) to score")
+
 # COMMAND ----------
 
 # MAGIC %md
@@ -35,16 +259,48 @@ print(f"\n⚠️  TEST MODE: Processing only {TEST_LIMIT} claims" if TEST_LIMIT
 
 # COMMAND ----------
 
-# Load all claims (or filter for new/unanalyzed claims)
+# Load all claims
 claims_df = spark.table(cfg.claims_table)
 
+# Hash normalized claim text for result cache lookups and change detection
+claims_df = claims_df.withColumn("text_hash", normalized_text_hash("claim_text"))
+SHARD_KEY = "COALESCE(provider_info['provider_id'], claim_id)" if SCORING_MODE == "provider" else "claim_id"
+claims_df = claims_df.withColumn("shard", expr(f"pmod(hash({SHARD_KEY}), {NUM_SHARDS})"))
+
+incremental = WRITE_MODE == "incremental" and spark.catalog.tableExists(cfg.fraud_analysis_table)
+if incremental:
+    # Tables created before change detection have no claim_text_hash; their rows are re-scored once
+    ensure_fraud_analysis_columns(spark, cfg)
+
+    # Skip claims already analyzed with the same text
+    analyzed = spark.table(cfg.fraud_analysis_table).select(
+        col("claim_id"), col("claim_text_hash").alias("text_hash")
+    )
+    claims_df = claims_df.join(analyzed, on=["claim_id", "text_hash"], how="left_anti")
+    print("♻️  Incremental: only new or changed claims are scored")
+elif WRITE_MODE == "incremental":
+    print(f"⚠️  {cfg.fraud_analysis_table} not found - scoring all claims")
+
+# Rules pre-filter: amount z-scores against the whole claims table, keyword hits from the fraud vocabulary
+claims_df = (
+    claims_df.join(spark.sql(amount_stats_sql(cfg.claims_table)), on="claim_type", how="left")
+    .withColumn("rules_keyword_hits", expr(keyword_hits_sql("claim_text")))
+    .withColumn("amount_zscore", expr(amount_zscore_sql()))
+    .withColumn("rules_score", expr(rules_score_sql()))
+    .withColumn("rules_only", expr(f"rules_score < {RULES_RISK_FLOOR}"))
+    .drop("amount_mean", "amount_stddev")
+)
+
 # Apply test limit if set
 if TEST_LIMIT:
-    claims_df = claims_df.limit(TEST_LIMIT)
+    # Ordered so parallel score tasks of the sharded job pick the same claims
+    claims_df = claims_df.orderBy("claim_id").limit(TEST_LIMIT)
     print(f"⚠️  TEST MODE: Limited to {TEST_LIMIT} claims for testing")
 
 total_claims = claims_df.count()
 print(f"📊 Found {total_claims} claims to analyze")
+if RULES_RISK_FLOOR > 0:
+    print(f"🧮 {claims_df.filter('rules_only').count()} of them are cleared by the rules pre-filter")
 
 # Show sample
 print("\nSample claims:")
@@ -56,109 +312,563 @@ claims_df.createOrReplaceTempView("claims_to_process")
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Batch Process Claims Using UC Functions
+# MAGIC ## Dry-Run Estimate
+# MAGIC
+# MAGIC LLM calls per function, tokens and cost for the shards still to score, before any AI_QUERY call.
+# MAGIC Cached results and the cascade gate rates seen in fraud_analysis reduce the calls; wall time comes from
+# MAGIC the throughput of earlier shards in fraud_batch_progress. Set the `dry_run` widget to stop here.
 
 # COMMAND ----------
 
-# Register UDFs that call the UC functions
-# This allows us to process in batch rather than row-by-row
+estimate_df = spark.table("claims_to_process").filter(col("shard").isin(pending_shards))
+# Claims the rules pre-filter clears make no call
+rules_cleared = estimate_df.filter("rules_only").count()
+estimate_df = estimate_df.filter("NOT rules_only")
+estimate_df.createOrReplaceTempView("claims_to_estimate")
+totals = estimate_df.selectExpr("COUNT(*) AS claims", "COALESCE(SUM(LENGTH(claim_text)), 0) AS chars").collect()[0]
+
+# Claims with a cached result for the current prompt version make no call
+cached_claims = {row["function_name"]: row["claims"] for row in spark.sql(f"""
+SELECT r.function_name, COUNT(DISTINCT e.claim_id) AS claims
+FROM claims_to_estimate e
+JOIN (
+    SELECT DISTINCT text_hash, function_name FROM {cfg.result_cache_table}
+    WHERE prompt_version = '{cfg.prompt_version}'
+) r ON r.text_hash = e.text_hash
+GROUP BY r.function_name
+""").collect()} if spark.catalog.tableExists(cfg.result_cache_table) else {}
+
+# Share of earlier results that passed each cascade gate (every claim when there is no history)
+gate_rates = {"extract": 1.0, "explain": 1.0}
+if spark.catalog.tableExists(cfg.fraud_analysis_table):
+    history = spark.sql(f"""
+    SELECT
+        AVG(CASE WHEN is_fraudulent OR fraud_probability >= {cfg.cascade_extract_min_probability} THEN 1.0 ELSE 0.0 END) AS extract,
+        AVG(CASE WHEN is_fraudulent THEN 1.0 ELSE 0.0 END) AS fraud
+    FROM {cfg.fraud_analysis_table}
+    WHERE COALESCE(analysis_status, 'ok') = 'ok'
+    """).collect()[0]
+    if history["extract"] is not None:
+        gate_rates = {"extract": history["extract"], "explain": history["fraud"] if cfg.cascade_explain_only_fraud else 1.0}
+
+def uncached(function_name):
+    return 1.0 - cached_claims.get(function_name, 0) / totals["claims"] if totals["claims"] else 0.0
+
+# Claims per call of the packed classify functions; provider groups are as large as the
+# providers' claim counts allow (uncached claims only, approximated by all pending ones)
+provider_groups = spark.sql(f"""
+SELECT COALESCE(SUM(CEIL(claims / {PROVIDER_GROUP_MAX_CLAIMS})), 0) AS groups
+FROM (
+    SELECT COUNT(*) AS claims FROM claims_to_estimate
+    GROUP BY COALESCE(provider_info['provider_id'], claim_id)
+)
+""").collect()[0]["groups"] if SCORING_MODE == "provider" else 0
+claims_per_call = {
+    "fraud_classify_batch": CLASSIFY_BATCH_SIZE,
+    "fraud_analyze_provider": totals["claims"] / provider_groups if provider_groups else 1,
+}
+
+if SCORING_MODE == "fused":
+    stage_fractions = {"fraud_analyze_full": uncached("fraud_analyze_full")}
+else:
+    classify_function = {"packed": "fraud_classify_batch", "provider": "fraud_analyze_provider"}.get(SCORING_MODE, "fraud_classify")
+    stage_fractions = {
+        classify_function: uncached("fraud_classify"),
+        "fraud_extract_indicators": gate_rates["extract"] * uncached("fraud_extract_indicators"),
+        "fraud_generate_explanation": gate_rates["explain"] * uncached("fraud_generate_explanation"),
+    }
+
+# Measured shard throughput over the last 30 days; one shard runs per task at a time
+throughput = spark.sql(f"""
+SELECT SUM(claims) / SUM(unix_timestamp(finished_at) - unix_timestamp(started_at)) AS claims_per_second
+FROM {cfg.batch_progress_table}
+WHERE status IN ('done', 'published') AND claims > 0 AND finished_at > started_at
+  AND finished_at >= current_timestamp() - INTERVAL 30 DAYS
+""").collect()[0]["claims_per_second"]
+
+estimate = estimate_batch(
+    totals["claims"], totals["chars"], stage_fractions,
+    claims_per_second=throughput * PARALLEL_TASKS if throughput else None,
+    seconds_per_claim=DEFAULT_SECONDS_PER_CLAIM["Single-pass" if SCORING_MODE == "fused" else "Deep"],
+    concurrency=SHARD_PARTITIONS * PARALLEL_TASKS,
+    claims_per_call=claims_per_call,
+    input_cost_per_mtok=cfg.llm_input_cost_per_mtok,
+    output_cost_per_mtok=cfg.llm_output_cost_per_mtok
+)
 
-print("Running batch fraud analysis...")
-print("This will call all 3 UC functions for each claim...")
-print("Note: Some claims may be skipped if they trigger content filters")
+print("=" * 80)
+print(f"ESTIMATE: {estimate['claims']} claims in {len(pending_shards)} shard(s), {SCORING_MODE} mode")
+print("=" * 80)
+for function_name in stage_fractions:
+    stage = estimate["usage"][function_name]
+    print(f"   {function_name:28s} {stage['calls']:>8,} calls  "
+          f"{stage['input_tokens']:>12,} in  {stage['output_tokens']:>10,} out tokens")
+print(f"LLM calls:  {estimate['llm_calls']:,}")
+if rules_cleared:
+    # Calls the cleared claims would have made at this batch's average calls per claim
+    avoided_calls = rules_cleared * estimate['llm_calls'] / estimate['claims'] if estimate['claims'] else 0
+    print(f"Rules:      {rules_cleared:,} claims cleared without LLM calls, ~{avoided_calls:,.0f} calls avoided "
+          f"({avoided_calls / (avoided_calls + estimate['llm_calls']) if avoided_calls else 0:.1%})")
+print(f"Tokens:     {estimate['input_tokens']:,} input / {estimate['output_tokens']:,} output")
+print(f"Cost:       ${estimate['cost_usd']:,.2f} "
+      f"(${cfg.llm_input_cost_per_mtok}/${cfg.llm_output_cost_per_mtok} per 1M input/output tokens)")
+print(f"Wall time:  {format_duration(estimate['seconds'])} "
+      f"({'measured throughput' if throughput else 'default latency, no earlier runs'}, {PARALLEL_TASKS} parallel task(s))")
+print("=" * 80)
 
-# Process claims with error handling using TRY/CATCH
-# Call all 3 UC functions using SQL with try_* functions for error handling
-analyzed_df = spark.sql(f"""
-SELECT 
-    claim_id,
-    CURRENT_TIMESTAMP() as analysis_timestamp,
-    claim_text,
-    
-    -- Call fraud_classify with error handling
-    TRY_CAST(
-        {cfg.catalog}.{cfg.schema}.fraud_classify(claim_text) 
-        AS STRUCT<is_fraudulent:BOOLEAN, fraud_probability:DOUBLE, fraud_type:STRING, confidence:DOUBLE>
-    ) as classification,
-    
-    -- Call fraud_extract_indicators with error handling
-    TRY_CAST(
-        {cfg.catalog}.{cfg.schema}.fraud_extract_indicators(claim_text)
-        AS STRUCT<red_flags:ARRAY<STRING>, suspicious_patterns:ARRAY<STRING>, risk_score:DOUBLE, affected_entities:ARRAY<STRING>>
-    ) as indicators
-    
-FROM claims_to_process
-""")
+if DRY_RUN:
+    dbutils.notebook.exit(
+        f"Dry run: {estimate['llm_calls']} LLM calls, ~${estimate['cost_usd']:.2f}, ~{format_duration(estimate['seconds'])}"
+    )
 
-# Now we need to call fraud_generate_explanation with the classification results
-# First, persist the intermediate results
-analyzed_df.createOrReplaceTempView("temp_analysis")
+# COMMAND ----------
 
-# Call explanation function with classification results - skip rows with NULL classification
-final_df = spark.sql(f"""
-SELECT 
-    t.claim_id,
-    t.analysis_timestamp,
-    
-    -- Extract classification fields (with NULL handling)
-    COALESCE(t.classification.is_fraudulent, FALSE) as is_fraudulent,
-    COALESCE(t.classification.fraud_probability, 0.0) as fraud_probability,
-    COALESCE(t.classification.fraud_type, 'Unknown') as fraud_type,
-    COALESCE(t.classification.confidence, 0.0) as classification_confidence,
-    
-    -- Extract indicator fields (with NULL handling)
-    COALESCE(t.indicators.red_flags, ARRAY()) as red_flags,
-    COALESCE(t.indicators.suspicious_patterns, ARRAY()) as suspicious_patterns,
-    COALESCE(t.indicators.risk_score, 0.0) as risk_score,
-    COALESCE(t.indicators.affected_entities, ARRAY()) as affected_entities,
-    
-    -- Call explanation function with error handling (only if classification succeeded)
-    CASE 
-        WHEN t.classification IS NOT NULL THEN
-            TRY_CAST(
-                {cfg.catalog}.{cfg.schema}.fraud_generate_explanation(
-                    t.claim_text,
-                    t.classification.is_fraudulent,
-                    t.classification.fraud_type
-                ) AS STRUCT<explanation:STRING, evidence:ARRAY<STRING>, recommendations:ARRAY<STRING>>
-            )
-        ELSE NULL
-    END as explanation_result
-    
-FROM temp_analysis t
-""")
+# MAGIC %md
+# MAGIC ## Batch Process Claims Using UC Functions
 
-# Extract explanation fields
-# First create temp view from final_df
-final_df.createOrReplaceTempView("temp_final")
+# COMMAND ----------
 
-final_with_explanation = spark.sql(f"""
-SELECT 
-    claim_id,
-    analysis_timestamp,
-    is_fraudulent,
-    fraud_probability,
-    fraud_type,
-    classification_confidence,
-    red_flags,
-    suspicious_patterns,
-    risk_score,
-    affected_entities,
-    COALESCE(explanation_result.explanation, 'No explanation available') as explanation,
-    COALESCE(explanation_result.evidence, ARRAY()) as evidence,
-    COALESCE(explanation_result.recommendations, ARRAY()) as recommendations
-FROM temp_final
-""")
+# Latest cached result per key for the current prompt version
+def create_cache_view(view_name, *function_names):
+    function_names_sql = ", ".join(f"'{name}'" for name in function_names)
+    spark.sql(f"""
+    CREATE OR REPLACE TEMP VIEW {view_name} AS
+    SELECT text_hash, arg_signature, MAX_BY(result_json, created_at) AS result_json
+    FROM {cfg.result_cache_table}
+    WHERE function_name IN ({function_names_sql})
+      AND prompt_version = '{cfg.prompt_version}'
+    GROUP BY text_hash, arg_signature
+    """)
+
+# Packed modes also reuse classifications cached from earlier packs of the same mode
+create_cache_view("cached_classify", "fraud_classify", *([PACKED_CACHE_FUNCTION] if PACKED_CACHE_FUNCTION else []))
+create_cache_view("cached_extract", "fraud_extract_indicators")
+create_cache_view("cached_explain", "fraud_generate_explanation")
+create_cache_view("cached_full", "fraud_analyze_full")
+
+# Matches arg_signature() in app/utils/durable_cache.py for (is_fraudulent, fraud_type)
+EXPLAIN_ARG_SIGNATURE = f"""CONCAT_WS('|',
+    COALESCE(LOWER(CAST(t.classification.is_fraudulent AS STRING)), '{NO_FRAUD_TYPE}'),
+    COALESCE(t.classification.fraud_type, '{NO_FRAUD_TYPE}'))"""
+
+# Cascade gates (three_call mode), from config.yaml common settings
+EXTRACT_MIN_PROBABILITY = cfg.cascade_extract_min_probability
+EXPLAIN_ONLY_FRAUD = cfg.cascade_explain_only_fraud
+EXTRACT_GATE = extract_gate_sql(cfg)
+EXPLAIN_GATE = explain_gate_sql(cfg)
+
+# Every stage that calls an LLM is written to a staging Delta table and read back,
+# so its AI_QUERY calls run in exactly one Spark job and later references
+# (gates, explanation arguments, saves, cache write-back) never re-evaluate them
+# (one table per shard, so parallel score tasks don't overwrite each other's stages)
+def materialize(df, stage, shard):
+    table = f"{cfg.catalog}.{cfg.schema}.fraud_stage_{stage}_{shard}"
+    df.write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(table)
+    print(f"   💾 Stage '{stage}' materialized: {table}")
+    return spark.table(table)
 
-# IMPORTANT: Cache the result to avoid re-computing expensive LLM calls
-print("Caching results to avoid re-computation...")
-final_with_explanation.cache()
+print("Running batch fraud analysis...")
+print("Note: Some claims may be skipped if they trigger content filters")
+if SCORING_MODE == "fused":
+    print("Cached results are reused; fraud_analyze_full only runs for uncached claim texts...")
+elif SCORING_MODE == "packed":
+    print(f"Cached results are reused; uncached claims are classified {CLASSIFY_BATCH_SIZE} per fraud_classify_batch call...")
+elif SCORING_MODE == "provider":
+    print(f"Cached results are reused; uncached claims are classified per provider, "
+          f"up to {PROVIDER_GROUP_MAX_CLAIMS} per fraud_analyze_provider call...")
+else:
+    print("Cached results are reused; the 3 UC functions only run for uncached claim texts...")
+if SCORING_MODE != "fused":
+    print(f"Cascade: extract when fraud_probability >= {EXTRACT_MIN_PROBABILITY}, "
+          f"explain {'fraudulent claims only' if EXPLAIN_ONLY_FRAUD else 'every classified claim'}")
+
+# Scored columns kept per shard in the staging table (same for every scoring mode; the plan stage creates the table with them)
+STAGING_COLUMNS = [
+    "claim_id", "analysis_timestamp", "text_hash",
+    "classification_cached", "classification",
+    "indicators_needed", "indicators_cached", "indicators",
+    "explanation_needed", "explanation_cached", "explanation_result",
+    "prompt_fingerprint",
+    "llm_calls", "llm_failed_calls", "llm_parse_failures", "llm_error",
+    "provider_assessment",
+    "rules_score", "rules_only",
+]
+
+def score_shard(shard):
+    """Score one shard, commit it to the staging table and write fresh results to the result cache"""
+    shard_df = spark.table("claims_to_process").filter(col("shard") == shard)
+    shard_df.filter("rules_only").createOrReplaceTempView("rules_cleared_claims")
+    # AI_QUERY calls run one partition at a time per Spark task, so the partition count is the
+    # concurrency the endpoint sees; source and staging-table layouts don't decide it
+    shard_df.filter("NOT rules_only").repartition(SHARD_PARTITIONS).createOrReplaceTempView("shard_claims")
+
+    if SCORING_MODE == "fused":
+        # One call per claim; the three stage columns are projected out of its result
+        # so everything downstream is identical to the three-call path
+        scored_df = materialize(spark.sql(f"""
+        SELECT
+            claim_id,
+            analysis_timestamp,
+            claim_text,
+            text_hash,
+            full_cached,
+            full_result,
+            full_cached as classification_cached,
+            full_result.classification as classification,
+            full_cached as indicators_cached,
+            full_result.indicators as indicators,
+            full_cached as explanation_cached,
+            full_result.explanation as explanation_result,
+            TRUE as indicators_needed,
+            TRUE as explanation_needed,
+            CAST(NULL AS {PROVIDER_SCHEMA}) as provider_assessment,
+            rules_score,
+            FALSE as rules_only,
+            {call_stats_sql([("full_call", "full_result")])}
+        FROM (
+            SELECT *,
+                CASE
+                    WHEN full_cached THEN FROM_JSON(full_cached_json, '{FULL_SCHEMA}')
+                    ELSE {parse_response_sql("full_call", "fraud_analyze_full")}
+                END as full_result
+            FROM (
+                SELECT
+                    c.claim_id,
+                    CURRENT_TIMESTAMP() as analysis_timestamp,
+                    c.claim_text,
+                    c.text_hash,
+                    c.rules_score,
+                    cf.result_json IS NOT NULL as full_cached,
+                    cf.result_json as full_cached_json,
+                    CASE
+                        WHEN cf.result_json IS NULL THEN {cfg.catalog}.{cfg.schema}.fraud_analyze_full_raw(c.claim_text)
+                    END as full_call
+                FROM shard_claims c
+                LEFT JOIN cached_full cf ON cf.text_hash = c.text_hash AND cf.arg_signature = ''
+            )
+        )
+        """), "full", shard)
+    else:
+        if SCORING_MODE in ("packed", "provider"):
+            # Stage 1a: uncached claims classified CLASSIFY_BATCH_SIZE per fraud_classify_batch call,
+            # or per provider group in one fraud_analyze_provider call (cached claims get no provider assessment)
+            spark.sql("""
+            SELECT c.claim_id, c.claim_text, c.provider_info
+            FROM shard_claims c
+            LEFT ANTI JOIN cached_classify cc ON cc.text_hash = c.text_hash AND cc.arg_signature = ''
+            """).createOrReplaceTempView("claims_to_pack")
+            if SCORING_MODE == "packed":
+                packs_sql = classify_packs_sql(cfg, "claims_to_pack", CLASSIFY_BATCH_SIZE, SHARD_PARTITIONS)
+            else:
+                packs_sql = provider_packs_sql(cfg, "claims_to_pack", PROVIDER_GROUP_MAX_CLAIMS, SHARD_PARTITIONS)
+            packs_df = materialize(spark.sql(packs_sql), "packs", shard)
+            packs_df.createOrReplaceTempView("classify_packs")
+            pack_stats = packs_df.selectExpr(
+                "COUNT(*) AS packs",
+                "SUM(CASE WHEN pack_results IS NULL THEN 1 ELSE 0 END) AS misaligned",
+                "SUM(CASE WHEN pack_results IS NULL THEN SIZE(claims) ELSE 0 END) AS fallback_claims",
+                "SUM(CASE WHEN provider_assessment.risk_score >= 0.7 THEN 1 ELSE 0 END) AS high_risk_groups"
+            ).collect()[0]
+            print(f"   📦 {pack_stats['packs']} {'provider groups' if SCORING_MODE == 'provider' else 'packs'}; "
+                  f"{pack_stats['misaligned'] or 0} failed or didn't line up "
+                  f"→ {pack_stats['fallback_claims'] or 0} claims fall back to fraud_classify")
+            if SCORING_MODE == "provider":
+                print(f"   🏥 {pack_stats['high_risk_groups'] or 0} provider groups with risk_score >= 0.7")
+            spark.sql(unpack_classifications_sql("classify_packs")).createOrReplaceTempView("packed_classifications")
+        else:
+            spark.sql(unpack_classifications_sql()).createOrReplaceTempView("packed_classifications")
+
+        # Stage 1: classify every claim (cached result, packed result or fresh call with error handling)
+        # UC functions are only evaluated in the CASE branch where no other result exists;
+        # the raw responses are kept so stage 2 can count their errors and parse failures
+        classified_df = materialize(spark.sql(f"""
+        SELECT *,
+            CASE
+                WHEN classification_cached THEN FROM_JSON(classify_cached_json, '{CLASSIFY_SCHEMA}')
+                WHEN packed_classification IS NOT NULL THEN packed_classification
+                ELSE {parse_response_sql("classify_call", "fraud_classify")}
+            END as classification
+        FROM (
+            SELECT
+                c.claim_id,
+                CURRENT_TIMESTAMP() as analysis_timestamp,
+                c.claim_text,
+                c.text_hash,
+                c.rules_score,
+                FALSE as rules_only,
+                cc.result_json IS NOT NULL as classification_cached,
+                cc.result_json as classify_cached_json,
+                cc.result_json IS NULL AND p.packed_classification IS NOT NULL as classification_packed,
+                p.packed_classification,
+                p.provider_assessment,
+                p.pack_call,
+                p.pack_results,
+                CASE
+                    WHEN cc.result_json IS NULL AND p.packed_classification IS NULL
+                    THEN {cfg.catalog}.{cfg.schema}.fraud_classify_raw(c.claim_text)
+                END as classify_call
+            FROM shard_claims c
+            LEFT JOIN cached_classify cc ON cc.text_hash = c.text_hash AND cc.arg_signature = ''
+            LEFT JOIN packed_classifications p ON p.claim_id = c.claim_id
+        )
+        """).drop("classify_cached_json", "packed_classification"), "classify", shard)
+        # Small staged files are read back as few partitions; spread them out again for stage 2
+        classified_df.repartition(SHARD_PARTITIONS).createOrReplaceTempView("temp_analysis")
+
+        # Stage 2: extract and explain only where the gates pass; skipped stages stay NULL
+        # here and get placeholders in the final table. Claims whose classification failed
+        # are still extracted (nothing to gate on) but cannot be explained.
+        scored_df = materialize(spark.sql(f"""
+        SELECT *,
+            {call_stats_sql([
+                ("pack_call", "pack_results"),
+                ("classify_call", "classification"),
+                ("extract_call", "indicators"),
+                ("explain_call", "explanation_result"),
+            ])}
+        FROM (
+            SELECT *,
+                CASE
+                    WHEN NOT explanation_needed THEN NULL
+                    WHEN explanation_cached_json IS NOT NULL THEN FROM_JSON(explanation_cached_json, '{EXPLAIN_SCHEMA}')
+                    ELSE {parse_response_sql("explain_call", "fraud_generate_explanation")}
+                END as explanation_result,
+                CASE
+                    WHEN NOT indicators_needed THEN NULL
+                    WHEN indicators_cached_json IS NOT NULL THEN FROM_JSON(indicators_cached_json, '{EXTRACT_SCHEMA}')
+                    ELSE {parse_response_sql("extract_call", "fraud_extract_indicators")}
+                END as indicators
+            FROM (
+                SELECT *,
+                    CASE
+                        WHEN explanation_needed AND explanation_cached_json IS NULL
+                        THEN {cfg.catalog}.{cfg.schema}.fraud_generate_explanation_raw(
+                            claim_text,
+                            classification.is_fraudulent,
+                            classification.fraud_type
+                        )
+                    END as explain_call,
+                    CASE
+                        WHEN indicators_needed AND indicators_cached_json IS NULL
+                        THEN {cfg.catalog}.{cfg.schema}.fraud_extract_indicators_raw(claim_text)
+                    END as extract_call
+                FROM (
+                    SELECT
+                        t.*,
+                        {EXTRACT_GATE} as indicators_needed,
+                        ci.result_json IS NOT NULL as indicators_cached,
+                        ci.result_json as indicators_cached_json,
+                        {EXPLAIN_GATE} as explanation_needed,
+                        ce.result_json IS NOT NULL as explanation_cached,
+                        ce.result_json as explanation_cached_json
+                    FROM temp_analysis t
+                    LEFT JOIN cached_extract ci ON ci.text_hash = t.text_hash AND ci.arg_signature = ''
+                    LEFT JOIN cached_explain ce
+                        ON ce.text_hash = t.text_hash AND ce.arg_signature = {EXPLAIN_ARG_SIGNATURE}
+                )
+            )
+        )
+        """).drop(
+            "indicators_cached_json", "explanation_cached_json",
+            "pack_call", "pack_results", "classify_call", "extract_call", "explain_call"
+        ), "scored", shard)
+
+    scored_df.createOrReplaceTempView("temp_final")
+
+    # Claims the rules pre-filter cleared: legitimate, no LLM calls, nothing written to the result cache
+    # or the dead-letter table. The classification fields get neutral placeholders like failed rows;
+    # the rules score only goes into rules_score
+    cleared_df = spark.sql(f"""
+    SELECT
+        claim_id,
+        CURRENT_TIMESTAMP() as analysis_timestamp,
+        text_hash,
+        FALSE as classification_cached,
+        CAST(NAMED_STRUCT(
+            'is_fraudulent', FALSE,
+            'fraud_probability', 0.0,
+            'fraud_type', '{NO_FRAUD_TYPE}',
+            'confidence', 0.0
+        ) AS {CLASSIFY_SCHEMA}) as classification,
+        FALSE as indicators_needed,
+        FALSE as indicators_cached,
+        CAST(NULL AS {EXTRACT_SCHEMA}) as indicators,
+        FALSE as explanation_needed,
+        FALSE as explanation_cached,
+        CAST(NULL AS {EXPLAIN_SCHEMA}) as explanation_result,
+        0 as llm_calls,
+        0 as llm_failed_calls,
+        0 as llm_parse_failures,
+        CAST(NULL AS STRING) as llm_error,
+        CAST(NULL AS {PROVIDER_SCHEMA}) as provider_assessment,
+        rules_score,
+        TRUE as rules_only
+    FROM rules_cleared_claims
+    """)
+
+    # Commit the shard: replace anything a previous attempt left for it
+    staged = (
+        scored_df.withColumn("prompt_fingerprint", lit(SCORING_FINGERPRINT))
+        .select(*STAGING_COLUMNS)
+        .unionByName(cleared_df.withColumn("prompt_fingerprint", lit(SCORING_FINGERPRINT)).select(*STAGING_COLUMNS))
+        .withColumn("run_id", lit(RUN_ID))
+        .withColumn("shard", lit(shard).cast("int"))
+    )
+    spark.sql(f"DELETE FROM {cfg.batch_staging_table} WHERE run_id = '{RUN_ID}' AND shard = {shard}")
+    staged.write.mode("append").option("mergeSchema", "true").saveAsTable(cfg.batch_staging_table)
+
+    # Freshly scored results go into fraud_result_cache so the app and future runs can reuse them
+    if SCORING_MODE == "fused":
+        write_back_source = """
+        SELECT DISTINCT text_hash, 'fraud_analyze_full' AS function_name, '' AS arg_signature,
+               TO_JSON(full_result) AS result_json
+        FROM temp_final
+        WHERE NOT full_cached AND full_result IS NOT NULL
+        """
+    else:
+        # Only packed and provider rows have classification_packed; other modes cache single calls
+        classify_function = (
+            f"CASE WHEN classification_packed THEN '{PACKED_CACHE_FUNCTION}' ELSE 'fraud_classify' END"
+            if PACKED_CACHE_FUNCTION else "'fraud_classify'"
+        )
+        write_back_source = f"""
+        SELECT DISTINCT text_hash, {classify_function} AS function_name,
+               '' AS arg_signature, TO_JSON(classification) AS result_json
+        FROM temp_final
+        WHERE NOT classification_cached AND classification IS NOT NULL
+        UNION ALL
+        SELECT DISTINCT text_hash, 'fraud_extract_indicators', '',
+               TO_JSON(indicators)
+        FROM temp_final
+        WHERE NOT indicators_cached AND indicators IS NOT NULL
+        UNION ALL
+        SELECT DISTINCT t.text_hash, 'fraud_generate_explanation', {EXPLAIN_ARG_SIGNATURE},
+               TO_JSON(t.explanation_result)
+        FROM temp_final t
+        WHERE NOT t.explanation_cached AND t.explanation_result IS NOT NULL
+        """
+
+    spark.sql(f"""
+    MERGE INTO {cfg.result_cache_table} AS c
+    USING ({write_back_source}) AS s
+    ON c.text_hash = s.text_hash
+       AND c.function_name = s.function_name
+       AND c.arg_signature = s.arg_signature
+       AND c.prompt_version = '{cfg.prompt_version}'
+    WHEN NOT MATCHED THEN INSERT
+        (text_hash, function_name, arg_signature, prompt_version, result_json, source, created_at)
+    VALUES
+        (s.text_hash, s.function_name, s.arg_signature, '{cfg.prompt_version}', s.result_json, 'batch_job', current_timestamp())
+    """)
+
+    # Failed rows go to the dead-letter table for 12_retry_failed_claims.py
+    failed = record_failures(spark, cfg, "temp_final", source=f"batch_job:{RUN_ID}")
+    if failed:
+        print(f"   ⚠️  {failed} claims failed scoring → {cfg.failures_table}")
+    cleared = cleared_df.count()
+    if cleared:
+        print(f"   🧮 {cleared} claims cleared by the rules pre-filter")
+    return scored_df.count() + cleared
+
+failed_shards = []
+for shard in pending_shards:
+    print(f"▶️  Shard {shard + 1}/{NUM_SHARDS}")
+    set_shard_status(shard, "running")
+    try:
+        shard_claims = score_shard(shard)
+        set_shard_status(shard, "done", claims=shard_claims)
+        print(f"✅ Shard {shard} committed ({shard_claims} claims)")
+    except Exception as e:
+        set_shard_status(shard, "failed", error=str(e)[:2000])
+        failed_shards.append(shard)
+        print(f"❌ Shard {shard} failed: {e}")
+
+if failed_shards:
+    raise RuntimeError(
+        f"Shards {failed_shards} of run {RUN_ID} failed; rerun this notebook to resume them "
+        f"(finished shards are kept in {cfg.batch_staging_table})"
+    )
+
+if STAGE == "score":
+    # The publish task of the sharded job merges the whole run once every shard is done
+    dbutils.notebook.exit(f"Scored shards {pending_shards} of run {RUN_ID}")
+
+# Everything scored by this run, across all its attempts
+spark.table(cfg.batch_staging_table).filter(col("run_id") == RUN_ID).createOrReplaceTempView("temp_final")
+final_with_explanation = spark.sql(
+    fraud_analysis_select_sql("temp_final", provider_assessment=True, rules_prefilter=True)
+)
 
 # Count successful vs failed analyses
-success_count = final_with_explanation.filter("explanation != 'No explanation available'").count()
-print(f"✅ Successfully analyzed {success_count} out of {total_claims} claims")
-if success_count < total_claims:
-    print(f"⚠️  {total_claims - success_count} claims were skipped due to content filtering or errors")
+failed_count = final_with_explanation.filter("analysis_status = 'failed'").count()
+print(f"✅ Successfully analyzed {total_claims - failed_count} out of {total_claims} claims")
+if failed_count:
+    print(f"⚠️  {failed_count} claims failed (content filtering or errors); they are marked analysis_status = 'failed' "
+          f"and queued in {cfg.failures_table} for 12_retry_failed_claims.py")
+
+cache_stats = spark.sql("""
+SELECT
+    SUM(CASE WHEN classification_cached THEN 1 ELSE 0 END) as classify_cached,
+    SUM(CASE WHEN indicators_needed AND indicators_cached THEN 1 ELSE 0 END) as extract_cached,
+    SUM(CASE WHEN explanation_needed AND explanation_cached THEN 1 ELSE 0 END) as explain_cached,
+    SUM(CASE WHEN NOT indicators_needed THEN 1 ELSE 0 END) as extract_skipped,
+    SUM(CASE WHEN NOT explanation_needed AND classification IS NOT NULL THEN 1 ELSE 0 END) as explain_skipped,
+    -- Calls the cascade avoided: skipped stages that would not have been cache hits
+    SUM(CASE WHEN NOT indicators_needed AND NOT indicators_cached THEN 1 ELSE 0 END)
+      + SUM(CASE WHEN NOT explanation_needed AND classification IS NOT NULL AND NOT explanation_cached THEN 1 ELSE 0 END)
+      as llm_calls_saved,
+    -- Rows that took the fresh-call branch of each stage, i.e. actual function invocations
+    SUM(CASE WHEN NOT classification_cached THEN 1 ELSE 0 END) as classify_calls,
+    SUM(CASE WHEN indicators_needed AND NOT indicators_cached THEN 1 ELSE 0 END) as extract_calls,
+    SUM(CASE WHEN explanation_needed AND classification IS NOT NULL AND NOT explanation_cached THEN 1 ELSE 0 END) as explain_calls,
+    -- Paid calls that produced nothing: endpoint errors and responses that didn't parse
+    COALESCE(SUM(llm_calls), 0) as llm_calls,
+    COALESCE(SUM(llm_failed_calls), 0) as llm_failed_calls,
+    COALESCE(SUM(llm_parse_failures), 0) as llm_parse_failures,
+    COUNT(DISTINCT claim_id) as distinct_claims
+FROM temp_final
+WHERE NOT COALESCE(rules_only, FALSE)
+""").collect()[0]
+rules_cleared = spark.table("temp_final").filter("rules_only").count()
+if SCORING_MODE == "fused":
+    print(f"♻️  Served from result cache: analyze_full={cache_stats['classify_cached']}")
+else:
+    print(f"♻️  Served from result cache: classify={cache_stats['classify_cached']}, "
+          f"extract={cache_stats['extract_cached']}, explain={cache_stats['explain_cached']}")
+    # Out of the three calls per claim a full run makes for the claims sent to the LLM; rules-cleared
+    # claims never reach the cascade and are reported on their own line below
+    print(f"⏭️  Cascade skipped: extract={cache_stats['extract_skipped']}, explain={cache_stats['explain_skipped']} "
+          f"→ {cache_stats['llm_calls_saved']} LLM calls saved out of {3 * cache_stats['distinct_claims']} "
+          f"for a full run of the {cache_stats['distinct_claims']} claims sent to the LLM")
+
+# Each stage ran in a single write job, so these counts are the LLM calls made
+print(f"🔢 Function invocations for {cache_stats['distinct_claims']} claims (at most one per claim per stage):")
+if SCORING_MODE == "fused":
+    print(f"   fraud_analyze_full:         {cache_stats['classify_calls']}")
+elif SCORING_MODE == "packed":
+    # Claims classified fresh, in packs of up to CLASSIFY_BATCH_SIZE plus single-call fallbacks;
+    # llm_calls below counts the actual calls
+    print(f"   fraud_classify_batch:       {cache_stats['classify_calls']} claims, up to {CLASSIFY_BATCH_SIZE} per call")
+elif SCORING_MODE == "provider":
+    print(f"   fraud_analyze_provider:     {cache_stats['classify_calls']} claims, "
+          f"up to {PROVIDER_GROUP_MAX_CLAIMS} of one provider per call")
+else:
+    print(f"   fraud_classify:             {cache_stats['classify_calls']}")
+    print(f"   fraud_extract_indicators:   {cache_stats['extract_calls']}")
+    print(f"   fraud_generate_explanation: {cache_stats['explain_calls']}")
+if cache_stats['llm_calls']:
+    wasted_calls = cache_stats['llm_failed_calls'] + cache_stats['llm_parse_failures']
+    print(f"🗑️  Wasted calls: {wasted_calls} of {cache_stats['llm_calls']} "
+          f"({wasted_calls / cache_stats['llm_calls']:.1%}): {cache_stats['llm_failed_calls']} errors, "
+          f"{cache_stats['llm_parse_failures']} parse failures "
+          f"({cache_stats['llm_parse_failures'] / cache_stats['llm_calls']:.1%})")
+if rules_cleared:
+    # Cleared claims would have made about as many calls as the claims this run sent to the LLM
+    calls_per_claim = cache_stats['llm_calls'] / cache_stats['distinct_claims'] if cache_stats['distinct_claims'] else 0
+    avoided_calls = rules_cleared * calls_per_claim
+    print(f"🧮 Rules pre-filter: {rules_cleared} of {rules_cleared + cache_stats['distinct_claims']} claims cleared "
+          f"without LLM calls → ~{avoided_calls:,.0f} LLM calls avoided "
+          f"({avoided_calls / (avoided_calls + cache_stats['llm_calls']) if avoided_calls else 0:.1%} of the calls)")
 
 # COMMAND ----------
 
@@ -179,15 +889,25 @@ display(final_with_explanation.limit(3))
 
 # COMMAND ----------
 
-# Write results to fraud_analysis table
-final_with_explanation.write.mode("overwrite").saveAsTable(
-    f"{cfg.catalog}.{cfg.schema}.fraud_analysis"
-)
-
-# Unpersist cache after write
-final_with_explanation.unpersist()
-
-print(f"✅ Saved {total_claims} fraud analysis results to table")
+if incremental:
+    # Upsert on claim_id: changed claims replace their previous analysis
+    final_with_explanation.createOrReplaceTempView("new_analysis")
+    merge_into_fraud_analysis(spark, cfg, "new_analysis")
+    print(f"✅ Merged {total_claims} new or changed fraud analysis results into table")
+else:
+    # Write results to fraud_analysis table
+    final_with_explanation.write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(
+        cfg.fraud_analysis_table
+    )
+    print(f"✅ Saved {total_claims} fraud analysis results to table")
+
+# The run is complete: later runs start fresh, and its staged rows are no longer needed
+spark.sql(f"UPDATE {cfg.batch_progress_table} SET status = 'published' WHERE run_id = '{RUN_ID}'")
+spark.sql(f"DELETE FROM {cfg.batch_staging_table} WHERE run_id = '{RUN_ID}'")
+for shard in range(NUM_SHARDS):
+    for stage in ("full", "packs", "classify", "scored"):
+        spark.sql(f"DROP TABLE IF EXISTS {cfg.catalog}.{cfg.schema}.fraud_stage_{stage}_{shard}")
+print(f"✅ Run {RUN_ID} published")
 
 # COMMAND ----------
 
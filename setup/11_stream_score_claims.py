@@ -0,0 +1,201 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Stream Score Claims
+# MAGIC
+# MAGIC Continuously scores new and changed claims into fraud_analysis.
+# MAGIC Reads the claims_data change feed as a Delta stream, scores each micro-batch with the UC fraud functions
+# MAGIC in `foreachBatch`, and MERGEs the results on claim_id. Each MERGE is tagged with the stream's
+# MAGIC transaction id (txnAppId/txnVersion), so a micro-batch replayed after a failure is not applied twice.
+# MAGIC
+# MAGIC Trigger interval and micro-batch size come from config.yaml (stream_* settings).
+# MAGIC Run it as a continuous job; 09_batch_analyze_claims.py remains the tool for backfills and full re-scores.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+import math
+import sys
+import os
+from contextlib import contextmanager
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from shared.fraud_scoring import (
+    ensure_failures_table, ensure_fraud_analysis_columns, fraud_analysis_select_sql,
+    merge_into_fraud_analysis, normalized_text_hash, record_failures, score_claims
+)
+
+from pyspark.sql import Window
+from pyspark.sql.functions import col, lit, pmod, row_number, xxhash64
+
+cfg = get_config()
+print(f"Streaming claims from: {cfg.claims_table}")
+print(f"Merging results into: {cfg.fraud_analysis_table}")
+print(f"Checkpoint: {cfg.stream_checkpoint_path}")
+
+# "three_call" (with the config cascade) or "fused" (fraud_analyze_full, one LLM call per claim)
+SCORING_MODE = "three_call"
+
+# True: score everything pending, then stop (for scheduled runs); False: run continuously
+AVAILABLE_NOW = False
+
+TRIGGER_INTERVAL = cfg.stream_trigger_interval
+MAX_ROWS_PER_BATCH = cfg.stream_max_rows_per_batch
+
+# Identify this stream's writes to fraud_analysis and to the dead-letter table for idempotent retries
+STREAM_APP_ID = f"stream_score_claims_{cfg.catalog}_{cfg.schema}"
+FAILURES_APP_ID = f"{STREAM_APP_ID}_failures"
+# txnVersion = batch_id * stride + chunk, so chunks of one micro-batch stay ordered
+CHUNK_VERSION_STRIDE = 1_000_000
+
+# Scored rows of the current chunk
+STREAM_STAGE_TABLE = f"{cfg.catalog}.{cfg.schema}.fraud_stage_stream"
+
+print(f"Trigger: {'available now' if AVAILABLE_NOW else TRIGGER_INTERVAL} | "
+      f"Max rows per batch: {MAX_ROWS_PER_BATCH} | Scoring mode: {SCORING_MODE}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Prepare Tables
+
+# COMMAND ----------
+
+# The stream reads the change feed, which 02_generate_sample_data.py turns on for claims_data;
+# only enable it here for a claims table created elsewhere, so a restart doesn't commit a no-op ALTER
+cdf_enabled = spark.sql(
+    f"SHOW TBLPROPERTIES {cfg.claims_table} ('delta.enableChangeDataFeed')"
+).collect()[0]["value"]
+if cdf_enabled != "true":
+    spark.sql(f"ALTER TABLE {cfg.claims_table} SET TBLPROPERTIES ('delta.enableChangeDataFeed' = 'true')")
+    print(f"✅ Change data feed enabled on {cfg.claims_table}")
+else:
+    print(f"✅ Change data feed already enabled on {cfg.claims_table}")
+
+# Change detection needs claim_text_hash (tables created before it existed lack it)
+ensure_fraud_analysis_columns(spark, cfg)
+ensure_failures_table(spark, cfg)
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Micro-Batch Scoring
+
+# COMMAND ----------
+
+@contextmanager
+def txn_tagged(session, app_id, version):
+    """Tag the writes in this block with (txnAppId, txnVersion); Delta skips a write whose pair was already committed"""
+    session.conf.set("spark.databricks.delta.write.txnAppId", app_id)
+    session.conf.set("spark.databricks.delta.write.txnVersion", str(version))
+    try:
+        yield
+    finally:
+        session.conf.unset("spark.databricks.delta.write.txnAppId")
+        session.conf.unset("spark.databricks.delta.write.txnVersion")
+
+
+def score_batch(batch_df, batch_id):
+    """Score the new/changed claims of one micro-batch and MERGE them into fraud_analysis"""
+    # Temp views of batch_df live in the micro-batch's own session
+    session = batch_df.sparkSession
+
+    # Latest insert or update per claim; deletes leave earlier analyses in place
+    latest = Window.partitionBy("claim_id").orderBy(col("_commit_version").desc())
+    changed = (
+        batch_df
+        .filter(col("_change_type").isin("insert", "update_postimage"))
+        .withColumn("_rank", row_number().over(latest))
+        .filter("_rank = 1")
+        .select("claim_id", "claim_text")
+        .withColumn("text_hash", normalized_text_hash("claim_text"))
+        .persist()
+    )
+
+    # Updates that didn't touch the claim text don't need re-scoring
+    analyzed = session.table(cfg.fraud_analysis_table).select(
+        col("claim_id"), col("claim_text_hash").alias("text_hash")
+    )
+    pending = None
+
+    try:
+        # Chunks are hash buckets of claim_id sized from the whole micro-batch, before filtering against
+        # fraud_analysis, so a replayed batch maps every claim to the same chunk (and txnVersion) as the
+        # first attempt. Buckets hold about MAX_ROWS_PER_BATCH claims each
+        n_chunks = max(1, math.ceil(changed.count() / MAX_ROWS_PER_BATCH))
+        pending = (
+            changed
+            .withColumn("chunk", pmod(xxhash64("claim_id"), lit(n_chunks)))
+            .join(analyzed, on=["claim_id", "text_hash"], how="left_anti")
+            .persist()
+        )
+
+        total = pending.count()
+        if total == 0:
+            print(f"Batch {batch_id}: no new or changed claims")
+            return
+
+        chunks = sorted(row["chunk"] for row in pending.select("chunk").distinct().collect())
+        assert chunks[-1] < CHUNK_VERSION_STRIDE, "Micro-batch too large for stream_max_rows_per_batch"
+
+        for chunk in chunks:
+            pending.filter(col("chunk") == chunk).createOrReplaceTempView("stream_claims")
+            # Materialized so the MERGE and the dead-letter pass read the same LLM results
+            score_claims(session, cfg, "stream_claims", SCORING_MODE).write.mode("overwrite") \
+                .option("overwriteSchema", "true").saveAsTable(STREAM_STAGE_TABLE)
+            session.table(STREAM_STAGE_TABLE).createOrReplaceTempView("stream_scored")
+            session.sql(fraud_analysis_select_sql("stream_scored")).createOrReplaceTempView("stream_results")
+
+            txn_version = batch_id * CHUNK_VERSION_STRIDE + chunk
+            with txn_tagged(session, STREAM_APP_ID, txn_version):
+                merge_into_fraud_analysis(session, cfg, "stream_results")
+
+            # Dead-letter failures for 12_retry_failed_claims.py, under their own app id so a replayed
+            # chunk doesn't bump attempt_count twice
+            with txn_tagged(session, FAILURES_APP_ID, txn_version):
+                record_failures(session, cfg, "stream_scored", source="stream")
+
+        print(f"✅ Batch {batch_id}: scored {total} claims in {len(chunks)} MERGE(s)")
+    finally:
+        if pending is not None:
+            pending.unpersist()
+        changed.unpersist()
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Start Stream
+
+# COMMAND ----------
+
+claims_stream = (
+    spark.readStream
+    .format("delta")
+    .option("readChangeFeed", "true")
+    .table(cfg.claims_table)
+)
+
+writer = (
+    claims_stream.writeStream
+    .queryName("stream_score_claims")
+    .foreachBatch(score_batch)
+    .option("checkpointLocation", cfg.stream_checkpoint_path)
+)
+writer = writer.trigger(availableNow=True) if AVAILABLE_NOW else writer.trigger(processingTime=TRIGGER_INTERVAL)
+
+query = writer.start()
+print(f"🚀 Streaming scorer started: {query.id}")
+
+# COMMAND ----------
+
+query.awaitTermination()
+
+print("=" * 80)
+print("STREAMING SCORER STOPPED")
+print("=" * 80)
+print(f"✅ Results in: {cfg.fraud_analysis_table}")
+print(f"✅ Checkpoint: {cfg.stream_checkpoint_path} (restart resumes from here)")
+print("=" * 80)
@@ -0,0 +1,154 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Retry Failed Claims
+# MAGIC
+# MAGIC Re-scores only the claims in fraud_analysis_failures (dead-lettered by 09 and 11) whose backoff has expired,
+# MAGIC and merges the successes back into fraud_analysis.
+# MAGIC Retries switch strategy: the first uses the single-pass fraud_analyze_full prompt on the primary endpoint,
+# MAGIC later ones fraud_analyze_full_fallback on `fallback_llm_endpoint`. Claims still failing after MAX_ATTEMPTS
+# MAGIC are marked abandoned for manual review.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from shared.prompts import parse_response_sql, scoring_fingerprint
+from shared.fraud_scoring import (
+    RETRY_BACKOFF_BASE_MINUTES, call_stats_sql, ensure_failures_table, ensure_fraud_analysis_columns, fraud_analysis_select_sql,
+    merge_into_fraud_analysis, normalized_text_hash, record_failures
+)
+
+cfg = get_config()
+print(f"Failures: {cfg.failures_table}")
+print(f"Primary endpoint: {cfg.llm_endpoint} | Fallback endpoint: {cfg.fallback_llm_endpoint}")
+
+# Attempts (including the original scoring) before a claim is abandoned
+MAX_ATTEMPTS = 4
+
+# Most claims retried per run, or None for all that are due
+RETRY_LIMIT = None
+
+print(f"Backoff: {RETRY_BACKOFF_BASE_MINUTES} min doubling per attempt | Max attempts: {MAX_ATTEMPTS}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Select Claims Due for Retry
+
+# COMMAND ----------
+
+ensure_failures_table(spark, cfg)
+ensure_fraud_analysis_columns(spark, cfg)
+
+due_df = spark.sql(f"""
+SELECT f.claim_id, f.attempt_count, f.error_class, c.claim_text
+FROM {cfg.failures_table} f
+JOIN {cfg.claims_table} c ON c.claim_id = f.claim_id
+WHERE f.status = 'open'
+  AND f.attempt_count < {MAX_ATTEMPTS}
+  AND f.next_retry_at <= current_timestamp()
+ORDER BY f.next_retry_at
+""").withColumn("text_hash", normalized_text_hash("claim_text"))
+
+if RETRY_LIMIT:
+    due_df = due_df.limit(RETRY_LIMIT)
+
+due_df.createOrReplaceTempView("claims_to_retry")
+due_count = due_df.count()
+print(f"📊 {due_count} claims due for retry")
+display(spark.sql("SELECT error_class, attempt_count, COUNT(*) AS claims FROM claims_to_retry GROUP BY ALL ORDER BY ALL"))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Re-Score
+
+# COMMAND ----------
+
+retry_stage_table = f"{cfg.catalog}.{cfg.schema}.fraud_stage_retry"
+
+if due_count:
+    # Only the CASE branch for the row's attempt is evaluated; the result is materialized
+    # so merging and dead-lettering read the same LLM output. Recovered rows carry the "fused"
+    # scoring fingerprint of the endpoint that answered, which 13 counts as current
+    spark.sql(f"""
+    SELECT
+        claim_id,
+        analysis_timestamp,
+        text_hash,
+        full_result.classification as classification,
+        full_result.indicators as indicators,
+        full_result.explanation as explanation_result,
+        TRUE as indicators_needed,
+        TRUE as explanation_needed,
+        CASE
+            WHEN attempt_count <= 1 THEN '{scoring_fingerprint("fused", cfg.llm_endpoint)}'
+            ELSE '{scoring_fingerprint("fused", cfg.fallback_llm_endpoint)}'
+        END as prompt_fingerprint,
+        {call_stats_sql([("full_call", "full_result")])}
+    FROM (
+        SELECT *, {parse_response_sql("full_call", "fraud_analyze_full")} as full_result
+        FROM (
+            SELECT
+                claim_id,
+                CURRENT_TIMESTAMP() as analysis_timestamp,
+                text_hash,
+                attempt_count,
+                CASE
+                    WHEN attempt_count <= 1
+                    THEN {cfg.catalog}.{cfg.schema}.fraud_analyze_full_raw(claim_text)
+                    ELSE {cfg.catalog}.{cfg.schema}.fraud_analyze_full_fallback_raw(claim_text)
+                END as full_call
+            FROM claims_to_retry
+        )
+    )
+    """).write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(retry_stage_table)
+    spark.table(retry_stage_table).createOrReplaceTempView("retry_scored")
+
+    # Successes replace the placeholder rows in fraud_analysis
+    spark.sql(fraud_analysis_select_sql("retry_scored")).filter("analysis_status = 'ok'") \
+        .createOrReplaceTempView("retry_results")
+    recovered = spark.table("retry_results").count()
+    merge_into_fraud_analysis(spark, cfg, "retry_results")
+
+    # Resolves recovered claims; bumps attempts and backoff for the rest
+    still_failing = record_failures(spark, cfg, "retry_scored", source="retry_job")
+    print(f"✅ Recovered {recovered} of {due_count} claims; {still_failing} still failing")
+else:
+    print("Nothing to retry")
+
+abandoned = spark.sql(f"""
+UPDATE {cfg.failures_table}
+SET status = 'abandoned'
+WHERE status = 'open' AND attempt_count >= {MAX_ATTEMPTS}
+""").collect()[0]["num_affected_rows"]
+if abandoned:
+    print(f"🛑 {abandoned} claims abandoned after {MAX_ATTEMPTS} attempts - review them manually")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Dead-Letter Summary
+
+# COMMAND ----------
+
+print("=" * 80)
+print("FAILED CLAIMS BY STATUS")
+print("=" * 80)
+display(spark.sql(f"""
+SELECT
+    status, error_class, COUNT(*) AS claims,
+    -- The rest returned a response that didn't parse
+    COUNT(last_error) AS call_errors,
+    MAX(attempt_count) AS max_attempts, MIN(next_retry_at) AS next_retry
+FROM {cfg.failures_table}
+GROUP BY status, error_class
+ORDER BY status, error_class
+"""))
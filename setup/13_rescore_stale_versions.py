@@ -0,0 +1,211 @@
+# Databricks notebook source
+# MAGIC %md
+# MAGIC # Re-Score Stale Prompt Versions
+# MAGIC
+# MAGIC Every fraud_analysis row records the fingerprint (prompt templates + LLM endpoint, see shared/prompts.py)
+# MAGIC of the UC functions that produced it. After changing a prompt or `llm_endpoint` and re-running 03-05a,
+# MAGIC this notebook re-scores only the rows whose fingerprint matches none of the current templates: any scoring
+# MAGIC mode on `llm_endpoint` or `fallback_llm_endpoint`, so rows from 09's other modes and 12's retries count as
+# MAGIC current. Rows cleared by the rules pre-filter (analysis_status 'rules-only') made no LLM calls and are skipped.
+# MAGIC
+# MAGIC Validate a new version on a sample first: set SAMPLE_FRACTION, compare old and new verdicts in
+# MAGIC fraud_rescore_validation, then run again with SAMPLE_FRACTION = None to roll it out to the whole table.
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Import Configuration
+
+# COMMAND ----------
+
+import sys
+import os
+sys.path.append(os.path.abspath('..'))
+from shared.config import get_config
+from shared.prompts import (
+    SCORING_MODE_FUNCTIONS, comment_fingerprint, current_scoring_fingerprints, prompt_fingerprint, scoring_fingerprint
+)
+from shared.fraud_scoring import (
+    RULES_ONLY_STATUS, ensure_fraud_analysis_columns, fraud_analysis_select_sql, merge_into_fraud_analysis,
+    normalized_text_hash, score_claims
+)
+
+cfg = get_config()
+
+# "three_call" or "fused"; stale rows are re-scored in this mode and get its fingerprint
+SCORING_MODE = "three_call"
+CURRENT_FINGERPRINT = scoring_fingerprint(SCORING_MODE, cfg.llm_endpoint)
+
+# Rows with any of these are up to date, whichever mode and endpoint (09, 11, 12) produced them
+CURRENT_FINGERPRINTS = current_scoring_fingerprints([cfg.llm_endpoint, cfg.fallback_llm_endpoint])
+CURRENT_FINGERPRINTS_SQL = ", ".join(f"'{fingerprint}'" for fingerprint in CURRENT_FINGERPRINTS)
+
+# Fraction of stale rows to re-score, e.g. 0.05 to validate a new version; None for all of them
+SAMPLE_FRACTION = 0.05
+SAMPLE_SEED = 42
+# Sampled results only go to the validation table unless this is True
+PUBLISH_SAMPLE = False
+
+# Most rows re-scored per run, or None
+RESCORE_LIMIT = None
+
+VALIDATION_TABLE = f"{cfg.catalog}.{cfg.schema}.fraud_rescore_validation"
+RESCORE_STAGE_TABLE = f"{cfg.catalog}.{cfg.schema}.fraud_stage_rescore"
+
+print(f"Scoring mode: {SCORING_MODE} | Current fingerprint: {CURRENT_FINGERPRINT} ({cfg.llm_endpoint})")
+print(f"Accepted as current: {', '.join(CURRENT_FINGERPRINTS)}")
+print(f"Sample: {SAMPLE_FRACTION if SAMPLE_FRACTION else 'all stale rows'}"
+      f"{' (validation only)' if SAMPLE_FRACTION and not PUBLISH_SAMPLE else ''}")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Check Deployed Functions
+# MAGIC
+# MAGIC The fingerprint is computed from shared/prompts.py; the deployed functions must have been
+# MAGIC recreated from the same templates, or the new rows would be labelled with a version they don't have.
+
+# COMMAND ----------
+
+deployed = {
+    row["routine_name"]: comment_fingerprint(row["comment"])
+    for row in spark.sql(f"""
+    SELECT routine_name, comment
+    FROM {cfg.catalog}.information_schema.routines
+    WHERE routine_schema = '{cfg.schema}'
+    """).collect()
+}
+
+outdated = []
+for function_name in SCORING_MODE_FUNCTIONS[SCORING_MODE]:
+    expected = prompt_fingerprint(function_name, cfg.llm_endpoint)
+    actual = deployed.get(function_name)
+    print(f"{'✅' if actual == expected else '❌'} {function_name}: deployed {actual}, expected {expected}")
+    if actual != expected:
+        outdated.append(function_name)
+
+if outdated:
+    raise RuntimeError(
+        f"{outdated} don't match shared/prompts.py and llm_endpoint; "
+        "re-run 03_uc_fraud_classify.py to 05a_uc_fraud_analyze_full.py first"
+    )
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Select Stale Rows
+
+# COMMAND ----------
+
+ensure_fraud_analysis_columns(spark, cfg)
+
+print("Rows per fingerprint:")
+display(spark.sql(f"""
+SELECT
+    COALESCE(prompt_fingerprint, '(none)') AS prompt_fingerprint,
+    COALESCE(prompt_fingerprint IN ({CURRENT_FINGERPRINTS_SQL}), FALSE) AS is_current,
+    analysis_status <=> '{RULES_ONLY_STATUS}' AS rules_only,
+    COUNT(*) AS claims
+FROM {cfg.fraud_analysis_table}
+GROUP BY ALL
+ORDER BY claims DESC
+"""))
+
+# Rows scored before fingerprints existed have none and count as stale; rules-only rows have no LLM output
+stale_df = spark.sql(f"""
+SELECT f.claim_id, c.claim_text
+FROM {cfg.fraud_analysis_table} f
+JOIN {cfg.claims_table} c ON c.claim_id = f.claim_id
+WHERE NOT COALESCE(f.prompt_fingerprint IN ({CURRENT_FINGERPRINTS_SQL}), FALSE)
+  AND NOT (f.analysis_status <=> '{RULES_ONLY_STATUS}')
+""")
+
+if SAMPLE_FRACTION:
+    stale_df = stale_df.sample(fraction=SAMPLE_FRACTION, seed=SAMPLE_SEED)
+if RESCORE_LIMIT:
+    stale_df = stale_df.limit(RESCORE_LIMIT)
+
+stale_df = stale_df.withColumn("text_hash", normalized_text_hash("claim_text"))
+stale_df.createOrReplaceTempView("claims_to_rescore")
+stale_count = stale_df.count()
+print(f"📊 {stale_count} stale rows selected for re-scoring")
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Re-Score and Compare
+
+# COMMAND ----------
+
+if stale_count:
+    # Materialized so the comparison and the MERGE read the same LLM results
+    score_claims(spark, cfg, "claims_to_rescore", SCORING_MODE).write.mode("overwrite") \
+        .option("overwriteSchema", "true").saveAsTable(RESCORE_STAGE_TABLE)
+    spark.table(RESCORE_STAGE_TABLE).createOrReplaceTempView("rescore_scored")
+    spark.sql(fraud_analysis_select_sql("rescore_scored")).createOrReplaceTempView("rescore_results")
+
+    # fraud_analysis still holds the previous version's rows at this point
+    spark.sql(f"""
+    SELECT
+        r.claim_id,
+        f.prompt_fingerprint AS previous_fingerprint,
+        r.prompt_fingerprint,
+        f.is_fraudulent AS previous_is_fraudulent,
+        r.is_fraudulent,
+        f.fraud_type AS previous_fraud_type,
+        r.fraud_type,
+        f.fraud_probability AS previous_fraud_probability,
+        r.fraud_probability,
+        r.analysis_status,
+        current_timestamp() AS validated_at
+    FROM rescore_results r
+    JOIN {cfg.fraud_analysis_table} f ON f.claim_id = r.claim_id
+    """).write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(VALIDATION_TABLE)
+
+    comparison = spark.sql(f"""
+    SELECT
+        COUNT(*) AS claims,
+        AVG(CASE WHEN is_fraudulent = previous_is_fraudulent THEN 1.0 ELSE 0.0 END) AS verdict_agreement,
+        AVG(CASE WHEN fraud_type = previous_fraud_type THEN 1.0 ELSE 0.0 END) AS fraud_type_agreement,
+        SUM(CASE WHEN is_fraudulent AND NOT previous_is_fraudulent THEN 1 ELSE 0 END) AS newly_flagged,
+        SUM(CASE WHEN previous_is_fraudulent AND NOT is_fraudulent THEN 1 ELSE 0 END) AS newly_cleared,
+        AVG(fraud_probability - previous_fraud_probability) AS mean_probability_shift
+    FROM {VALIDATION_TABLE}
+    WHERE analysis_status = 'ok'
+    """).collect()[0]
+    failed_rescores = spark.table(VALIDATION_TABLE).filter("analysis_status = 'failed'").count()
+
+    print("=" * 80)
+    print(f"OLD vs NEW VERSION ({stale_count} claims)")
+    print("=" * 80)
+    print(f"Failed re-scores:      {failed_rescores}")
+    if comparison["claims"]:
+        print(f"Verdict agreement:     {comparison['verdict_agreement']:.1%}")
+        print(f"Fraud type agreement:  {comparison['fraud_type_agreement']:.1%}")
+        print(f"Newly flagged:         {comparison['newly_flagged']}")
+        print(f"Newly cleared:         {comparison['newly_cleared']}")
+        print(f"Mean probability shift: {comparison['mean_probability_shift']:+.3f}")
+    print(f"Per-claim comparison:  {VALIDATION_TABLE}")
+    print("=" * 80)
+    display(spark.table(VALIDATION_TABLE).filter("is_fraudulent <> previous_is_fraudulent"))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## Publish
+# MAGIC
+# MAGIC Only successful re-scores replace existing rows. A failed re-score keeps the previous (stale but valid)
+# MAGIC analysis, which is picked up again by the next run.
+
+# COMMAND ----------
+
+if not stale_count:
+    print("✅ Every LLM-scored row already has a current fingerprint")
+elif SAMPLE_FRACTION and not PUBLISH_SAMPLE:
+    print("🔍 Validation run: fraud_analysis unchanged. Set SAMPLE_FRACTION = None to re-score every stale row.")
+else:
+    spark.table("rescore_results").filter("analysis_status = 'ok'").createOrReplaceTempView("rescore_publish")
+    published = spark.table("rescore_publish").count()
+    merge_into_fraud_analysis(spark, cfg, "rescore_publish")
+    print(f"✅ Re-scored {published} of {stale_count} rows into {cfg.fraud_analysis_table} "
+          f"with fingerprint {CURRENT_FINGERPRINT}")
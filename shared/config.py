@@ -29,6 +29,8 @@ import yaml
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+from shared.prompts import result_cache_version
+
 
 class FraudDetectionConfig:
     """Configuration container with all settings"""
@@ -42,6 +44,8 @@ class FraudDetectionConfig:
         self.warehouse_id = env_config['warehouse_id']
         self.vector_endpoint = env_config['vector_endpoint']
         self.llm_endpoint = env_config['llm_endpoint']
+        # Used when retrying claims that failed on llm_endpoint (optional)
+        self.fallback_llm_endpoint = env_config.get('fallback_llm_endpoint') or self.llm_endpoint
         self.app_name = env_config['app_name']
         self.genie_space_id = env_config.get('genie_space_id', '')  # Optional, empty string if not set
         
@@ -55,6 +59,26 @@ class FraudDetectionConfig:
         self.genie_description = common_config['genie_space_description']
         self.embedding_model = common_config['embedding_model']
         self.sync_type = common_config['sync_type']
+        # Result cache key: configured prompt_version + fingerprint of the UC function prompts and llm_endpoint
+        self.prompt_version = result_cache_version(common_config.get('prompt_version', 'v1'), self.llm_endpoint)
+        # Batch cascade: later LLM stages only run when classification warrants it
+        self.cascade_extract_min_probability = float(common_config.get('cascade_extract_min_probability', 0.3))
+        self.cascade_explain_only_fraud = bool(common_config.get('cascade_explain_only_fraud', True))
+        # Rules pre-filter: claims scoring below this are cleared without LLM calls (0 = off)
+        self.rules_risk_floor = float(common_config.get('rules_risk_floor', 0.0))
+        # Streaming scorer (11_stream_score_claims.py)
+        self.stream_trigger_interval = common_config.get('stream_trigger_interval', '5 minutes')
+        self.stream_max_rows_per_batch = int(common_config.get('stream_max_rows_per_batch', 500))
+        # Batch scoring throughput (09_batch_analyze_claims.py)
+        self.ai_query_target_concurrency = int(common_config.get('ai_query_target_concurrency', 32))
+        self.batch_num_shards = int(common_config.get('batch_num_shards', 8))
+        # Claims per fraud_classify_batch call (09 SCORING_MODE = "packed" and the batch page)
+        self.classify_batch_size = int(common_config.get('classify_batch_size', 8))
+        # Most claims per fraud_analyze_provider call (09 SCORING_MODE = "provider")
+        self.provider_group_max_claims = int(common_config.get('provider_group_max_claims', 20))
+        # Dry-run cost estimates (USD per million tokens on llm_endpoint)
+        self.llm_input_cost_per_mtok = float(common_config.get('llm_input_cost_per_mtok', 3.0))
+        self.llm_output_cost_per_mtok = float(common_config.get('llm_output_cost_per_mtok', 15.0))
         
         # Computed values (automatically derived)
         self.volume = "fraud_knowledge_docs"
@@ -63,6 +87,12 @@ class FraudDetectionConfig:
         self.knowledge_base_table = f"{self.catalog}.{self.schema}.fraud_cases_kb"
         self.vector_index = f"{self.catalog}.{self.schema}.fraud_cases_index"
         self.config_table = f"{self.catalog}.{self.schema}.config_genie"
+        self.fraud_analysis_table = f"{self.catalog}.{self.schema}.fraud_analysis"
+        self.result_cache_table = f"{self.catalog}.{self.schema}.fraud_result_cache"
+        self.stream_checkpoint_path = f"{self.volume_path}/_checkpoints/stream_score_claims"
+        self.batch_staging_table = f"{self.catalog}.{self.schema}.fraud_analysis_staging"
+        self.batch_progress_table = f"{self.catalog}.{self.schema}.fraud_batch_progress"
+        self.failures_table = f"{self.catalog}.{self.schema}.fraud_analysis_failures"
     
     def __repr__(self):
         return f"FraudDetectionConfig(env={self.catalog}, warehouse={self.warehouse_id})"
@@ -158,6 +188,7 @@ def print_config(cfg: FraudDetectionConfig):
     print(f"Claims Table:      {cfg.claims_table}")
     print(f"Vector Index:      {cfg.vector_index}")
     print(f"Volume Path:       {cfg.volume_path}")
+    print(f"Result Cache:      {cfg.result_cache_table} (prompt {cfg.prompt_version})")
     print("=" * 80)
 
 
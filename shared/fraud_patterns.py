@@ -0,0 +1,36 @@
+"""
+Fraud Detection Claims - Sample Data Fraud Patterns
+
+Indicator phrases per fraud type and suspicious-phrase templates that
+02_generate_sample_data.py writes into synthetic fraudulent claims.
+
+This is the generator's vocabulary only. The rules pre-filter
+(app/utils/rules_engine.py) deliberately keeps its own keyword list, so its
+scores on the synthetic data don't just recognize the generator's phrases.
+
+Usage in notebooks:
+    from shared.fraud_patterns import FRAUD_PATTERNS, SUSPICIOUS_PHRASES
+"""
+
+# Healthcare fraud patterns for payers (indicator phrases per fraud type)
+FRAUD_PATTERNS = {
+    "Upcoding": ["CPT code inflated", "billed higher complexity", "unwarranted level 5 visit"],
+    "Unbundling": ["separated bundled procedures", "multiple line items for bundled service"],
+    "Phantom": ["service never rendered", "patient denies receiving service"],
+    "Duplicate": ["duplicate billing", "same claim resubmitted", "double billing"],
+    "Unnecessary": ["medically unnecessary procedure", "excessive testing", "overutilization"],
+    "Kickback": ["illegal referral arrangement", "financial incentive for referral"],
+    "Identity": ["stolen patient ID", "deceased patient billed", "identity theft"],
+    "Prescription": ["pill mill pattern", "fake prescription", "controlled substance abuse"]
+}
+
+# Healthcare payer fraud-specific text patterns
+SUSPICIOUS_PHRASES = [
+    "diagnosis code mismatch with procedure",
+    "out-of-network provider high cost",
+    "multiple claims same day different facilities",
+    "unusual procedure combination",
+    "provider flagged in LEIE database",
+    "geographic anomaly patient-provider",
+    "NPI number suspicious activity"
+]
@@ -0,0 +1,555 @@
+"""
+Fraud Detection Claims - Shared Scoring SQL
+
+Spark SQL building blocks for scoring claims with the UC fraud functions,
+shared by the batch notebook (09_batch_analyze_claims.py) and the streaming
+scorer (11_stream_score_claims.py) so both write identical fraud_analysis rows.
+
+Usage in notebooks:
+    from shared.fraud_scoring import normalized_text_hash, score_claims, fraud_analysis_select_sql
+    claims_df.withColumn("text_hash", normalized_text_hash("claim_text")).createOrReplaceTempView("claims")
+    score_claims(spark, cfg, "claims").createOrReplaceTempView("scored")
+    results_df = spark.sql(fraud_analysis_select_sql("scored"))
+"""
+
+from pyspark.sql.functions import col, regexp_replace, sha2, trim
+
+from shared.prompts import (
+    CLASSIFY_BATCH_SCHEMA, CLASSIFY_SCHEMA, PROVIDER_SCHEMA, RAW_RESPONSE_TYPE, parse_response_sql, scoring_fingerprint
+)
+
+SKIPPED_EXPLANATION = "Not generated: claim classified as legitimate"
+MISSING_EXPLANATION = "No explanation available"
+RULES_ONLY_EXPLANATION = "Cleared by the rules pre-filter: no fraud keywords and an unremarkable amount for the claim type"
+
+# analysis_status of rows cleared without LLM calls; matches RULES_ONLY_TAG in app/utils/rules_engine.py
+RULES_ONLY_STATUS = "rules-only"
+
+# Failed rows wait RETRY_BACKOFF_BASE_MINUTES * 2^(attempts - 1) before the next retry
+RETRY_BACKOFF_BASE_MINUTES = 15
+
+# First stage that should have produced a result but didn't (NULL when the row is complete).
+# Failed calls surface as NULL through parse_response_sql(): content filters, endpoint errors, unparseable output.
+FAILURE_CLASS_SQL = """CASE
+        WHEN classification IS NULL THEN 'classify_failed'
+        WHEN indicators_needed AND indicators IS NULL THEN 'extract_failed'
+        WHEN explanation_needed AND explanation_result IS NULL THEN 'explain_failed'
+    END"""
+
+# Columns added to fraud_analysis after it was first created (08 creates them for new tables)
+FRAUD_ANALYSIS_ADDED_COLUMNS = {
+    "claim_text_hash": "STRING",
+    "analysis_status": "STRING",
+    "prompt_fingerprint": "STRING",
+    "llm_calls": "INT",
+    "llm_failed_calls": "INT",
+    "llm_parse_failures": "INT",
+    "llm_error": "STRING",
+    "provider_risk_score": "DOUBLE",
+    "provider_fraud_pattern": "STRING",
+    "provider_evidence": "ARRAY<STRING>",
+    "rules_score": "DOUBLE",
+}
+
+# Columns added to fraud_analysis_failures after it was first created
+FAILURES_ADDED_COLUMNS = {
+    "last_error": "STRING",
+}
+
+
+def normalized_text_hash(column_name: str = "claim_text"):
+    """sha2 of whitespace-normalized text; must match text_hash() in app/utils/durable_cache.py"""
+    return sha2(trim(regexp_replace(col(column_name), r"\s+", " ")), 256)
+
+
+def extract_gate_sql(cfg, alias: str = "t") -> str:
+    """
+    Cascade gate for fraud_extract_indicators.
+
+    Extract when the claim is flagged, reaches cascade_extract_min_probability,
+    or its classification failed (nothing to gate on).
+    """
+    return f"""({alias}.classification IS NULL
+    OR COALESCE({alias}.classification.is_fraudulent, FALSE)
+    OR COALESCE({alias}.classification.fraud_probability, 0.0) >= {cfg.cascade_extract_min_probability})"""
+
+
+def explain_gate_sql(cfg, alias: str = "t") -> str:
+    """Cascade gate for fraud_generate_explanation"""
+    if cfg.cascade_explain_only_fraud:
+        return f"COALESCE({alias}.classification.is_fraudulent, FALSE)"
+    return f"{alias}.classification IS NOT NULL"
+
+
+def call_stats_sql(calls) -> str:
+    """
+    Per-row LLM call accounting over (raw_call_column, parsed_result_column) pairs.
+
+    A raw call column holds a <function>_raw response, NULL where the stage
+    made no call (cached or skipped). Produces llm_calls, llm_failed_calls
+    (the call returned an errorMessage), llm_parse_failures (the call
+    succeeded but its response didn't parse; a paid call that yields
+    nothing) and llm_error (the first errorMessage).
+    """
+    def total(condition):
+        return " + ".join(f"CAST({condition(call, parsed)} AS INT)" for call, parsed in calls)
+
+    return f"""{total(lambda call, parsed: f"{call} IS NOT NULL")} as llm_calls,
+        {total(lambda call, parsed: f"{call}.errorMessage IS NOT NULL")} as llm_failed_calls,
+        {total(lambda call, parsed: f"({call} IS NOT NULL AND {call}.errorMessage IS NULL AND {parsed} IS NULL)")} as llm_parse_failures,
+        COALESCE({", ".join(f"{call}.errorMessage" for call, _ in calls)}) as llm_error"""
+
+
+def score_claims(spark, cfg, claims_view: str, scoring_mode: str = "three_call"):
+    """
+    Score every row of claims_view (claim_id, claim_text, text_hash) with fresh UC function calls.
+
+    Returns a DataFrame with classification, indicators, explanation_result,
+    the stage gates, the prompt fingerprint and call_stats_sql() columns,
+    ready for fraud_analysis_select_sql(). In three_call mode the config
+    cascade applies; skipped stages are NULL. Failed calls yield NULL
+    instead of failing the query.
+    """
+    if scoring_mode not in ("three_call", "fused"):
+        raise ValueError(f"score_claims supports three_call and fused, not {scoring_mode}")
+    fn = f"{cfg.catalog}.{cfg.schema}"
+    fingerprint = scoring_fingerprint(scoring_mode, cfg.llm_endpoint)
+
+    if scoring_mode == "fused":
+        return spark.sql(f"""
+        SELECT
+            claim_id,
+            analysis_timestamp,
+            text_hash,
+            full_result.classification as classification,
+            full_result.indicators as indicators,
+            full_result.explanation as explanation_result,
+            TRUE as indicators_needed,
+            TRUE as explanation_needed,
+            '{fingerprint}' as prompt_fingerprint,
+            {call_stats_sql([("full_call", "full_result")])}
+        FROM (
+            SELECT *, {parse_response_sql("full_call", "fraud_analyze_full")} as full_result
+            FROM (
+                SELECT
+                    c.claim_id,
+                    CURRENT_TIMESTAMP() as analysis_timestamp,
+                    c.text_hash,
+                    {fn}.fraud_analyze_full_raw(c.claim_text) as full_call
+                FROM {claims_view} c
+            )
+        )
+        """)
+
+    # Classification feeds both gates; inner projections keep every function to one call per row,
+    # and the raw responses are parsed one level above the call that produced them
+    return spark.sql(f"""
+    SELECT
+        claim_id,
+        analysis_timestamp,
+        text_hash,
+        classification,
+        indicators,
+        explanation_result,
+        indicators_needed,
+        explanation_needed,
+        '{fingerprint}' as prompt_fingerprint,
+        {call_stats_sql([
+            ("classify_call", "classification"),
+            ("extract_call", "indicators"),
+            ("explain_call", "explanation_result"),
+        ])}
+    FROM (
+        SELECT *,
+            {parse_response_sql("extract_call", "fraud_extract_indicators")} as indicators,
+            {parse_response_sql("explain_call", "fraud_generate_explanation")} as explanation_result
+        FROM (
+            SELECT
+                t.*,
+                CASE
+                    WHEN {extract_gate_sql(cfg)}
+                    THEN {fn}.fraud_extract_indicators_raw(claim_text)
+                END as extract_call,
+                CASE
+                    WHEN {explain_gate_sql(cfg)}
+                    THEN {fn}.fraud_generate_explanation_raw(
+                        claim_text, classification.is_fraudulent, classification.fraud_type
+                    )
+                END as explain_call,
+                {extract_gate_sql(cfg)} as indicators_needed,
+                {explain_gate_sql(cfg)} as explanation_needed
+            FROM (
+                SELECT *, {parse_response_sql("classify_call", "fraud_classify")} as classification
+                FROM (
+                    SELECT
+                        c.claim_id,
+                        CURRENT_TIMESTAMP() as analysis_timestamp,
+                        c.claim_text,
+                        c.text_hash,
+                        {fn}.fraud_classify_raw(c.claim_text) as classify_call
+                    FROM {claims_view} c
+                )
+            ) t
+        )
+    )
+    """)
+
+
+def packed_alignment_sql(claims: str, results: str) -> str:
+    """True when a packed (fraud_classify_batch, fraud_analyze_provider) response has exactly one result per input claim id"""
+    return f"""({results} IS NOT NULL
+    AND SIZE({results}) = SIZE({claims})
+    AND ARRAY_SORT(TRANSFORM({results}, r -> r.id)) = ARRAY_SORT(TRANSFORM({claims}, c -> c.id)))"""
+
+
+def classify_packs_sql(cfg, claims_view: str, batch_size: int, buckets: int) -> str:
+    """
+    Packed classification of claims_view (claim_id, claim_text), one fraud_classify_batch_raw call per pack.
+
+    Claims are spread over buckets by claim_id hash and packed batch_size at
+    a time within each bucket, so packing is deterministic and runs in
+    parallel. Rows: bucket, pack, claims, pack_call (raw response) and
+    pack_results, which is NULL unless the response lines up with the pack's
+    claims (see packed_alignment_sql), and a NULL provider_assessment so the
+    rows match provider_packs_sql(); materialize the result before reading
+    it more than once.
+    """
+    fn = f"{cfg.catalog}.{cfg.schema}"
+    return f"""
+SELECT
+    bucket,
+    pack,
+    claims,
+    pack_call,
+    CASE WHEN {packed_alignment_sql("claims", "results")} THEN results END as pack_results,
+    CAST(NULL AS {PROVIDER_SCHEMA}) as provider_assessment
+FROM (
+    SELECT *, {parse_response_sql("pack_call", "fraud_classify_batch")} as results
+    FROM (
+        SELECT bucket, pack, claims, {fn}.fraud_classify_batch_raw(claims) as pack_call
+        FROM (
+            -- One pack per row, spread out again so the calls run {buckets} at a time
+            SELECT /*+ REPARTITION({buckets}) */
+                bucket,
+                pack,
+                ARRAY_SORT(COLLECT_LIST(NAMED_STRUCT('id', claim_id, 'text', claim_text))) as claims
+            FROM (
+                SELECT
+                    claim_id,
+                    claim_text,
+                    bucket,
+                    FLOOR((ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY claim_id) - 1) / {batch_size}) as pack
+                FROM (
+                    SELECT claim_id, claim_text, PMOD(XXHASH64(claim_id), {buckets}) as bucket
+                    FROM {claims_view}
+                )
+            )
+            GROUP BY bucket, pack
+        )
+    )
+)
+"""
+
+
+def provider_summary_sql(cfg) -> str:
+    """One row per provider_id in the claims table with a one-line summary of its claim history"""
+    return f"""
+SELECT
+    provider_info['provider_id'] as provider_id,
+    CONCAT(
+        COUNT(*), ' claims totalling $', FORMAT_NUMBER(SUM(claim_amount), 2),
+        ' (avg $', FORMAT_NUMBER(AVG(claim_amount), 2), ', max $', FORMAT_NUMBER(MAX(claim_amount), 2), ')',
+        ' from ', DATE(MIN(claim_date)), ' to ', DATE(MAX(claim_date)),
+        '; claim types: ', ARRAY_JOIN(ARRAY_SORT(COLLECT_SET(claim_type)), ', '),
+        '; claimant locations: ', ARRAY_JOIN(ARRAY_SORT(COLLECT_SET(claimant_info['location'])), ', '),
+        '; specialty: ', COALESCE(MAX(provider_info['specialty']), 'unknown'),
+        ', location: ', COALESCE(MAX(provider_info['location']), 'unknown')
+    ) as provider_summary
+FROM {cfg.claims_table}
+WHERE provider_info['provider_id'] IS NOT NULL
+GROUP BY provider_info['provider_id']
+"""
+
+
+def provider_packs_sql(cfg, claims_view: str, max_claims: int, buckets: int) -> str:
+    """
+    Provider-grouped classification of claims_view (claim_id, claim_text, provider_info).
+
+    One fraud_analyze_provider_raw call per provider, with the provider's
+    history from provider_summary_sql() and up to max_claims of its claims
+    (bigger groups are split). Claims without a provider_id form groups of
+    one. Rows: provider_id, pack, claims, pack_call, pack_results (aligned
+    per-claim verdicts, as in classify_packs_sql()) and provider_assessment,
+    kept even when the claim verdicts don't line up. Materialize the result
+    before reading it more than once.
+    """
+    fn = f"{cfg.catalog}.{cfg.schema}"
+    return f"""
+SELECT
+    provider_id,
+    pack,
+    claims,
+    pack_call,
+    CASE WHEN {packed_alignment_sql("claims", "results.claims")} THEN results.claims END as pack_results,
+    results.provider as provider_assessment
+FROM (
+    SELECT *, {parse_response_sql("pack_call", "fraud_analyze_provider")} as results
+    FROM (
+        SELECT
+            provider_id,
+            pack,
+            claims,
+            {fn}.fraud_analyze_provider_raw(provider_id, provider_summary, claims) as pack_call
+        FROM (
+            -- One provider group per row, spread out again so the calls run {buckets} at a time
+            SELECT /*+ REPARTITION({buckets}) */
+                g.provider_id,
+                g.pack,
+                g.claims,
+                COALESCE(s.provider_summary, 'No claim history') as provider_summary
+            FROM (
+                SELECT
+                    provider_id,
+                    pack,
+                    ARRAY_SORT(COLLECT_LIST(NAMED_STRUCT('id', claim_id, 'text', claim_text))) as claims
+                FROM (
+                    SELECT
+                        claim_id,
+                        claim_text,
+                        provider_id,
+                        FLOOR((ROW_NUMBER() OVER (PARTITION BY provider_id ORDER BY claim_id) - 1) / {max_claims}) as pack
+                    FROM (
+                        SELECT claim_id, claim_text, COALESCE(provider_info['provider_id'], claim_id) as provider_id
+                        FROM {claims_view}
+                    )
+                )
+                GROUP BY provider_id, pack
+            ) g
+            LEFT JOIN ({provider_summary_sql(cfg)}) s ON s.provider_id = g.provider_id
+        )
+    )
+)
+"""
+
+
+def unpack_classifications_sql(packs_view: str = None) -> str:
+    """
+    One row per packed claim: claim_id, packed_classification, provider_assessment, pack_call and pack_results.
+
+    packed_classification is NULL when the claim's pack failed or didn't line
+    up; those claims fall back to fraud_classify. provider_assessment (only
+    from provider_packs_sql()) is on every claim of the group. The pack's
+    call and results are only on its first claim, so call_stats_sql() counts
+    each pack call once. Without packs_view, an empty view with the same
+    columns.
+    """
+    if packs_view is None:
+        return f"""
+SELECT
+    CAST(NULL AS STRING) as claim_id,
+    CAST(NULL AS {CLASSIFY_SCHEMA}) as packed_classification,
+    CAST(NULL AS {PROVIDER_SCHEMA}) as provider_assessment,
+    CAST(NULL AS {RAW_RESPONSE_TYPE}) as pack_call,
+    CAST(NULL AS {CLASSIFY_BATCH_SCHEMA}) as pack_results
+WHERE FALSE
+"""
+    return f"""
+SELECT
+    claim_id,
+    CASE WHEN r IS NOT NULL THEN NAMED_STRUCT(
+        'is_fraudulent', r.is_fraudulent,
+        'fraud_probability', r.fraud_probability,
+        'fraud_type', r.fraud_type,
+        'confidence', r.confidence
+    ) END as packed_classification,
+    provider_assessment,
+    pack_call,
+    pack_results
+FROM (
+    SELECT
+        claim.id as claim_id,
+        TRY_ELEMENT_AT(FILTER(pack_results, r -> r.id = claim.id), 1) as r,
+        provider_assessment,
+        CASE WHEN pos = 0 THEN pack_call END as pack_call,
+        CASE WHEN pos = 0 THEN pack_results END as pack_results
+    FROM {packs_view}
+    LATERAL VIEW POSEXPLODE(claims) p AS pos, claim
+)
+"""
+
+
+def fraud_analysis_select_sql(scored_view: str, provider_assessment: bool = False,
+                              rules_prefilter: bool = False) -> str:
+    """
+    Project scored rows onto the fraud_analysis columns, with placeholders for missing or skipped stages.
+
+    With provider_assessment, scored_view has a provider_assessment column
+    (SCORING_MODE = "provider" in 09); otherwise the provider columns are NULL.
+    With rules_prefilter, it has rules_score and rules_only (09's rules
+    pre-filter); rules_only rows get analysis_status 'rules-only'.
+    """
+    if rules_prefilter:
+        rules_status = f"WHEN rules_only THEN '{RULES_ONLY_STATUS}'"
+        rules_explanation = f"WHEN rules_only THEN '{RULES_ONLY_EXPLANATION}'"
+        rules_score = "rules_score"
+    else:
+        rules_status = rules_explanation = ""
+        rules_score = "CAST(NULL AS DOUBLE)"
+    if provider_assessment:
+        provider_columns = """provider_assessment.risk_score as provider_risk_score,
+    provider_assessment.fraud_pattern as provider_fraud_pattern,
+    COALESCE(provider_assessment.evidence, ARRAY()) as provider_evidence"""
+    else:
+        provider_columns = """CAST(NULL AS DOUBLE) as provider_risk_score,
+    CAST(NULL AS STRING) as provider_fraud_pattern,
+    CAST(ARRAY() AS ARRAY<STRING>) as provider_evidence"""
+    return f"""
+SELECT
+    claim_id,
+    analysis_timestamp,
+    text_hash as claim_text_hash,
+
+    -- Extract classification fields (with NULL handling)
+    COALESCE(classification.is_fraudulent, FALSE) as is_fraudulent,
+    COALESCE(classification.fraud_probability, 0.0) as fraud_probability,
+    COALESCE(classification.fraud_type, 'Unknown') as fraud_type,
+    COALESCE(classification.confidence, 0.0) as classification_confidence,
+
+    -- Extract indicator fields (with NULL handling; empty when skipped by the cascade)
+    COALESCE(indicators.red_flags, ARRAY()) as red_flags,
+    COALESCE(indicators.suspicious_patterns, ARRAY()) as suspicious_patterns,
+    COALESCE(indicators.risk_score, 0.0) as risk_score,
+    COALESCE(indicators.affected_entities, ARRAY()) as affected_entities,
+
+    CASE
+        {rules_explanation}
+        WHEN NOT explanation_needed AND classification IS NOT NULL THEN '{SKIPPED_EXPLANATION}'
+        ELSE COALESCE(explanation_result.explanation, '{MISSING_EXPLANATION}')
+    END as explanation,
+    COALESCE(explanation_result.evidence, ARRAY()) as evidence,
+    COALESCE(explanation_result.recommendations, ARRAY()) as recommendations,
+
+    -- 'failed' rows carry placeholder values; details are in fraud_analysis_failures.
+    -- 'rules-only' rows were cleared by the rules pre-filter without LLM calls
+    CASE
+        {rules_status}
+        WHEN {FAILURE_CLASS_SQL} IS NULL THEN 'ok'
+        ELSE 'failed'
+    END as analysis_status,
+    -- Prompt templates + endpoint that produced the row; see shared/prompts.py
+    prompt_fingerprint,
+    -- LLM calls made for the row; failed and unparseable ones were wasted
+    llm_calls,
+    llm_failed_calls,
+    llm_parse_failures,
+    llm_error,
+    -- Provider-level assessment shared by the provider's claims (provider scoring mode only)
+    {provider_columns},
+    -- Deterministic rules risk (keyword hits, amount outlier); NULL unless the pre-filter ran
+    {rules_score} as rules_score
+FROM {scored_view}
+"""
+
+
+def ensure_fraud_analysis_columns(spark, cfg):
+    """Add columns introduced after fraud_analysis was created; existing rows get NULL"""
+    existing = set(spark.table(cfg.fraud_analysis_table).columns)
+    for name, sql_type in FRAUD_ANALYSIS_ADDED_COLUMNS.items():
+        if name not in existing:
+            spark.sql(f"ALTER TABLE {cfg.fraud_analysis_table} ADD COLUMNS ({name} {sql_type})")
+            print(f"✅ Added {name} to {cfg.fraud_analysis_table}")
+
+
+def ensure_failures_table(spark, cfg):
+    """Dead-letter table for claims whose AI scoring failed"""
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {cfg.failures_table} (
+        claim_id STRING NOT NULL,
+        claim_text_hash STRING,
+        error_class STRING COMMENT 'classify_failed, extract_failed or explain_failed',
+        attempt_count INT,
+        status STRING COMMENT 'open, resolved or abandoned',
+        first_failed_at TIMESTAMP,
+        last_failed_at TIMESTAMP,
+        next_retry_at TIMESTAMP,
+        last_source STRING COMMENT 'Job and function that produced the last attempt',
+        last_error STRING COMMENT 'errorMessage of the last failed AI_QUERY call; NULL for unparseable responses'
+    )
+    USING DELTA
+    COMMENT 'Claims whose AI scoring failed, with retry state'
+    """)
+    existing = set(spark.table(cfg.failures_table).columns)
+    for name, sql_type in FAILURES_ADDED_COLUMNS.items():
+        if name not in existing:
+            spark.sql(f"ALTER TABLE {cfg.failures_table} ADD COLUMNS ({name} {sql_type})")
+
+
+def ensure_result_cache_table(spark, cfg):
+    """Durable cache of UC function results shared by the app and the batch jobs"""
+    spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {cfg.result_cache_table} (
+        text_hash STRING NOT NULL COMMENT 'sha2 of whitespace-normalized claim text',
+        function_name STRING NOT NULL,
+        arg_signature STRING NOT NULL COMMENT 'Pipe-joined arguments after claim_text, empty for single-argument functions',
+        prompt_version STRING NOT NULL,
+        result_json STRING,
+        source STRING COMMENT 'app or batch_job',
+        created_at TIMESTAMP
+    )
+    USING DELTA
+    CLUSTER BY (function_name, text_hash)
+    COMMENT 'Durable cache of UC fraud function results shared by the app and batch jobs'
+    """)
+
+
+def record_failures(spark, cfg, scored_view: str, source: str):
+    """
+    Dead-letter the failed rows of scored_view and resolve open entries that now succeeded.
+
+    A repeat failure bumps attempt_count and pushes next_retry_at out
+    exponentially. Returns the number of failed rows.
+    """
+    ensure_failures_table(spark, cfg)
+    spark.sql(f"""
+    CREATE OR REPLACE TEMP VIEW scored_failures AS
+    SELECT claim_id, text_hash, {FAILURE_CLASS_SQL} AS error_class, llm_error
+    FROM {scored_view}
+    """)
+    spark.sql(f"""
+    MERGE INTO {cfg.failures_table} AS f
+    USING scored_failures AS s
+    ON f.claim_id = s.claim_id
+    WHEN MATCHED AND s.error_class IS NOT NULL THEN UPDATE SET
+        f.claim_text_hash = s.text_hash,
+        f.error_class = s.error_class,
+        f.attempt_count = f.attempt_count + 1,
+        f.status = 'open',
+        f.last_failed_at = current_timestamp(),
+        f.next_retry_at = current_timestamp()
+            + make_interval(0, 0, 0, 0, 0, CAST({RETRY_BACKOFF_BASE_MINUTES} * POW(2, f.attempt_count) AS INT), 0),
+        f.last_source = '{source}',
+        f.last_error = s.llm_error
+    WHEN MATCHED AND s.error_class IS NULL AND f.status = 'open' THEN UPDATE SET
+        f.status = 'resolved',
+        f.last_source = '{source}'
+    WHEN NOT MATCHED AND s.error_class IS NOT NULL THEN INSERT
+        (claim_id, claim_text_hash, error_class, attempt_count, status,
+         first_failed_at, last_failed_at, next_retry_at, last_source, last_error)
+    VALUES
+        (s.claim_id, s.text_hash, s.error_class, 1, 'open',
+         current_timestamp(), current_timestamp(),
+         current_timestamp() + make_interval(0, 0, 0, 0, 0, {RETRY_BACKOFF_BASE_MINUTES}, 0), '{source}',
+         s.llm_error)
+    """)
+    return spark.sql("SELECT COUNT(*) AS n FROM scored_failures WHERE error_class IS NOT NULL").collect()[0]["n"]
+
+
+def merge_into_fraud_analysis(spark, cfg, results_view: str):
+    """Upsert fraud_analysis rows from results_view on claim_id"""
+    spark.sql(f"""
+    MERGE INTO {cfg.fraud_analysis_table} AS t
+    USING {results_view} AS s
+    ON t.claim_id = s.claim_id
+    WHEN MATCHED THEN UPDATE SET *
+    WHEN NOT MATCHED THEN INSERT *
+    """)
@@ -0,0 +1,242 @@
+"""
+Fraud Detection Claims - UC Function Prompts
+
+Single source for the AI_QUERY prompt templates of the UC fraud functions
+(03, 04, 05 and 05a), and for their version fingerprints.
+
+The functions call AI_QUERY with responseFormat (structured output), so the
+model returns JSON matching the function's result schema instead of free
+text, and with failOnError => false, so a failed call returns its
+errorMessage instead of failing the query. Each function has a
+<name>_raw companion returning that (result, errorMessage) response;
+the scoring notebooks call the raw functions to record call errors and
+parse failures per row.
+
+A fingerprint is a short hash of a function's prompt template, response
+format and the LLM endpoint it calls. The setup notebooks write it into each function's COMMENT,
+the scoring notebooks store it on every fraud_analysis row
+(prompt_fingerprint), and 13_rescore_stale_versions.py re-scores only rows
+whose fingerprint differs from the current one.
+
+Templates are Spark SQL expressions over the function's parameters; embed
+them in CREATE FUNCTION statements as-is, or use structured_query_sql().
+
+Usage in notebooks:
+    from shared.prompts import fingerprint_comment, parse_response_sql, structured_query_sql
+    spark.sql(f"... RETURN {structured_query_sql('fraud_classify', cfg.llm_endpoint)}")
+    spark.sql(f"... COMMENT '{fingerprint_comment('...', 'fraud_classify', cfg.llm_endpoint)}' ...")
+
+This module has no Spark dependency, so generate_app_yaml.py can import it.
+"""
+
+import hashlib
+import re
+
+CLASSIFY_PROMPT = """CONCAT(
+          'You are a healthcare fraud detection AI. Return ONLY a JSON object.\\n\\n',
+          'CLAIM: ', claim_text, '\\n\\n',
+          'Return this JSON: {"is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None", "confidence": 0.0-1.0}\\n\\n',
+          'Rules: If claim says "billed X but actually Y" then is_fraudulent=true. If provider has fraud pattern then is_fraudulent=true. If amount 2-3x higher then is_fraudulent=true.\\n\\n',
+          'Return ONLY the JSON object, no other text.'
+        )"""
+
+EXTRACT_PROMPT = """CONCAT(
+          'You are a healthcare fraud detection AI. Return ONLY a JSON object.\\n\\n',
+          'CLAIM: ', claim_text, '\\n\\n',
+          'Return this JSON: {"red_flags": ["flag1", "flag2"], "suspicious_patterns": ["pattern1"], "risk_score": 0.9, "affected_entities": ["entity1"]}\\n\\n',
+          'Return ONLY the JSON object, no other text.'
+        )"""
+
+EXPLAIN_PROMPT = """CONCAT(
+          'Explain this fraud decision for a healthcare payer claims adjuster.\\n\\n',
+          'CLAIM: ', claim_text, '\\n',
+          'DECISION: ', IF(is_fraudulent, 'FRAUDULENT', 'LEGITIMATE'), '\\n',
+          'FRAUD TYPE: ', fraud_type, '\\n\\n',
+          'Return ONLY JSON: {"explanation": "summary text", "evidence": ["fact1", "fact2"], "recommendations": ["action1", "action2"]}\\n\\n',
+          'Return ONLY the JSON object.'
+        )"""
+
+# Packed variant of CLASSIFY_PROMPT over claims ARRAY<STRUCT<id, text>>: the instructions are sent
+# once for the whole pack, and each result carries the id of its claim so it can be matched back
+CLASSIFY_BATCH_PROMPT = """CONCAT(
+          'You are a healthcare fraud detection AI. Classify each claim below independently. Return ONLY a JSON object.\\n\\n',
+          ARRAY_JOIN(TRANSFORM(claims, c -> CONCAT('CLAIM ', c.id, ': ', c.text)), '\\n\\n'), '\\n\\n',
+          'For each claim return: {"id": "the claim id exactly as given", "is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None", "confidence": 0.0-1.0}\\n\\n',
+          'Rules: If claim says "billed X but actually Y" then is_fraudulent=true. If provider has fraud pattern then is_fraudulent=true. If amount 2-3x higher then is_fraudulent=true.\\n\\n',
+          'Return {"results": [...]} with exactly one entry per claim, in the order given, no other text.'
+        )"""
+
+# Provider-grouped classification over provider_id, provider_summary (aggregates of all the
+# provider's claims) and claims ARRAY<STRUCT<id, text>>: one provider-level assessment plus a
+# verdict per claim, so cross-claim patterns are judged once instead of re-derived per claim
+ANALYZE_PROVIDER_PROMPT = """CONCAT(
+          'You are a healthcare fraud detection AI working for a payer. Review these claims from one provider together. Return ONLY a JSON object.\\n\\n',
+          'PROVIDER: ', provider_id, '\\n',
+          'PROVIDER HISTORY: ', provider_summary, '\\n\\n',
+          ARRAY_JOIN(TRANSFORM(claims, c -> CONCAT('CLAIM ', c.id, ': ', c.text)), '\\n\\n'), '\\n\\n',
+          'Do two things:\\n',
+          '1. provider: assess the provider across all claims and its history: a risk score, the fraud pattern it shows ',
+          '(Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None) and evidence that only shows across several claims.\\n',
+          '2. claims: classify each claim. A claim that fits the provider pattern is more likely fraudulent. ',
+          'If claim says "billed X but actually Y" then is_fraudulent=true. If amount 2-3x higher then is_fraudulent=true.\\n\\n',
+          'Return this JSON: {',
+          '"provider": {"risk_score": 0.0-1.0, "fraud_pattern": "Upcoding/.../None", "evidence": ["evidence1"]}, ',
+          '"claims": [{"id": "the claim id exactly as given", "is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None", "confidence": 0.0-1.0}]',
+          '}\\n\\n',
+          'Return exactly one claims entry per claim, no other text.'
+        )"""
+
+ANALYZE_FULL_PROMPT = """CONCAT(
+          'You are a healthcare fraud detection AI working for a payer. Return ONLY a JSON object.\\n\\n',
+          'CLAIM: ', claim_text, '\\n\\n',
+          'Do three things for this claim:\\n',
+          '1. classification: decide if it is fraudulent. If claim says "billed X but actually Y" then is_fraudulent=true. ',
+          'If provider has fraud pattern then is_fraudulent=true. If amount 2-3x higher then is_fraudulent=true.\\n',
+          '2. indicators: list red flags, suspicious patterns, affected entities and a risk score.\\n',
+          '3. explanation: explain the decision for a claims adjuster, with evidence and recommended actions.\\n\\n',
+          'Return this JSON: {',
+          '"classification": {"is_fraudulent": true/false, "fraud_probability": 0.0-1.0, "fraud_type": "Upcoding/Unbundling/Phantom/Duplicate/Unnecessary/Kickback/Identity/Prescription/None", "confidence": 0.0-1.0}, ',
+          '"indicators": {"red_flags": ["flag1"], "suspicious_patterns": ["pattern1"], "risk_score": 0.0-1.0, "affected_entities": ["entity1"]}, ',
+          '"explanation": {"explanation": "summary text", "evidence": ["fact1"], "recommendations": ["action1"]}',
+          '}\\n\\n',
+          'Return ONLY the JSON object, no other text.'
+        )"""
+
+# Result schema of each UC function
+CLASSIFY_SCHEMA = "STRUCT<is_fraudulent:BOOLEAN, fraud_probability:DOUBLE, fraud_type:STRING, confidence:DOUBLE>"
+EXTRACT_SCHEMA = "STRUCT<red_flags:ARRAY<STRING>, suspicious_patterns:ARRAY<STRING>, risk_score:DOUBLE, affected_entities:ARRAY<STRING>>"
+EXPLAIN_SCHEMA = "STRUCT<explanation:STRING, evidence:ARRAY<STRING>, recommendations:ARRAY<STRING>>"
+FULL_SCHEMA = f"STRUCT<classification:{CLASSIFY_SCHEMA}, indicators:{EXTRACT_SCHEMA}, explanation:{EXPLAIN_SCHEMA}>"
+CLASSIFY_BATCH_SCHEMA = (
+    "ARRAY<STRUCT<id:STRING, is_fraudulent:BOOLEAN, fraud_probability:DOUBLE, fraud_type:STRING, confidence:DOUBLE>>"
+)
+
+PROVIDER_SCHEMA = "STRUCT<risk_score:DOUBLE, fraud_pattern:STRING, evidence:ARRAY<STRING>>"
+PROVIDER_ANALYSIS_SCHEMA = f"STRUCT<provider:{PROVIDER_SCHEMA}, claims:{CLASSIFY_BATCH_SCHEMA}>"
+
+# Element type of the claims parameter of fraud_classify_batch and fraud_analyze_provider
+PACKED_CLAIM_TYPE = "STRUCT<id: STRING, text: STRING>"
+
+FUNCTION_SCHEMAS = {
+    "fraud_classify": CLASSIFY_SCHEMA,
+    "fraud_classify_batch": CLASSIFY_BATCH_SCHEMA,
+    "fraud_extract_indicators": EXTRACT_SCHEMA,
+    "fraud_generate_explanation": EXPLAIN_SCHEMA,
+    "fraud_analyze_full": FULL_SCHEMA,
+    "fraud_analyze_provider": PROVIDER_ANALYSIS_SCHEMA,
+}
+
+# Top-level field wrapping the result in each function's responseFormat
+RESPONSE_FIELDS = {
+    "fraud_classify": "classification",
+    "fraud_classify_batch": "results",
+    "fraud_extract_indicators": "indicators",
+    "fraud_generate_explanation": "explanation",
+    "fraud_analyze_full": "analysis",
+    "fraud_analyze_provider": "provider_analysis",
+}
+
+# fraud_type of legitimate claims in every classification schema; also the explanation cache signature's
+# fraud_type when there is none (NO_FRAUD_TYPE in app/utils/durable_cache.py must stay equal)
+NO_FRAUD_TYPE = "None"
+
+# Type AI_QUERY returns with failOnError => false (the <name>_raw functions)
+RAW_RESPONSE_TYPE = "STRUCT<result: STRING, errorMessage: STRING>"
+
+# Prompt template per UC function (fraud_analyze_full_fallback reuses ANALYZE_FULL_PROMPT)
+FUNCTION_PROMPTS = {
+    "fraud_classify": CLASSIFY_PROMPT,
+    "fraud_classify_batch": CLASSIFY_BATCH_PROMPT,
+    "fraud_extract_indicators": EXTRACT_PROMPT,
+    "fraud_generate_explanation": EXPLAIN_PROMPT,
+    "fraud_analyze_full": ANALYZE_FULL_PROMPT,
+    "fraud_analyze_provider": ANALYZE_PROVIDER_PROMPT,
+}
+
+# Functions behind each batch scoring mode (SCORING_MODE in 09, 11 and 13). "packed" is three_call
+# with classification packed K claims per fraud_classify_batch call (fraud_classify for fallbacks),
+# "provider" the same with one fraud_analyze_provider call per provider's claims; both 09 only
+SCORING_MODE_FUNCTIONS = {
+    "three_call": ("fraud_classify", "fraud_extract_indicators", "fraud_generate_explanation"),
+    "fused": ("fraud_analyze_full",),
+    "packed": ("fraud_classify_batch", "fraud_classify", "fraud_extract_indicators", "fraud_generate_explanation"),
+    "provider": ("fraud_analyze_provider", "fraud_classify", "fraud_extract_indicators", "fraud_generate_explanation"),
+}
+
+FINGERPRINT_LENGTH = 12
+FINGERPRINT_PATTERN = re.compile(r"\[fingerprint: ([0-9a-f]+)\]")
+
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def response_format(function_name: str) -> str:
+    """DDL responseFormat of a UC function: its result schema under a single top-level field"""
+    return f"STRUCT<{RESPONSE_FIELDS[function_name]}:{FUNCTION_SCHEMAS[function_name]}>"
+
+
+def structured_query_sql(function_name: str, endpoint: str) -> str:
+    """AI_QUERY call of a UC function with structured output; returns RAW_RESPONSE_TYPE"""
+    return f"""AI_QUERY(
+    '{endpoint}',
+    {FUNCTION_PROMPTS[function_name]},
+    responseFormat => '{response_format(function_name)}',
+    failOnError => false
+  )"""
+
+
+def parse_response_sql(response_sql: str, function_name: str) -> str:
+    """
+    Typed result of a RAW_RESPONSE_TYPE expression.
+
+    NULL when the call failed (errorMessage set) or its response doesn't
+    match the response format.
+    """
+    return f"FROM_JSON({response_sql}.result, '{response_format(function_name)}').{RESPONSE_FIELDS[function_name]}"
+
+
+def prompt_fingerprint(function_name: str, endpoint: str) -> str:
+    """Fingerprint of one UC function: its prompt template + response format + the endpoint it calls"""
+    return _short_hash(f"{endpoint}\n{response_format(function_name)}\n{FUNCTION_PROMPTS[function_name]}")
+
+
+def combined_fingerprint(function_names, endpoint: str) -> str:
+    """Fingerprint of several functions on one endpoint; a single function keeps its own fingerprint"""
+    if len(function_names) == 1:
+        return prompt_fingerprint(function_names[0], endpoint)
+    return _short_hash("\n".join(
+        f"{name}={prompt_fingerprint(name, endpoint)}" for name in sorted(function_names)
+    ))
+
+
+def scoring_fingerprint(scoring_mode: str, endpoint: str) -> str:
+    """Fingerprint stored on fraud_analysis rows scored in scoring_mode"""
+    return combined_fingerprint(SCORING_MODE_FUNCTIONS[scoring_mode], endpoint)
+
+
+def current_scoring_fingerprints(endpoints) -> list:
+    """Fingerprints of every scoring mode on each endpoint: rows carrying any of them match the current templates"""
+    return sorted({scoring_fingerprint(mode, endpoint) for mode in SCORING_MODE_FUNCTIONS for endpoint in endpoints})
+
+
+def fingerprint_comment(comment: str, function_name: str, endpoint: str) -> str:
+    """COMMENT text for a UC function, tagged with its fingerprint"""
+    return f"{comment} [fingerprint: {prompt_fingerprint(function_name, endpoint)}]"
+
+
+def comment_fingerprint(comment):
+    """Fingerprint tagged in a UC function COMMENT, or None"""
+    match = FINGERPRINT_PATTERN.search(comment or "")
+    return match.group(1) if match else None
+
+
+def result_cache_version(prompt_version: str, endpoint: str) -> str:
+    """
+    prompt_version key for fraud_result_cache.
+
+    The configured prompt_version with the fingerprint of every function
+    appended, so editing a prompt or switching endpoints invalidates cached
+    results without a manual bump.
+    """
+    return f"{prompt_version}-{combined_fingerprint(sorted(FUNCTION_PROMPTS), endpoint)}"
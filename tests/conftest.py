@@ -0,0 +1,14 @@
+"""
+Puts the repo root (shared/) and app/ (utils/) on sys.path, the way the setup
+notebooks and the deployed app import them. Tests of modules that import
+Streamlit or the Databricks SDK skip when those aren't installed.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (ROOT, os.path.join(ROOT, "app")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,81 @@
+"""run_pipelined ordering, concurrency bound and error propagation"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("databricks.sdk")
+
+from utils.batch_runner import run_pipelined
+
+
+def test_yields_every_item_with_its_input_index():
+    delays = [0.05, 0.0, 0.02, 0.0]
+
+    def worker(delay):
+        time.sleep(delay)
+        return delay * 2
+
+    results = list(run_pipelined(delays, worker, max_concurrency=4))
+
+    # Completion order: the slow first item is not reported first
+    assert results[0][0] != 0
+    ordered = sorted(results)
+    assert [index for index, _, _, _ in ordered] == [0, 1, 2, 3]
+    assert [item for _, item, _, _ in ordered] == delays
+    assert [result for _, _, result, _ in ordered] == [delay * 2 for delay in delays]
+    assert all(error is None for _, _, _, error in ordered)
+
+
+def test_failing_item_yields_its_error_and_the_rest_still_run():
+    def worker(item):
+        if item == "bad":
+            raise ValueError("unparseable claim")
+        return item.upper()
+
+    results = {index: (result, error) for index, _, result, error in
+               run_pipelined(["a", "bad", "c"], worker, max_concurrency=2)}
+
+    assert results[0] == ("A", None)
+    assert results[2] == ("C", None)
+    result, error = results[1]
+    assert result is None
+    assert isinstance(error, ValueError)
+
+
+def test_at_most_max_concurrency_calls_in_flight():
+    lock = threading.Lock()
+    active = peak = 0
+
+    def worker(item):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return item
+
+    assert len(list(run_pipelined(range(20), worker, max_concurrency=3))) == 20
+    assert peak <= 3
+
+
+def test_items_are_read_lazily():
+    consumed = []
+
+    def claims():
+        for claim_id in range(100):
+            consumed.append(claim_id)
+            yield claim_id
+
+    stream = run_pipelined(claims(), lambda item: item, max_concurrency=2)
+    next(stream)
+    # Only the items in flight have been pulled from the source, not the whole batch
+    assert len(consumed) <= 4
+    stream.close()
+
+
+def test_empty_input_yields_nothing():
+    assert list(run_pipelined([], lambda item: item)) == []
@@ -0,0 +1,68 @@
+"""unpack_classifications id alignment for fraud_classify_batch responses"""
+
+import json
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("pyarrow")
+
+from utils.batch_scoring import packed_cache_key, unpack_classifications
+from utils.result_cache import make_cache_key
+
+
+def classification(fraud_type="None"):
+    return {"is_fraudulent": fraud_type != "None", "fraud_probability": 0.9, "fraud_type": fraud_type,
+            "confidence": 0.8}
+
+
+def response(results, error=None):
+    return {"result": json.dumps({"results": results}), "errorMessage": error}
+
+
+def test_results_are_returned_in_pack_order_by_id():
+    results = [
+        {"id": "2", **classification("Phantom")},
+        {"id": "0", **classification("Upcoding")},
+        {"id": "1", **classification()},
+    ]
+
+    unpacked = unpack_classifications(response(results), 3)
+
+    assert [item["fraud_type"] for item in unpacked] == ["Upcoding", "None", "Phantom"]
+    assert all("id" not in item for item in unpacked)
+
+
+def test_numeric_ids_and_json_string_responses_are_accepted():
+    results = [{"id": 0, **classification()}, {"id": 1, **classification("Kickback")}]
+    unpacked = unpack_classifications(json.dumps(response(results)), 2)
+    assert [item["fraud_type"] for item in unpacked] == ["None", "Kickback"]
+
+
+@pytest.mark.parametrize("results", [
+    # One claim missing
+    [{"id": "0", **classification()}],
+    # Duplicate id, so claim 1 has no result
+    [{"id": "0", **classification()}, {"id": "0", **classification()}],
+    # Ids that aren't pack positions
+    [{"id": "claim-a", **classification()}, {"id": "claim-b", **classification()}],
+    # Extra result
+    [{"id": str(pos), **classification()} for pos in range(3)],
+])
+def test_misaligned_ids_reject_the_whole_pack(results):
+    assert unpack_classifications(response(results), 2) is None
+
+
+@pytest.mark.parametrize("raw", [
+    None,
+    {"result": None, "errorMessage": "429 Too Many Requests"},
+    {"result": "not json", "errorMessage": None},
+    {"result": json.dumps({"claims": []}), "errorMessage": None},
+    "not json",
+])
+def test_failed_or_unparseable_responses_return_none(raw):
+    assert unpack_classifications(raw, 1) is None
+
+
+def test_packed_results_have_their_own_cache_key():
+    assert packed_cache_key("claim", "endpoint") != make_cache_key("fraud_classify", ["claim"], "endpoint")
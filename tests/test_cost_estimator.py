@@ -0,0 +1,76 @@
+"""estimate_batch calls, tokens, cost and time, and the template-derived prompt overhead"""
+
+import json
+import os
+
+import pytest
+import yaml
+
+from shared.prompts import FUNCTION_PROMPTS
+from utils.cost_estimator import (
+    OUTPUT_TOKENS, PROMPT_OVERHEAD_TOKENS, estimate_batch, format_duration, sql_literal_tokens
+)
+
+
+def test_prompt_overhead_comes_from_the_templates():
+    assert PROMPT_OVERHEAD_TOKENS == {fn: sql_literal_tokens(prompt) for fn, prompt in FUNCTION_PROMPTS.items()}
+
+
+def test_app_yaml_carries_the_template_overhead():
+    # The deployed app has no shared/ and reads the overhead from app.yaml
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "app.yaml")) as f:
+        env = {var["name"]: var["value"] for var in yaml.safe_load(f)["env"]}
+    assert json.loads(env["PROMPT_OVERHEAD_TOKENS"]) == PROMPT_OVERHEAD_TOKENS, (
+        "Prompts changed: regenerate app/app.yaml with generate_app_yaml.py"
+    )
+
+
+def test_sql_literal_tokens_counts_only_literals():
+    # 'abcd' and 'efgh\n' (escaped newline is one character) = 9 chars -> 3 tokens
+    assert sql_literal_tokens("CONCAT('abcd', claim_text, 'efgh\\n')") == 3
+
+
+def test_single_function_usage_and_cost():
+    estimate = estimate_batch(
+        10, 4000, {"fraud_classify": 1.0},
+        prompt_overhead_tokens={"fraud_classify": 100}, output_tokens={"fraud_classify": 50},
+        input_cost_per_mtok=1.0, output_cost_per_mtok=2.0,
+    )
+    # 400 chars per claim -> 100 tokens, plus 100 overhead per call
+    assert estimate["llm_calls"] == 10
+    assert estimate["input_tokens"] == 10 * 100 + 10 * 100
+    assert estimate["output_tokens"] == 10 * 50
+    assert estimate["cost_usd"] == pytest.approx((2000 * 1.0 + 500 * 2.0) / 1_000_000)
+
+
+def test_cascade_fractions_and_packing():
+    estimate = estimate_batch(
+        100, 40_000,
+        {"fraud_classify_batch": 1.0, "fraud_extract_indicators": 0.25},
+        claims_per_call={"fraud_classify_batch": 8},
+        prompt_overhead_tokens={"fraud_classify_batch": 160, "fraud_extract_indicators": 66},
+    )
+    usage = estimate["usage"]
+    # Packs share one prompt overhead; the gated stage only sees a quarter of the claims
+    assert usage["fraud_classify_batch"]["calls"] == 13
+    assert usage["fraud_classify_batch"]["input_tokens"] == 100 * 100 + 13 * 160
+    assert usage["fraud_extract_indicators"]["calls"] == 25
+    assert usage["fraud_extract_indicators"]["output_tokens"] == 25 * OUTPUT_TOKENS["fraud_extract_indicators"]
+    assert estimate["llm_calls"] == 38
+
+
+def test_wall_time_prefers_measured_throughput():
+    assert estimate_batch(100, 0, {}, claims_per_second=4.0, seconds_per_claim=9.0)["seconds"] == 25.0
+    # 100 claims, 8 at a time -> 13 waves of 2 seconds
+    assert estimate_batch(100, 0, {}, seconds_per_claim=2.0, concurrency=8)["seconds"] == 26.0
+
+
+def test_empty_batch():
+    estimate = estimate_batch(0, 0, {"fraud_classify": 1.0})
+    assert (estimate["llm_calls"], estimate["cost_usd"], estimate["seconds"]) == (0, 0.0, 0.0)
+
+
+def test_format_duration():
+    assert format_duration(45) == "45s"
+    assert format_duration(750) == "12m 30s"
+    assert format_duration(3 * 3600 + 300) == "3h 05m"
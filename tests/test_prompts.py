@@ -0,0 +1,82 @@
+"""shared/prompts.py fingerprints and the cache version hard-coded in app.yaml and the docs"""
+
+import os
+import re
+
+import pytest
+import yaml
+
+from shared.prompts import (
+    FUNCTION_PROMPTS, NO_FRAUD_TYPE, SCORING_MODE_FUNCTIONS, combined_fingerprint, current_scoring_fingerprints,
+    prompt_fingerprint, result_cache_version, scoring_fingerprint
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINT = "databricks-claude-sonnet-4-5"
+
+
+def read(*path):
+    with open(os.path.join(ROOT, *path)) as f:
+        return f.read()
+
+
+def template_prompt_version():
+    return yaml.safe_load(read("config.yaml.template"))["common"]["prompt_version"]
+
+
+def app_env():
+    return {var["name"]: var["value"] for var in yaml.safe_load(read("app", "app.yaml"))["env"]}
+
+
+def test_fingerprints_are_short_stable_hashes():
+    fingerprint = prompt_fingerprint("fraud_classify", ENDPOINT)
+    assert re.fullmatch(r"[0-9a-f]{12}", fingerprint)
+    assert fingerprint == prompt_fingerprint("fraud_classify", ENDPOINT)
+
+
+def test_fingerprint_changes_with_endpoint_and_function():
+    fingerprint = prompt_fingerprint("fraud_classify", ENDPOINT)
+    assert fingerprint != prompt_fingerprint("fraud_classify", "other-endpoint")
+    assert fingerprint != prompt_fingerprint("fraud_extract_indicators", ENDPOINT)
+
+
+def test_fingerprint_changes_with_the_prompt(monkeypatch):
+    fingerprint = prompt_fingerprint("fraud_classify", ENDPOINT)
+    monkeypatch.setitem(FUNCTION_PROMPTS, "fraud_classify", FUNCTION_PROMPTS["fraud_classify"] + " ")
+    assert prompt_fingerprint("fraud_classify", ENDPOINT) != fingerprint
+
+
+def test_combined_fingerprint_ignores_order_and_keeps_single_functions():
+    names = ["fraud_classify", "fraud_extract_indicators", "fraud_generate_explanation"]
+    assert combined_fingerprint(names, ENDPOINT) == combined_fingerprint(list(reversed(names)), ENDPOINT)
+    assert combined_fingerprint(["fraud_analyze_full"], ENDPOINT) == prompt_fingerprint("fraud_analyze_full", ENDPOINT)
+
+
+def test_current_fingerprints_cover_every_mode_and_endpoint():
+    endpoints = [ENDPOINT, "fallback-endpoint"]
+    current = current_scoring_fingerprints(endpoints)
+    for mode in SCORING_MODE_FUNCTIONS:
+        for endpoint in endpoints:
+            assert scoring_fingerprint(mode, endpoint) in current
+
+
+def test_app_yaml_cache_version_matches_the_prompts():
+    env = app_env()
+    assert env["PROMPT_VERSION"] == result_cache_version(template_prompt_version(), env["LLM_ENDPOINT"]), (
+        "Prompts changed: regenerate app/app.yaml with generate_app_yaml.py"
+    )
+
+
+def test_documented_cache_version_matches_the_prompts():
+    prompt_version = template_prompt_version()
+    documented = set(re.findall(rf"\b{prompt_version}-[0-9a-f]{{12}}\b", read("docs", "CONFIGURATION.md")))
+    template = yaml.safe_load(read("config.yaml.template"))
+    endpoint = template["environments"][template["default_environment"]]["llm_endpoint"]
+    assert documented == {result_cache_version(prompt_version, endpoint)}
+
+
+def test_app_no_fraud_type_matches_shared():
+    pytest.importorskip("streamlit")
+    from utils.durable_cache import NO_FRAUD_TYPE as APP_NO_FRAUD_TYPE
+
+    assert APP_NO_FRAUD_TYPE == NO_FRAUD_TYPE
@@ -0,0 +1,80 @@
+"""ResultCache TTL/LRU behaviour and make_cache_key normalization"""
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from utils import result_cache
+from utils.result_cache import ResultCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(result_cache.time, "monotonic", fake)
+    return fake
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put("k", {"is_fraudulent": True})
+
+    clock.now += 59
+    assert cache.get("k") == {"is_fraudulent": True}
+
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # b is now the least recently used
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_none_results_are_not_cached(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put("k", None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_hit_rate(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put("k", 1)
+    cache.get("k")
+    cache.get("missing")
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_cache_key_ignores_claim_whitespace():
+    assert (
+        make_cache_key("fraud_classify", ["  Patient  billed\n99215 "], "endpoint")
+        == make_cache_key("fraud_classify", ["Patient billed 99215"], "endpoint")
+    )
+
+
+def test_cache_key_depends_on_function_endpoint_and_extra_args():
+    key = make_cache_key("fraud_generate_explanation", ["claim", True, "Upcoding"], "endpoint")
+    assert key != make_cache_key("fraud_classify", ["claim", True, "Upcoding"], "endpoint")
+    assert key != make_cache_key("fraud_generate_explanation", ["claim", True, "Upcoding"], "other")
+    assert key != make_cache_key("fraud_generate_explanation", ["claim", False, "Upcoding"], "endpoint")
+    # Only the claim text is normalized
+    assert key != make_cache_key("fraud_generate_explanation", ["claim", True, " Upcoding"], "endpoint")
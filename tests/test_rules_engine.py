@@ -0,0 +1,59 @@
+"""rules_engine.score_claims_frame scoring and the keyword list it shares with the SQL rules"""
+
+import pandas as pd
+import pytest
+
+from utils.rules_engine import (
+    AMOUNT_Z_FULL, KEYWORD_WEIGHT, RULE_KEYWORDS, keyword_hits_sql, score_claims_frame
+)
+
+AMOUNT_STATS = pd.DataFrame({
+    "claim_type": ["Medical", "Pharmacy"],
+    "amount_mean": [1000.0, 200.0],
+    "amount_stddev": [100.0, 0.0],
+})
+
+
+def test_keyword_hits_are_case_insensitive_and_weighted():
+    claims = pd.DataFrame({"claim_text": [
+        "Routine office visit, no findings",
+        "Provider billed CPT 99215 for a brief visit",
+        "DUPLICATE claim for a service the patient never received",
+    ]})
+
+    scores = score_claims_frame(claims)
+
+    assert scores["rules_keyword_hits"].tolist() == [0, 1, 2]
+    assert scores["rules_score"].tolist() == [0.0, KEYWORD_WEIGHT, 1.0]
+
+
+def test_amount_outliers_score_within_their_claim_type():
+    claims = pd.DataFrame({
+        "claim_text": ["visit"] * 4,
+        "claim_type": ["Medical", "Medical", "Pharmacy", "Dental"],
+        "claim_amount": [1000.0, 1000.0 + AMOUNT_Z_FULL * 100, 5000.0, 9999.0],
+    })
+
+    scores = score_claims_frame(claims, AMOUNT_STATS)
+
+    assert scores["amount_zscore"].tolist() == pytest.approx([0.0, AMOUNT_Z_FULL, 0.0, 0.0])
+    # Zero stddev and unknown claim types add no risk
+    assert scores["rules_score"].tolist() == [0.0, 1.0, 0.0, 0.0]
+
+
+def test_amounts_are_ignored_without_stats_or_columns():
+    claims = pd.DataFrame({"claim_text": ["visit"], "claim_type": ["Medical"], "claim_amount": [1e9]})
+    assert score_claims_frame(claims)["rules_score"].tolist() == [0.0]
+    assert score_claims_frame(claims[["claim_text"]], AMOUNT_STATS)["rules_score"].tolist() == [0.0]
+
+
+def test_result_is_indexed_like_the_claims_and_tolerates_missing_text():
+    claims = pd.DataFrame({"claim_text": [None, "kickback"]}, index=[7, 3])
+    scores = score_claims_frame(claims)
+    assert scores.index.tolist() == [7, 3]
+    assert scores["rules_keyword_hits"].tolist() == [0, 1]
+
+
+def test_keywords_are_lowercase_and_safe_as_sql_literals():
+    assert all(keyword == keyword.lower() and "'" not in keyword for keyword in RULE_KEYWORDS)
+    assert keyword_hits_sql().count("INSTR(") == len(RULE_KEYWORDS)